@@ -0,0 +1,65 @@
+# Standard library imports
+import argparse
+import json
+import logging
+
+# Custom helper modules
+from config_loader import load_config
+from helpers.batch_helper import BatchRunner, find_conversations
+from helpers.llm_router_helper import create_chat_client
+from helpers.tts_scheduler_helper import create_synthesis_scheduler
+
+
+# Configure logging the same way as the terminal program
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('app.log'),
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    """
+    Run prompt files through the bot without a user and write transcripts and audio.
+
+    Running the same command again after an interruption continues where it stopped.
+    """
+    parser = argparse.ArgumentParser(description="Run scripted prompts into transcripts and audio.")
+    parser.add_argument("path", help="prompt file (markdown chat or one prompt per line) or directory of them")
+    parser.add_argument("--output", default="", help="output directory (defaults to batch_output_directory)")
+    parser.add_argument("--concurrency", type=int, default=0, help="conversations generated at once (defaults to batch_concurrency)")
+    parser.add_argument("--independent", action="store_true", help="answer every prompt without the ones before it")
+    parser.add_argument("--no-audio", action="store_true", help="write transcripts only")
+    args = parser.parse_args()
+
+    config = load_config()
+    logging.getLogger().setLevel(config["log_level"])
+    conversations = find_conversations(args.path, args.independent)
+    logger.info(f"Batch of {len(conversations)} conversations from {args.path}")
+
+    client = create_chat_client(config)
+    # Batch mode waits for synthesis to catch up instead of failing turns
+    synthesis = None if args.no_audio else create_synthesis_scheduler(config, config["batch_synthesis_queue_size"], None)
+    runner = BatchRunner(
+        config,
+        client,
+        synthesis,
+        args.output or config["batch_output_directory"],
+        args.concurrency or config["batch_concurrency"]
+    )
+    try:
+        summary = runner.run(conversations)
+    finally:
+        if synthesis is not None:
+            synthesis.close()
+        logger.info(f"LLM backend stats: {client.stats()}")
+        client.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
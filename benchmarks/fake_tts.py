@@ -0,0 +1,37 @@
+"""
+Deterministic stand-in for a Coqui TTS model.
+
+It exposes the parts of the Coqui API the helpers use (tts() and
+synthesizer.output_sample_rate) and produces a quiet tone whose length
+depends on the text, taking a configurable time to "synthesize" it.
+"""
+import time
+
+import numpy as np
+
+
+class _Synthesizer:
+    def __init__(self, sample_rate: int):
+        self.output_sample_rate = sample_rate
+
+
+class FakeTTS:
+    def __init__(self, sample_rate: int = 22050, seconds_per_character: float = 0.06, real_time_factor: float = 0.2):
+        """
+        Args:
+            sample_rate (int, optional): Output sample rate. Defaults to 22050.
+            seconds_per_character (float, optional): Audio duration per character. Defaults to 0.06.
+            real_time_factor (float, optional): Synthesis time divided by audio duration. Defaults to 0.2.
+        """
+        self.synthesizer = _Synthesizer(sample_rate)
+        self.seconds_per_character = seconds_per_character
+        self.real_time_factor = real_time_factor
+        self.calls = 0
+
+    def tts(self, text: str, **kwargs) -> list:
+        self.calls += 1
+        sample_rate = self.synthesizer.output_sample_rate
+        duration = max(0.1, len(text) * self.seconds_per_character)
+        time.sleep(duration * self.real_time_factor)
+        timeline = np.arange(int(duration * sample_rate), dtype=np.float32) / sample_rate
+        return (0.1 * np.sin(2 * np.pi * 220 * timeline)).tolist()
@@ -0,0 +1,216 @@
+"""
+Local OpenAI-compatible stand-in server for offline benchmarks.
+
+Serves /v1/models, /v1/embeddings and /v1/chat/completions (streaming and
+non-streaming) with a deterministic answer, a configurable time to first
+token and a configurable token rate.
+
+Usage:
+    python -m benchmarks.mock_server --port 1234 --token-rate 40 --ttft 0.3
+"""
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+WORDS = (
+    "the orchestra rehearsed a new symphony in the old concert hall while the city slept "
+    "and every violin carried a quiet melody about distant stars and patient travellers"
+).split()
+
+
+def make_answer(prompt: str, token_count: int) -> list:
+    """
+    Build a deterministic answer for a prompt.
+
+    Args:
+        prompt (str): The last user message
+        token_count (int): Number of tokens in the answer
+
+    Returns:
+        list: Answer tokens; each token is one word with its separator
+    """
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    tokens = []
+    for index in range(token_count):
+        word = WORDS[(seed + index * 11) % len(WORDS)]
+        # End a sentence every twelve words so the sentence splitter has work to do
+        ends_sentence = index % 12 == 11 or index == token_count - 1
+        if index % 12 == 0:
+            word = word.capitalize()
+        tokens.append(word + (". " if ends_sentence else " "))
+    return tokens
+
+
+def make_embedding(text: str, dimensions: int = 64) -> np.ndarray:
+    """
+    Build a deterministic unit vector for a text.
+
+    Args:
+        text (str): The text to embed
+        dimensions (int, optional): Vector size. Defaults to 64.
+
+    Returns:
+        np.ndarray: float32 vector of length 'dimensions'
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class MockServerSettings:
+    def __init__(self, token_rate: float = 40.0, ttft: float = 0.3, response_tokens: int = 60):
+        """
+        Args:
+            token_rate (float, optional): Tokens streamed per second. Defaults to 40.
+            ttft (float, optional): Seconds before the first token. Defaults to 0.3.
+            response_tokens (int, optional): Tokens per answer, capped by max_tokens. Defaults to 60.
+        """
+        self.token_rate = token_rate
+        self.ttft = ttft
+        self.response_tokens = response_tokens
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def _make_handler(settings: MockServerSettings):
+    class ChatHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload: dict, status: int = 200) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json({"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "benchmark"}]})
+            else:
+                self._send_json({"error": {"message": "not found"}}, 404)
+
+        def do_POST(self):
+            path = self.path.rstrip("/")
+            if not path.endswith("/chat/completions") and not path.endswith("/embeddings"):
+                self._send_json({"error": {"message": "not found"}}, 404)
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if path.endswith("/embeddings"):
+                self._embeddings(request)
+                return
+            with settings.lock:
+                settings.requests += 1
+            prompt = request.get("messages", [{}])[-1].get("content", "")
+            token_count = min(settings.response_tokens, request.get("max_tokens") or settings.response_tokens)
+            tokens = make_answer(prompt, token_count)
+            model = request.get("model", "mock-model")
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created = int(time.time())
+
+            time.sleep(settings.ttft)
+            if request.get("stream"):
+                self._stream(tokens, completion_id, created, model)
+                return
+            time.sleep(len(tokens) / settings.token_rate)
+            self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens), "total_tokens": len(prompt.split()) + len(tokens)},
+            })
+
+        def _embeddings(self, request: dict) -> None:
+            texts = request.get("input", [])
+            if isinstance(texts, str):
+                texts = [texts]
+            data = []
+            for index, text in enumerate(texts):
+                vector = make_embedding(text)
+                # The OpenAI client asks for base64 unless a format is given
+                if request.get("encoding_format") == "base64":
+                    embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+                else:
+                    embedding = vector.tolist()
+                data.append({"object": "embedding", "index": index, "embedding": embedding})
+            self._send_json({
+                "object": "list",
+                "data": data,
+                "model": request.get("model", "mock-embedding"),
+                "usage": {"prompt_tokens": sum(len(text.split()) for text in texts), "total_tokens": sum(len(text.split()) for text in texts)},
+            })
+
+        def _stream(self, tokens: list, completion_id: str, created: int, model: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            def send(delta: dict, finish_reason=None) -> None:
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            try:
+                send({"role": "assistant", "content": ""})
+                interval = 1.0 / settings.token_rate
+                for token in tokens:
+                    send({"content": token})
+                    time.sleep(interval)
+                send({}, "stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client closed the stream early, e.g. a losing hedged request
+                pass
+
+    return ChatHandler
+
+
+def start_mock_server(settings: MockServerSettings, port: int = 0):
+    """
+    Start the mock server in a background thread.
+
+    Args:
+        settings (MockServerSettings): Latency and answer length settings
+        port (int, optional): Port to listen on, 0 picks a free one. Defaults to 0.
+
+    Returns:
+        tuple: The running server and its OpenAI base URL
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-openai", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in server for benchmarks.")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--token-rate", type=float, default=40.0, help="tokens per second")
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--response-tokens", type=int, default=60, help="tokens per answer")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(MockServerSettings(args.token_rate, args.ttft, args.response_tokens), args.port)
+    print(f"Mock server listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
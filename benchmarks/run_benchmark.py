@@ -0,0 +1,241 @@
+"""
+Offline end-to-end benchmark.
+
+Starts the mock OpenAI-compatible server, plugs in the fake TTS engine and
+a null audio sink, then replays a scripted conversation through the real
+chat, history and TTS helpers. Results are written as JSON so runs can be
+compared to catch regressions.
+
+Usage:
+    python -m benchmarks.run_benchmark --script example_chats/LyingAI.md
+    python -m benchmarks.run_benchmark --compare benchmarks/results/baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+from openai import OpenAI
+
+from benchmarks.fake_tts import FakeTTS
+from benchmarks.mock_server import MockServerSettings, start_mock_server
+from config_loader import load_config
+from helpers.audio_helper import NullAudioSink
+from helpers.batch_helper import load_prompts
+from helpers.chat_helper import generate, generate_stream
+from helpers.chat_history_helper import create_chat_history
+from helpers.metrics_helper import SessionMetrics, percentile
+from helpers import tts_helper
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), "results")
+# The default script is found from any working directory
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_chats", "LyingAI.md")
+
+DEFAULT_PROMPTS = [
+    "Tell me about the history of the violin.",
+    "Who were the most famous composers of the baroque period?",
+    "Summarize what we talked about so far.",
+]
+
+# Summary values where a larger number means a slower run
+LATENCY_KEYS = ("turn_p50", "turn_p90", "first_audio_p50", "first_audio_p90", "first_token_p50", "peak_traced_mb")
+
+
+def build_config(base_url: str, args) -> dict:
+    """
+    Derive a headless benchmark configuration from config.ini.
+
+    Args:
+        base_url (str): Base URL of the mock server
+        args: Parsed command line arguments
+
+    Returns:
+        dict: Configuration dictionary
+    """
+    config = load_config()
+    config.update({
+        "base_url": base_url,
+        "openai_api_key": "benchmark",
+        "chat_model_name": "mock-model",
+        "bot_sound": "benchmark/fake",
+        "read_after_generate": True,
+        "stream_response": args.stream,
+        "print_generated_text": False,
+        "keep_generated_file": False,
+        "generate_transcript": False,
+        "audio_cache": False,
+        # The registered fake TTS only exists in this process
+        "tts_workers": 0,
+        "metrics_file": "",
+        "prometheus_file": "",
+        "prometheus_port": 0,
+    })
+    return config
+
+
+def run_benchmark(prompts: list, args) -> dict:
+    """
+    Replay the prompts and measure every turn.
+
+    Args:
+        prompts (list): User prompts to send, in order
+        args: Parsed command line arguments
+
+    Returns:
+        dict: Settings, summary and per-turn results
+    """
+    settings = MockServerSettings(args.token_rate, args.ttft, args.response_tokens)
+    server, base_url = start_mock_server(settings)
+    config = build_config(base_url, args)
+
+    fake_tts = FakeTTS(real_time_factor=args.tts_rtf)
+    tts_helper.register_tts_model(config["bot_sound"], fake_tts)
+    sink = NullAudioSink(realtime=args.realtime_playback)
+    tts_helper.set_audio_sink(sink)
+
+    client = OpenAI(base_url=config["base_url"], api_key=config["openai_api_key"])
+    history = create_chat_history(config)
+    metrics = SessionMetrics(config)
+
+    tracemalloc.start()
+    turns = []
+    session_start = time.perf_counter()
+    for index, user_prompt in enumerate(prompts):
+        file_date = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        user_prompt_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        turn = metrics.start_turn()
+        start = time.perf_counter()
+        with turn.span("history_format"):
+            chat_history = history.chat_messages()
+        if args.stream:
+            deltas = turn.span_stream("generation", generate_stream(user_prompt, chat_history, client, config))
+            with turn.span("speech"):
+                answer = tts_helper.run_tts_stream(deltas, file_date, config)
+        else:
+            with turn.span("generation"):
+                answer = generate(user_prompt, chat_history, client, config)
+            with turn.span("speech"):
+                tts_helper.run_tts(answer, file_date, config)
+        answer_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        history.add_turn(user_prompt, answer, user_prompt_date, answer_date)
+        elapsed = time.perf_counter() - start
+        turn.observe("turn", elapsed)
+        metrics.finish_turn(turn)
+
+        turns.append({
+            "turn": index + 1,
+            "seconds": elapsed,
+            "first_token": turn.marks.get("first_token"),
+            "first_audio": turn.marks.get("first_audio"),
+            "answer_characters": len(answer),
+            "answer_words": len(answer.split()),
+            "history_tokens": history.token_count(),
+        })
+        print(f"turn {index + 1}/{len(prompts)}: {elapsed:.2f}s, first audio {turn.marks.get('first_audio', 0):.2f}s")
+    wall = time.perf_counter() - session_start
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    server.shutdown()
+
+    turn_seconds = [turn["seconds"] for turn in turns]
+    first_audio = [turn["first_audio"] for turn in turns if turn["first_audio"] is not None]
+    first_token = [turn["first_token"] for turn in turns if turn["first_token"] is not None]
+    summary = {
+        "turns": len(turns),
+        "wall_seconds": wall,
+        "turn_p50": percentile(turn_seconds, 0.5),
+        "turn_p90": percentile(turn_seconds, 0.9),
+        "first_audio_p50": percentile(first_audio, 0.5),
+        "first_audio_p90": percentile(first_audio, 0.9),
+        "first_token_p50": percentile(first_token, 0.5),
+        "words_per_second": sum(turn["answer_words"] for turn in turns) / wall if wall else 0.0,
+        "audio_seconds_per_wall_second": sink.played_seconds / wall if wall else 0.0,
+        "tts_calls": fake_tts.calls,
+        "peak_traced_mb": peak_traced / (1024 ** 2),
+        # ru_maxrss is reported in kilobytes on Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    return {
+        "name": args.name,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "settings": {
+            "script": args.script,
+            "stream": args.stream,
+            "token_rate": args.token_rate,
+            "ttft": args.ttft,
+            "response_tokens": args.response_tokens,
+            "tts_rtf": args.tts_rtf,
+            "realtime_playback": args.realtime_playback,
+        },
+        "summary": summary,
+        "stages": metrics.summary(),
+        "turns": turns,
+    }
+
+
+def compare_results(current: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Print the summary next to a baseline run and check for regressions.
+
+    Args:
+        current (dict): Results of this run
+        baseline (dict): Results of an earlier run
+        tolerance (float): Allowed relative slowdown, e.g. 0.1 for 10%
+
+    Returns:
+        bool: True when no latency value regressed beyond the tolerance
+    """
+    passed = True
+    print(f"\n{'metric':<32}{'baseline':>12}{'current':>12}{'change':>10}")
+    for key, value in current["summary"].items():
+        old = baseline["summary"].get(key)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        change = (value - old) / old if old else 0.0
+        regressed = key in LATENCY_KEYS and change > tolerance
+        passed = passed and not regressed
+        print(f"{key:<32}{old:>12.3f}{value:>12.3f}{change:>9.1%}{'  REGRESSION' if regressed else ''}")
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with a mock server and fake TTS.")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="markdown chat or one prompt per line; empty uses built-in prompts")
+    parser.add_argument("--turns", type=int, default=0, help="limit the number of turns (0 replays the whole script)")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=True, help="use streaming generation with sentence pipelining")
+    parser.add_argument("--token-rate", type=float, default=40.0, help="mock server tokens per second")
+    parser.add_argument("--ttft", type=float, default=0.3, help="mock server seconds before the first token")
+    parser.add_argument("--response-tokens", type=int, default=60, help="mock server tokens per answer")
+    parser.add_argument("--tts-rtf", type=float, default=0.2, help="fake TTS synthesis time per second of audio")
+    parser.add_argument("--realtime-playback", action="store_true", help="make the null sink take as long as the audio")
+    parser.add_argument("--name", default="benchmark", help="name stored in the results")
+    parser.add_argument("--output", default="", help="results file (defaults to benchmarks/results/<name>-<date>.json)")
+    parser.add_argument("--compare", default="", help="baseline results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.script) if args.script else DEFAULT_PROMPTS
+    if args.turns:
+        prompts = prompts[:args.turns]
+    results = run_benchmark(prompts, args)
+
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"{args.name}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(json.dumps(results["summary"], indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if not compare_results(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
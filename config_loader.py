@@ -21,18 +21,105 @@ def load_config() -> dict:
     return {
         "chat_model_name": config.get('DEFAULT', 'chat_model_name', fallback="llama-3.1-8b-lexi-uncensored-v2"),  # Get chat model name with a fallback
         "base_url": config.get('DEFAULT', 'base_url', fallback="http://localhost:1234/v1/"),  # Get base URL with a fallback
+        "temperature": config.getfloat('DEFAULT', 'temperature', fallback=0.7),  # Get sampling temperature
+        "max_tokens": config.getint('DEFAULT', 'max_tokens', fallback=800),  # Get maximum tokens per answer
+        "top_p": config.getfloat('DEFAULT', 'top_p', fallback=0.95),  # Get nucleus sampling probability
+        "response_cache": config.getboolean('DEFAULT', 'response_cache', fallback=False),  # Get flag for caching model answers
+        "response_cache_directory": config.get('DEFAULT', 'response_cache_directory', fallback="response-cache/"),  # Get response cache directory with a fallback
+        "response_cache_size_mb": config.getint('DEFAULT', 'response_cache_size_mb', fallback=64),  # Get response cache size limit in megabytes
+        "response_cache_ttl": config.getint('DEFAULT', 'response_cache_ttl', fallback=86400),  # Get seconds a cached answer stays valid (0 keeps it until evicted)
+        "response_cache_allow_sampling": config.getboolean('DEFAULT', 'response_cache_allow_sampling', fallback=False),  # Get flag for caching answers sampled with a non-zero temperature
+        "base_urls": config.get('DEFAULT', 'base_urls', fallback=""),  # Get comma separated backend URLs (empty uses base_url)
+        "llm_selection": config.get('DEFAULT', 'llm_selection', fallback="least_outstanding"),  # Get backend selection (least_outstanding or latency)
+        "llm_pool_connections": config.getint('DEFAULT', 'llm_pool_connections', fallback=10),  # Get keep-alive connections per backend
+        "llm_timeout": config.getfloat('DEFAULT', 'llm_timeout', fallback=120.0),  # Get request timeout in seconds
+        "llm_retries": config.getint('DEFAULT', 'llm_retries', fallback=2),  # Get retries after a failed request
+        "llm_retry_backoff": config.getfloat('DEFAULT', 'llm_retry_backoff', fallback=0.5),  # Get first retry delay in seconds
+        "llm_hedge_after": config.getfloat('DEFAULT', 'llm_hedge_after', fallback=0.0),  # Get seconds to first token before a hedged request (0 disables)
+        "llm_health_interval": config.getfloat('DEFAULT', 'llm_health_interval', fallback=30.0),  # Get seconds between backend health checks (0 disables)
+        "llm_backend": config.get('DEFAULT', 'llm_backend', fallback="openai"),  # Get chat backend (openai for OpenAI-compatible servers, llama_cpp for in-process)
+        "llama_model_path": config.get('DEFAULT', 'llama_model_path', fallback=""),  # Get GGUF model file for the llama_cpp backend
+        "llama_n_ctx": config.getint('DEFAULT', 'llama_n_ctx', fallback=4096),  # Get llama.cpp context window in tokens
+        "llama_n_gpu_layers": config.getint('DEFAULT', 'llama_n_gpu_layers', fallback=-1),  # Get layers offloaded to the GPU when use_gpu is set (-1 offloads all)
+        "llama_n_threads": config.getint('DEFAULT', 'llama_n_threads', fallback=0),  # Get llama.cpp CPU threads (0 lets llama.cpp decide)
+        "llama_chat_format": config.get('DEFAULT', 'llama_chat_format', fallback=""),  # Get llama_cpp chat format (empty uses the model's template)
+        "llama_cache_mb": config.getint('DEFAULT', 'llama_cache_mb', fallback=512),  # Get size of the RAM cache of KV states in megabytes (0 disables)
+        "llama_state_file": config.get('DEFAULT', 'llama_state_file', fallback="llama-state.bin"),  # Get file the KV state is saved to on exit (empty disables)
         "openai_api_key": config.get('DEFAULT', 'openai_api_key', fallback=os.environ.get("OPENAI_API_KEY") or 'your-api-key'),  # Get API key, fallback to environment variable
         "sound_directory": config.get('DEFAULT', 'sound_directory', fallback="sound-streams/"),  # Get sound directory with a fallback
         "transcript_directory": config.get('DEFAULT', 'transcript_directory', fallback="transcript-streams/"),  # Get transcript directory with a fallback
         "keep_generated_file": config.getboolean('DEFAULT', 'keep_generated_file', fallback=True),  # Get flag for keeping generated files
+        "audio_archive_format": config.get('DEFAULT', 'audio_archive_format', fallback="flac"),  # Get format of kept audio (flac, opus or wav)
+        "audio_archive_max_mb": config.getint('DEFAULT', 'audio_archive_max_mb', fallback=0),  # Get disk quota of kept audio in megabytes (0 disables)
+        "audio_archive_max_age_days": config.getfloat('DEFAULT', 'audio_archive_max_age_days', fallback=0),  # Get days kept audio is retained (0 keeps it)
         "generate_transcript": config.getboolean('DEFAULT', 'generate_transcript', fallback=True),  # Get flag for generating transcripts
+        "session_log_compress": config.getboolean('DEFAULT', 'session_log_compress', fallback=False),  # Get flag for gzip-compressing the session log
+        "session_log_fsync": config.get('DEFAULT', 'session_log_fsync', fallback="interval"),  # Get when the session log is synced to disk (always, interval or never)
+        "session_log_fsync_interval": config.getfloat('DEFAULT', 'session_log_fsync_interval', fallback=1.0),  # Get seconds between syncs with the interval policy
+        "resume_session": config.get('DEFAULT', 'resume_session', fallback=""),  # Get session to continue (last, a session name, or empty for a new one)
         "initial_content": config.get('DEFAULT', 'initial_content', fallback="You are a historian answering questions. You will state users question first than answer."),  # Get initial content with a fallback
         "read_after_generate": config.getboolean('DEFAULT', 'read_after_generate', fallback=True),  # Get flag for reading after generation
+        "stream_response": config.getboolean('DEFAULT', 'stream_response', fallback=False),  # Get flag for speaking the answer while it is generated
         "print_generated_text": config.getboolean('DEFAULT', 'print_generated_text', fallback=True),  # Get flag for printing generated text
         "memory_message_count": config.getint('DEFAULT', 'memory_message_count', fallback=10),  # Get count of messages to keep in memory
+        "context_token_budget": config.getint('DEFAULT', 'context_token_budget', fallback=3072),  # Get maximum estimated tokens of history sent to the model
+        "long_term_memory": config.getboolean('DEFAULT', 'long_term_memory', fallback=False),  # Get flag for summarizing and retrieving turns older than the history window
+        "memory_directory": config.get('DEFAULT', 'memory_directory', fallback="memory/"),  # Get directory of the memory index and summary
+        "memory_embedding_model": config.get('DEFAULT', 'memory_embedding_model', fallback=""),  # Get embedding model served by the backend (empty uses word hashing)
+        "memory_top_k": config.getint('DEFAULT', 'memory_top_k', fallback=3),  # Get count of past exchanges retrieved into the prompt
+        "memory_min_score": config.getfloat('DEFAULT', 'memory_min_score', fallback=0.2),  # Get minimum similarity of a retrieved exchange
+        "memory_summary_every": config.getint('DEFAULT', 'memory_summary_every', fallback=4),  # Get count of evicted messages folded into the summary at once
+        "memory_summary_tokens": config.getint('DEFAULT', 'memory_summary_tokens', fallback=200),  # Get maximum tokens of the running summary
+        "memory_context_token_budget": config.getint('DEFAULT', 'memory_context_token_budget', fallback=512),  # Get maximum estimated tokens of summary and retrieved exchanges
         "bot_name": config.get('DEFAULT', 'bot_name', fallback="Bot"),  # Get bot name with a fallback
         "remove_deepseek_think_tags": config.getboolean('DEFAULT', 'remove_deepseek_think_tags', fallback=True),  # Get flag for removing specific tags
         "speak_welcome": config.getboolean('DEFAULT', 'speak_welcome', fallback=True),  # Get flag for speaking welcome message
+        "log_level": config.get('DEFAULT', 'log_level', fallback="INFO").upper(),  # Get log level (DEBUG also logs the full chat history)
+        "metrics_file": config.get('DEFAULT', 'metrics_file', fallback=""),  # Get JSON-lines file for per-turn timings (empty disables)
+        "prometheus_file": config.get('DEFAULT', 'prometheus_file', fallback=""),  # Get Prometheus text file for session percentiles (empty disables)
+        "prometheus_port": config.getint('DEFAULT', 'prometheus_port', fallback=0),  # Get port serving /metrics (0 disables)
+        "startup_report_file": config.get('DEFAULT', 'startup_report_file', fallback=""),  # Get JSON-lines file for cold start timings (empty disables)
+        "memory_rss_high_water_mb": config.getint('DEFAULT', 'memory_rss_high_water_mb', fallback=4096),  # Get RSS in MB above which memory is collected (0 disables)
+        "memory_gpu_high_water_mb": config.getint('DEFAULT', 'memory_gpu_high_water_mb', fallback=2048),  # Get GPU memory in MB above which memory is collected (0 disables)
+        "memory_idle_delay": config.getfloat('DEFAULT', 'memory_idle_delay', fallback=0.5),  # Get idle seconds before memory is checked
+        "memory_collect_every_turns": config.getint('DEFAULT', 'memory_collect_every_turns', fallback=50),  # Get turns after which memory is collected anyway (0 disables)
+        "voice_input": config.getboolean('DEFAULT', 'voice_input', fallback=False),  # Get flag for speaking prompts instead of typing them
+        "voice_input_source": config.get('DEFAULT', 'voice_input_source', fallback="microphone"),  # Get speech input (microphone, - for PCM on stdin, a .wav file or a raw PCM file)
+        "voice_input_realtime": config.getboolean('DEFAULT', 'voice_input_realtime', fallback=True),  # Get flag for reading file input at the pace of a microphone
+        "vad_aggressiveness": config.getint('DEFAULT', 'vad_aggressiveness', fallback=2),  # Get voice activity detection aggressiveness (0 to 3)
+        "vad_silence_ms": config.getint('DEFAULT', 'vad_silence_ms', fallback=600),  # Get milliseconds of silence that end an utterance
+        "stt_model": config.get('DEFAULT', 'stt_model', fallback="base.en"),  # Get faster-whisper model name with a fallback
+        "stt_device": config.get('DEFAULT', 'stt_device', fallback="cpu"),  # Get speech recognition device
+        "stt_compute_type": config.get('DEFAULT', 'stt_compute_type', fallback="int8"),  # Get speech recognition compute type
+        "stt_language": config.get('DEFAULT', 'stt_language', fallback="en"),  # Get spoken language (empty detects it)
+        "stt_partial_interval": config.getfloat('DEFAULT', 'stt_partial_interval', fallback=1.0),  # Get seconds of speech between partial transcriptions
+        "async_engine": config.getboolean('DEFAULT', 'async_engine', fallback=False),  # Get flag for the asyncio engine with barge-in
         "use_gpu": config.getboolean('DEFAULT', 'use_gpu', fallback=True),  # Get flag for using GPU processing,
-        "bot_sound": config.get('DEFAULT', 'bot_sound', fallback="tts_models/en/vctk/vits") 
+        "bot_sound": config.get('DEFAULT', 'bot_sound', fallback="tts_models/en/vctk/vits"),  # Get TTS model name with a fallback
+        "preload_tts": config.getboolean('DEFAULT', 'preload_tts', fallback=True),  # Get flag for warming the TTS model in the background once the prompt is shown
+        "audio_backend": config.get('DEFAULT', 'audio_backend', fallback="sounddevice"),  # Get audio output backend (sounddevice, pygame or null)
+        "audio_latency": config.get('DEFAULT', 'audio_latency', fallback="low"),  # Get requested output latency (low, high or seconds)
+        "audio_queue_size": config.getint('DEFAULT', 'audio_queue_size', fallback=4),  # Get count of synthesized chunks buffered ahead of playback
+        "audio_cache": config.getboolean('DEFAULT', 'audio_cache', fallback=True),  # Get flag for caching synthesized audio
+        "audio_cache_directory": config.get('DEFAULT', 'audio_cache_directory', fallback="audio-cache/"),  # Get audio cache directory with a fallback
+        "audio_cache_size_mb": config.getint('DEFAULT', 'audio_cache_size_mb', fallback=256),  # Get audio cache size limit in megabytes
+        "audio_cache_prewarm": config.get('DEFAULT', 'audio_cache_prewarm', fallback=""),  # Get '|' separated phrases rendered at startup
+        "tts_cache_size": config.getint('DEFAULT', 'tts_cache_size', fallback=1),  # Get count of TTS models kept loaded
+        "tts_speaker": config.get('DEFAULT', 'tts_speaker', fallback=""),  # Get speaker of a multi-speaker TTS model (empty uses the model's default)
+        "tts_language": config.get('DEFAULT', 'tts_language', fallback=""),  # Get language of a multilingual TTS model (empty uses the model's default)
+        "tts_speed": config.getfloat('DEFAULT', 'tts_speed', fallback=1.0),  # Get speaking rate for TTS models that support it
+        "tts_workers": config.getint('DEFAULT', 'tts_workers', fallback=0),  # Get count of speech synthesis worker processes (0 synthesizes in this process)
+        "tts_batch_size": config.getint('DEFAULT', 'tts_batch_size', fallback=4),  # Get maximum sentences per synthesis batch
+        "tts_batch_max_wait": config.getfloat('DEFAULT', 'tts_batch_max_wait', fallback=0.02),  # Get seconds a synthesis batch waits to fill up
+        "tts_torch_threads": config.getint('DEFAULT', 'tts_torch_threads', fallback=0),  # Get torch threads per worker process (0 divides the CPUs between workers)
+        "server_host": config.get('DEFAULT', 'server_host', fallback="127.0.0.1"),  # Get address the server listens on
+        "server_http_port": config.getint('DEFAULT', 'server_http_port', fallback=8000),  # Get HTTP API port
+        "server_ws_port": config.getint('DEFAULT', 'server_ws_port', fallback=8765),  # Get WebSocket port
+        "server_max_sessions": config.getint('DEFAULT', 'server_max_sessions', fallback=100),  # Get maximum count of open sessions
+        "server_session_idle_seconds": config.getint('DEFAULT', 'server_session_idle_seconds', fallback=1800),  # Get idle seconds before a session is evicted
+        "server_max_concurrent_turns": config.getint('DEFAULT', 'server_max_concurrent_turns', fallback=4),  # Get count of turns served at once; further turns are rejected
+        "server_synthesis_queue_size": config.getint('DEFAULT', 'server_synthesis_queue_size', fallback=16),  # Get count of sentences allowed to wait for speech synthesis
+        "batch_output_directory": config.get('DEFAULT', 'batch_output_directory', fallback="batch-output"),  # Get directory batch mode writes transcripts and audio to
+        "batch_concurrency": config.getint('DEFAULT', 'batch_concurrency', fallback=4),  # Get count of conversations batch mode generates at once
+        "batch_synthesis_queue_size": config.getint('DEFAULT', 'batch_synthesis_queue_size', fallback=64),  # Get count of sentences batch mode lets wait for speech synthesis
     }
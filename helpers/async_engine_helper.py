@@ -0,0 +1,280 @@
+import asyncio
+import datetime
+import logging
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers.chat_helper import agenerate_stream, strip_think_tags_stream
+from helpers.chat_history_helper import create_chat_history
+from helpers.llm_router_helper import create_chat_client
+from helpers.long_term_memory_helper import create_long_term_memory
+from helpers.console_helper import get_user_input, print_text
+from helpers.speech_input_helper import get_voice_input
+from helpers.memory_helper import create_memory_manager
+from helpers.metrics_helper import SessionMetrics
+from helpers.startup_helper import report_startup
+from helpers.transcript_helper import close_session_log, resume_history, save_transcript
+from helpers.tts_helper import get_audio_sink, play_audio, preload_tts_model, split_sentences, synthesize_speech
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+
+class ConversationEngine:
+    """
+    Asyncio conversation core.
+
+    Input, generation, synthesis, playback and persistence run as separate
+    stages connected by queues, so the user can type while an answer is being
+    spoken. A new prompt cancels the turn in progress (barge-in). Blocking
+    libraries such as Coqui TTS run in executors, and the blocking prompt
+    reader runs on a daemon thread, so Ctrl+C never waits for it.
+    """
+
+    def __init__(self, config, read_prompt=get_user_input, show_text=print_text):
+        """
+        Args:
+            config: Configuration dictionary
+            read_prompt (optional): Blocking function taking the config and an on_prompt callback and
+                                    returning the next prompt. Defaults to the console prompt.
+            show_text (optional): Function displaying an answer. Defaults to console printing.
+        """
+        self.config = config
+        self.read_prompt = read_prompt
+        self.show_text = show_text
+        # The same client as the terminal loop; generation runs on a thread
+        self.client = create_chat_client(config)
+        self.history = create_chat_history(config)
+        resume_history(self.history, config)
+        self.long_term_memory = create_long_term_memory(config, self.client)
+        if self.long_term_memory is not None:
+            self.history.on_evict = self.long_term_memory.evicted
+        self.turn_id = 0
+        self.prompts: asyncio.Queue = asyncio.Queue()
+        self.sentences: asyncio.Queue = asyncio.Queue(maxsize=config["audio_queue_size"])
+        self.audio: asyncio.Queue = asyncio.Queue(maxsize=config["audio_queue_size"])
+        self.records: asyncio.Queue = asyncio.Queue()
+        self._current_turn = None
+        self._tts_warming = False
+        self.memory_manager = create_memory_manager(config)
+        self.metrics = SessionMetrics(config)
+        # Coqui models are not thread safe, so synthesis gets a single worker
+        self._tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self._playback_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="playback")
+
+    async def run(self) -> None:
+        """Run all stages until the user says goodbye."""
+        loop = asyncio.get_running_loop()
+        if self.config["speak_welcome"]:
+            await loop.run_in_executor(self._playback_executor, play_audio, "hi.wav", self.config)
+
+        stages = [
+            asyncio.create_task(self._turn_stage()),
+            asyncio.create_task(self._persistence_stage()),
+        ]
+        if self.config["read_after_generate"]:
+            stages.append(asyncio.create_task(self._synthesis_stage()))
+            stages.append(asyncio.create_task(self._playback_stage()))
+        try:
+            await self._input_stage()
+        finally:
+            self._barge_in()
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            # Let pending transcripts reach the disk
+            while not self.records.empty():
+                await self._persist(self.records.get_nowait())
+            close_session_log()
+            self.metrics.close()
+            if self.long_term_memory is not None:
+                self.long_term_memory.close()
+                logger.info(f"Long-term memory stats: {self.long_term_memory.stats()}")
+            self._tts_executor.shutdown(wait=False, cancel_futures=True)
+            self._playback_executor.shutdown(wait=False, cancel_futures=True)
+            logger.info(f"LLM backend stats: {self.client.stats()}")
+            self.client.close()
+
+    def _on_prompt(self) -> None:
+        """Report startup and warm the TTS model once the first prompt is shown."""
+        report_startup(self.config)
+        if not self._tts_warming and self.config["read_after_generate"] and self.config["preload_tts"]:
+            preload_tts_model(self.config)
+            self._tts_warming = True
+
+    def _barge_in(self) -> None:
+        """Cancel the turn in progress and drop its pending audio."""
+        self.turn_id += 1
+        if self._current_turn is not None and not self._current_turn.done():
+            self._current_turn.cancel()
+        for pending in (self.sentences, self.audio):
+            while not pending.empty():
+                pending.get_nowait()
+        if self.config["read_after_generate"]:
+            get_audio_sink(self.config).stop()
+
+    async def _read_prompt(self) -> str:
+        # A reader blocked in input() must not be joined by asyncio.run at shutdown,
+        # so it runs on a daemon thread instead of the default executor
+        loop = asyncio.get_running_loop()
+        result = loop.create_future()
+
+        def settle(value, error) -> None:
+            if not result.done():
+                if error is not None:
+                    result.set_exception(error)
+                else:
+                    result.set_result(value)
+
+        def read() -> None:
+            try:
+                value, error = self.read_prompt(self.config, self._on_prompt), None
+            except Exception as e:
+                value, error = None, e
+            try:
+                loop.call_soon_threadsafe(settle, value, error)
+            except RuntimeError:
+                # The event loop has already been closed
+                pass
+
+        threading.Thread(target=read, name="prompt-reader", daemon=True).start()
+        return await result
+
+    async def _input_stage(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            user_prompt = await self._read_prompt()
+            logger.info(f"Received user input: {user_prompt}")
+
+            if user_prompt.lower() == "bye" or user_prompt.lower() == "exit":
+                self._barge_in()
+                if self.config["speak_welcome"]:
+                    await loop.run_in_executor(self._playback_executor, play_audio, "bye.wav", self.config)
+                logger.info("Exit command received. Shutting down...")
+                return
+
+            if not user_prompt.strip():
+                print_text("No input provided. Please enter a valid question or command.", self.config)
+                continue
+
+            if self._current_turn is not None and not self._current_turn.done():
+                logger.info("New prompt received, cancelling the current turn")
+            self._barge_in()
+            await self.prompts.put(user_prompt)
+
+    async def _turn_stage(self) -> None:
+        while True:
+            user_prompt = await self.prompts.get()
+            self._current_turn = asyncio.create_task(self._run_turn(user_prompt, self.turn_id))
+            await asyncio.wait([self._current_turn])
+            if not self._current_turn.cancelled() and self._current_turn.exception():
+                logger.error(f"Error in turn: {str(self._current_turn.exception())}")
+
+    async def _run_turn(self, user_prompt: str, turn_id: int) -> None:
+        # Only one turn runs at a time, so it can be the current turn of the metrics
+        turn = self.metrics.start_turn()
+        try:
+            await self._generate_turn(user_prompt, turn_id, turn)
+        finally:
+            self.metrics.finish_turn(turn)
+
+    async def _generate_turn(self, user_prompt: str, turn_id: int, turn) -> None:
+        loop = asyncio.get_running_loop()
+        user_prompt_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        memory_context = ""
+        if self.long_term_memory is not None:
+            with turn.span("memory_retrieval"):
+                memory_context = await loop.run_in_executor(None, self.long_term_memory.context, user_prompt, self.history)
+        with turn.span("history_format"):
+            chat_history = self.history.chat_messages(memory_context)
+
+        # Sentence splitting is synchronous, so it runs in a thread fed by this queue
+        deltas: queue.Queue = queue.Queue()
+        splitter = None
+        if self.config["read_after_generate"]:
+            splitter = loop.run_in_executor(None, self._split_sentences, deltas, turn_id, loop)
+
+        parts = []
+        try:
+            with turn.span("generation"):
+                async for delta in agenerate_stream(user_prompt, chat_history, self.client, self.config):
+                    parts.append(delta)
+                    deltas.put(delta)
+        finally:
+            deltas.put(None)
+
+        answer = "".join(parts)
+        answer_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        history_answer = answer
+        if self.config["remove_deepseek_think_tags"]:
+            answer = re.sub(r"<think>.*?</think>", "", answer, flags=re.DOTALL)
+
+        self.history.add_turn(user_prompt, history_answer, user_prompt_date, answer_date)
+        if self.long_term_memory is not None:
+            self.long_term_memory.remember(user_prompt, answer, user_prompt_date, answer_date)
+        if self.config["print_generated_text"]:
+            self.show_text(answer, self.config)
+        await self.records.put((user_prompt, answer, history_answer, user_prompt_date, answer_date))
+        if splitter is not None:
+            await splitter
+
+    def _split_sentences(self, deltas: queue.Queue, turn_id: int, loop) -> None:
+        spoken = iter(deltas.get, None)
+        if self.config["remove_deepseek_think_tags"]:
+            spoken = strip_think_tags_stream(spoken)
+        for sentence in split_sentences(spoken):
+            if turn_id != self.turn_id:
+                continue
+            if sentence.strip():
+                asyncio.run_coroutine_threadsafe(self.sentences.put((turn_id, sentence)), loop).result()
+
+    async def _synthesis_stage(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            turn_id, sentence = await self.sentences.get()
+            if turn_id != self.turn_id:
+                continue
+            try:
+                chunk = await loop.run_in_executor(self._tts_executor, synthesize_speech, sentence, self.config)
+            except Exception as e:
+                logger.error(f"Speech synthesis failed: {str(e)}")
+                continue
+            if turn_id == self.turn_id:
+                await self.audio.put((turn_id, chunk))
+
+    async def _playback_stage(self) -> None:
+        loop = asyncio.get_running_loop()
+        sink = get_audio_sink(self.config)
+        while True:
+            turn_id, (samples, sample_rate) = await self.audio.get()
+            if turn_id != self.turn_id:
+                continue
+            await loop.run_in_executor(self._playback_executor, sink.play, samples, sample_rate)
+
+    async def _persistence_stage(self) -> None:
+        while True:
+            await self._persist(await self.records.get())
+
+    async def _persist(self, record) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            if self.config["generate_transcript"]:
+                # Only queues the record; the session log writes it in the background
+                save_transcript(*record, self.config)
+            # Housekeeping runs here, off the turn's critical path
+            self.memory_manager.end_turn()
+            await loop.run_in_executor(None, self.memory_manager.maybe_collect)
+        except Exception as e:
+            logger.error(f"Failed to persist turn: {str(e)}")
+
+
+async def run_conversation_engine(config) -> None:
+    """
+    Run the asyncio conversation engine with the console front end.
+
+    Args:
+        config: Configuration dictionary
+    """
+    await ConversationEngine(config, get_voice_input if config["voice_input"] else get_user_input).run()
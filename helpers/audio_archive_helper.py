@@ -0,0 +1,234 @@
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Sample rates the Opus encoder accepts
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+# File extension and soundfile format/subtype of each archive format
+ARCHIVE_FORMATS = {
+    "flac": ("flac", "FLAC", "PCM_16"),
+    "opus": ("opus", "OGG", "OPUS"),
+    "wav": ("wav", "WAV", "PCM_16"),
+}
+WAV_HEADER_BYTES = 44
+
+# Archive shared by every turn in the process
+_archive = None
+
+
+class AudioArchive:
+    """
+    Encodes generated audio to compressed files in a background thread.
+
+    Files are stored per session as <session>/<turn>-<date>.<ext> and listed in
+    index.jsonl with their turn, duration and size. After each file the
+    retention policy removes files older than 'max_age_days' and then the
+    oldest files until the archive fits in 'max_bytes'.
+    """
+
+    def __init__(self, directory: str, audio_format: str = "flac", max_bytes: int = 0, max_age_days: float = 0,
+                 max_queued: int = 8):
+        """
+        Args:
+            directory (str): Directory holding the archive and its index
+            audio_format (str, optional): "flac", "opus" or "wav". Defaults to "flac".
+            max_bytes (int, optional): Disk quota of the archive in bytes; 0 disables. Defaults to 0.
+            max_age_days (float, optional): Age after which files are removed; 0 disables. Defaults to 0.
+            max_queued (int, optional): Turns allowed to wait for encoding. Defaults to 8.
+        """
+        if audio_format not in ARCHIVE_FORMATS:
+            logger.warning(f"Unknown archive format '{audio_format}', using flac")
+            audio_format = "flac"
+        self.directory = directory
+        self.audio_format = audio_format
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.session = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.index_path = os.path.join(directory, "index.jsonl")
+        self.turns = 0
+        self.files = 0
+        self.dropped = 0
+        self.removed = 0
+        self.bytes_written = 0
+        self.bytes_saved = 0
+        self.encode_seconds = 0.0
+        self._jobs: queue.Queue = queue.Queue(maxsize=max(1, max_queued))
+        self._worker = threading.Thread(target=self._encode_worker, name="audio-archive", daemon=True)
+        self._worker.start()
+
+    def submit(self, samples: np.ndarray, sample_rate: int, file_date: str) -> None:
+        """
+        Queue a turn's audio for archiving without waiting for the encoder.
+
+        When the encoder has fallen behind, the audio is dropped rather than
+        delaying the conversation.
+
+        Args:
+            samples (np.ndarray): Mono float samples in [-1, 1]
+            sample_rate (int): Sample rate in Hz
+            file_date (str): Date used in the file name
+        """
+        self.turns += 1
+        try:
+            self._jobs.put_nowait((self.turns, samples, sample_rate, file_date))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Audio archive is behind, dropped turn {self.turns}")
+
+    def _encode_worker(self) -> None:
+        while (job := self._jobs.get()) is not None:
+            try:
+                self._archive(*job)
+                self._enforce_retention()
+            except Exception as e:
+                logger.error(f"Failed to archive audio: {str(e)}")
+
+    def _archive(self, turn: int, samples: np.ndarray, sample_rate: int, file_date: str) -> None:
+        import soundfile as sf
+
+        extension, container, subtype = ARCHIVE_FORMATS[self.audio_format]
+        if self.audio_format == "opus" and sample_rate not in OPUS_SAMPLE_RATES:
+            samples, sample_rate = _resample(samples, sample_rate, 24000 if sample_rate < 36000 else 48000)
+        relative_path = os.path.join(self.session, f"{turn:04d}-{file_date}.{extension}")
+        file_path = os.path.join(self.directory, relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        start = time.perf_counter()
+        sf.write(file_path, np.clip(samples, -1.0, 1.0), sample_rate, format=container, subtype=subtype)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(file_path)
+        wav_size = len(samples) * 2 + WAV_HEADER_BYTES
+
+        self.files += 1
+        self.encode_seconds += elapsed
+        self.bytes_written += size
+        self.bytes_saved += wav_size - size
+        entry = {
+            "session": self.session,
+            "turn": turn,
+            "file": relative_path,
+            "format": self.audio_format,
+            "created": time.time(),
+            "duration": round(len(samples) / sample_rate, 3),
+            "bytes": size,
+            "wav_bytes": wav_size,
+            "encode_seconds": round(elapsed, 6),
+        }
+        with open(self.index_path, "a") as index:
+            index.write(json.dumps(entry) + "\n")
+        logger.info(f"Archived turn {turn} as {relative_path} ({size} bytes, {elapsed * 1000:.0f} ms)")
+
+    def entries(self) -> list:
+        """
+        Read the archive index.
+
+        Returns:
+            list: Index entries, oldest first
+        """
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path) as index:
+            return [json.loads(line) for line in index if line.strip()]
+
+    def _enforce_retention(self) -> None:
+        if not self.max_bytes and not self.max_age_days:
+            return
+        entries = self.entries()
+        keep = list(entries)
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            keep = [entry for entry in keep if entry["created"] >= cutoff]
+        if self.max_bytes:
+            total = sum(entry["bytes"] for entry in keep)
+            while keep and total > self.max_bytes:
+                total -= keep.pop(0)["bytes"]
+        if len(keep) == len(entries):
+            return
+
+        kept_files = {entry["file"] for entry in keep}
+        for entry in entries:
+            if entry["file"] not in kept_files:
+                try:
+                    os.remove(os.path.join(self.directory, entry["file"]))
+                except FileNotFoundError:
+                    pass
+                self.removed += 1
+        # Rewrite the index in place of the old one, so a crash never leaves it half written
+        temporary_path = self.index_path + ".tmp"
+        with open(temporary_path, "w") as index:
+            index.writelines(json.dumps(entry) + "\n" for entry in keep)
+        os.replace(temporary_path, self.index_path)
+        logger.info(f"Audio archive retention removed {len(entries) - len(keep)} files")
+
+    def stats(self) -> dict:
+        """
+        Report archive counters.
+
+        Returns:
+            dict: Files written, bytes written and saved against WAV, encode time, dropped and removed files
+        """
+        return {
+            "format": self.audio_format,
+            "files": self.files,
+            "bytes_written": self.bytes_written,
+            "bytes_saved": self.bytes_saved,
+            "encode_seconds": self.encode_seconds,
+            "dropped": self.dropped,
+            "removed": self.removed,
+        }
+
+    def close(self) -> None:
+        """Wait for the queued audio to be archived."""
+        self._jobs.put(None)
+        self._worker.join()
+
+
+def _resample(samples: np.ndarray, sample_rate: int, target_rate: int) -> tuple:
+    positions = np.arange(int(len(samples) * target_rate / sample_rate)) / target_rate
+    return np.interp(positions, np.arange(len(samples)) / sample_rate, samples).astype(np.float32), target_rate
+
+
+def get_audio_archive(config) -> Optional[AudioArchive]:
+    """
+    Return the process-wide archive, creating it on first use.
+
+    Args:
+        config: Configuration dictionary with the archive settings
+
+    Returns:
+        Optional[AudioArchive]: The archive, or None when 'keep_generated_file' is off
+    """
+    global _archive
+    if not config["keep_generated_file"]:
+        return None
+    if _archive is None:
+        _archive = AudioArchive(
+            config["sound_directory"],
+            config["audio_archive_format"],
+            config["audio_archive_max_mb"] * 1024 * 1024,
+            config["audio_archive_max_age_days"]
+        )
+    return _archive
+
+
+def close_audio_archive() -> dict:
+    """
+    Finish archiving and report the archive's counters.
+
+    Returns:
+        dict: Archive statistics (empty when nothing was archived)
+    """
+    if _archive is None:
+        return {}
+    _archive.close()
+    return _archive.stats()
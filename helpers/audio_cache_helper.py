@@ -0,0 +1,160 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+from helpers.audio_helper import AudioChunk
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Opened cache, shared by every synthesis in the process
+_cache = None
+# Serializes opening the cache, which the TTS preload thread and a turn may do at once
+_cache_lock = threading.Lock()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text so that trivially different strings share one cache entry.
+
+    Args:
+        text (str): Text that is about to be synthesized
+
+    Returns:
+        str: The text with surrounding whitespace removed and inner whitespace collapsed
+    """
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def audio_cache_key(text: str, config, params: dict = None) -> str:
+    """
+    Build the content address of a synthesized phrase.
+
+    Args:
+        text (str): Text that is about to be synthesized
+        config: Configuration dictionary with the 'bot_sound' model name
+        params (dict, optional): Extra synthesis parameters that change the audio
+
+    Returns:
+        str: Hex digest identifying the rendered audio
+    """
+    payload = json.dumps([normalize_text(text), config["bot_sound"], params or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_audio_cache(config):
+    """
+    Open the persistent audio cache, if it is enabled.
+
+    Args:
+        config: Configuration dictionary with the audio cache settings
+
+    Returns:
+        diskcache.Cache or None: The cache, or None when caching is disabled
+    """
+    global _cache
+    if not config["audio_cache"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            from diskcache import Cache
+            _cache = Cache(
+                config["audio_cache_directory"],
+                size_limit=config["audio_cache_size_mb"] * 1024 * 1024,
+                eviction_policy="least-recently-used"
+            )
+            _cache.stats(enable=True)
+    return _cache
+
+
+def get_cached_audio(text: str, config, params: dict = None) -> Optional[AudioChunk]:
+    """
+    Look up previously rendered audio for a phrase.
+
+    Args:
+        text (str): Text that is about to be synthesized
+        config: Configuration dictionary with the audio cache settings
+        params (dict, optional): Extra synthesis parameters that change the audio
+
+    Returns:
+        Optional[AudioChunk]: The cached audio, or None on a miss
+    """
+    cache = get_audio_cache(config)
+    if cache is None:
+        return None
+    try:
+        entry = cache.get(audio_cache_key(text, config, params))
+    except Exception as e:
+        logger.error(f"Failed to read audio cache: {str(e)}")
+        return None
+    if entry is None:
+        return None
+    data, sample_rate = entry
+    return np.frombuffer(data, dtype=np.float32), sample_rate
+
+
+def store_cached_audio(text: str, chunk: AudioChunk, config, params: dict = None) -> None:
+    """
+    Store rendered audio for a phrase.
+
+    Args:
+        text (str): The synthesized text
+        chunk (AudioChunk): The rendered audio
+        config: Configuration dictionary with the audio cache settings
+        params (dict, optional): Extra synthesis parameters that change the audio
+    """
+    cache = get_audio_cache(config)
+    if cache is None:
+        return
+    samples, sample_rate = chunk
+    try:
+        cache.set(audio_cache_key(text, config, params), (np.asarray(samples, dtype=np.float32).tobytes(), sample_rate))
+    except Exception as e:
+        logger.error(f"Failed to write audio cache: {str(e)}")
+
+
+def prewarm_audio_cache(phrases: Iterable[str], synthesize: Callable[[str], AudioChunk], config,
+                        params: dict = None) -> int:
+    """
+    Render known phrases ahead of time so their first use is a cache hit.
+
+    Args:
+        phrases (Iterable[str]): Phrases the bot is expected to say
+        synthesize (Callable[[str], AudioChunk]): Synthesis function that fills the cache
+        config: Configuration dictionary with the audio cache settings
+        params (dict, optional): Extra synthesis parameters that change the audio
+
+    Returns:
+        int: Number of phrases that had to be synthesized
+    """
+    cache = get_audio_cache(config)
+    if cache is None:
+        return 0
+    rendered = 0
+    for phrase in phrases:
+        if phrase.strip() and audio_cache_key(phrase, config, params) not in cache:
+            synthesize(phrase)
+            rendered += 1
+    logger.info(f"Pre-warmed audio cache with {rendered} new phrases")
+    return rendered
+
+
+def audio_cache_stats(config) -> dict:
+    """
+    Report audio cache counters.
+
+    Args:
+        config: Configuration dictionary with the audio cache settings
+
+    Returns:
+        dict: Hits, misses, entry count and size in bytes (empty when disabled or never opened)
+    """
+    # Reporting must not create the cache directory of a session that never spoke
+    if not config["audio_cache"] or _cache is None:
+        return {}
+    hits, misses = _cache.stats()
+    return {"hits": hits, "misses": misses, "entries": len(_cache), "size_bytes": _cache.volume()}
@@ -0,0 +1,452 @@
+import io
+import logging
+import queue
+import threading
+import time
+import wave
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from helpers.metrics_helper import mark, observe
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# A synthesized piece of audio: mono float32 samples in [-1, 1] and their sample rate
+AudioChunk = Tuple[np.ndarray, int]
+
+# Marks the end of a queue
+_END = object()
+
+
+def to_pcm16(samples: np.ndarray) -> bytes:
+    """
+    Convert float samples to 16-bit little-endian PCM bytes.
+
+    Args:
+        samples (np.ndarray): Mono float samples in [-1, 1]
+
+    Returns:
+        bytes: The PCM data
+    """
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def save_wav(samples: np.ndarray, sample_rate: int, file_path: str) -> None:
+    """
+    Write mono float samples to a 16-bit WAV file.
+
+    Args:
+        samples (np.ndarray): Mono float samples in [-1, 1]
+        sample_rate (int): Sample rate in Hz
+        file_path (str): Path of the WAV file to write, or a writable binary file object
+    """
+    with wave.open(file_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(to_pcm16(samples))
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """
+    Encode mono float samples as an in-memory 16-bit WAV file.
+
+    Args:
+        samples (np.ndarray): Mono float samples in [-1, 1]
+        sample_rate (int): Sample rate in Hz
+
+    Returns:
+        bytes: The WAV file contents
+    """
+    buffer = io.BytesIO()
+    save_wav(samples, sample_rate, buffer)
+    return buffer.getvalue()
+
+
+def load_wav(file_path: str) -> AudioChunk:
+    """
+    Read a 16-bit PCM WAV file into mono float samples.
+
+    Args:
+        file_path (str): Path of the WAV file to read
+
+    Returns:
+        AudioChunk: The samples and their sample rate
+    """
+    with wave.open(file_path, "rb") as wav_file:
+        channels = wav_file.getnchannels()
+        sample_rate = wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+class NullAudioSink:
+    """
+    Audio sink that discards audio, for running the pipeline headless.
+
+    When 'realtime' is set, play() sleeps for the duration of the chunk so
+    timings behave like a real device.
+    """
+
+    def __init__(self, realtime: bool = False):
+        self.realtime = realtime
+        self.played_seconds = 0.0
+        self.chunks_played = 0
+        self._stopped = threading.Event()
+
+    def play(self, samples: np.ndarray, sample_rate: int) -> None:
+        self._stopped.clear()
+        duration = len(samples) / sample_rate
+        if self.realtime:
+            self._stopped.wait(duration)
+        self.played_seconds += duration
+        self.chunks_played += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def stats(self) -> dict:
+        return {"underruns": 0, "frames_played": None, "latency": 0.0}
+
+    def close(self) -> None:
+        pass
+
+
+class SoundDeviceAudioSink:
+    """
+    Audio sink backed by one persistent sounddevice output stream.
+
+    The stream is opened on first use and kept running, outputting silence
+    while idle, so playback starts without device setup. Frames are fed from
+    the stream callback. Completion is signalled with events, from the
+    callback that runs once the last frame has reached the speaker (by the
+    stream's DAC timestamps), not when it was copied into the device buffer.
+    """
+
+    def __init__(self, latency="low"):
+        """
+        Args:
+            latency (optional): Requested device latency, "low", "high" or seconds. Defaults to "low".
+        """
+        import sounddevice
+        self._sounddevice = sounddevice
+        self.latency = latency
+        self.underruns = 0
+        self.frames_played = 0
+        self._stream = None
+        self._sample_rate = None
+        self._buffers: deque = deque()
+        # (stream time the last frame is heard, event) of fully consumed buffers
+        self._finishing: deque = deque()
+        self._lock = threading.Lock()
+        self._reported_underruns = 0
+
+    def _ensure_stream(self, sample_rate: int) -> None:
+        if self._stream is not None and self._sample_rate == sample_rate:
+            return
+        if self._stream is not None:
+            logger.info(f"Reopening audio stream for {sample_rate} Hz")
+            self.stop()
+            self._stream.close()
+        self._stream = self._sounddevice.OutputStream(
+            samplerate=sample_rate,
+            channels=1,
+            dtype="float32",
+            latency=self.latency,
+            callback=self._callback
+        )
+        self._stream.start()
+        self._sample_rate = sample_rate
+        logger.info(f"Opened audio stream at {sample_rate} Hz with {self._stream.latency * 1000:.1f} ms device latency")
+
+    def check_device(self) -> None:
+        """
+        Check that an output device is available.
+
+        Raises:
+            Exception: When sounddevice finds no output device
+        """
+        self._sounddevice.query_devices(kind="output")
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        if status.output_underflow:
+            self.underruns += 1
+        # Some host APIs report no DAC time; the stream latency estimates it then
+        output_time = time_info.outputBufferDacTime or time_info.currentTime + self._stream.latency
+        filled = 0
+        with self._lock:
+            while self._finishing and self._finishing[0][0] <= time_info.currentTime:
+                self._finishing.popleft()[1].set()
+            while filled < frames and self._buffers:
+                entry = self._buffers[0]
+                samples, offset, done = entry
+                count = min(frames - filled, len(samples) - offset)
+                outdata[filled:filled + count, 0] = samples[offset:offset + count]
+                filled += count
+                entry[1] = offset + count
+                if entry[1] >= len(samples):
+                    self._buffers.popleft()
+                    self._finishing.append((output_time + filled / self._sample_rate, done))
+        outdata[filled:] = 0
+        self.frames_played += filled
+
+    def write(self, samples: np.ndarray, sample_rate: int) -> threading.Event:
+        """
+        Queue frames for playback without waiting.
+
+        Args:
+            samples (np.ndarray): Mono float samples in [-1, 1]
+            sample_rate (int): Sample rate in Hz
+
+        Returns:
+            threading.Event: Set once the last frame has been played
+        """
+        self._ensure_stream(sample_rate)
+        done = threading.Event()
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        if not len(samples):
+            done.set()
+            return done
+        with self._lock:
+            self._buffers.append([samples, 0, done])
+        return done
+
+    def play(self, samples: np.ndarray, sample_rate: int) -> None:
+        done = self.write(samples, sample_rate)
+        done.wait()
+        if self.underruns > self._reported_underruns:
+            logger.warning(f"Audio output underruns: {self.underruns}")
+            self._reported_underruns = self.underruns
+
+    def stop(self) -> None:
+        with self._lock:
+            while self._buffers:
+                self._buffers.popleft()[2].set()
+            while self._finishing:
+                self._finishing.popleft()[1].set()
+
+    def stats(self) -> dict:
+        """
+        Report playback statistics.
+
+        Returns:
+            dict: Underrun count, frames played and device latency in seconds
+        """
+        return {
+            "underruns": self.underruns,
+            "frames_played": self.frames_played,
+            "latency": self._stream.latency if self._stream is not None else None
+        }
+
+    def close(self) -> None:
+        self.stop()
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+class PygameAudioSink:
+    """
+    Audio sink that plays in-memory buffers through the pygame mixer.
+
+    The mixer is initialized once per sample rate, and playback waits for the
+    known duration of the sound rather than polling the mixer.
+    """
+
+    def __init__(self):
+        import pygame
+        self._pygame = pygame
+        self._sample_rate = None
+        self._stopped = threading.Event()
+
+    def play(self, samples: np.ndarray, sample_rate: int) -> None:
+        pygame = self._pygame
+        if self._sample_rate != sample_rate:
+            if self._sample_rate is not None:
+                pygame.mixer.quit()
+            pygame.mixer.init(frequency=sample_rate, size=-16, channels=1)
+            self._sample_rate = sample_rate
+
+        self._stopped.clear()
+        sound = pygame.mixer.Sound(buffer=to_pcm16(samples))
+        sound.play()
+        self._stopped.wait(sound.get_length())
+        sound.stop()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def stats(self) -> dict:
+        return {"underruns": None, "frames_played": None, "latency": None}
+
+    def close(self) -> None:
+        self._pygame.mixer.quit()
+        self._sample_rate = None
+
+
+def create_audio_sink(config):
+    """
+    Create the audio sink selected by the 'audio_backend' setting.
+
+    The sounddevice backend falls back to pygame when no output device can be used.
+
+    Args:
+        config: Configuration dictionary with the 'audio_backend' and 'audio_latency' settings
+
+    Returns:
+        An audio sink with play() and stop() methods
+    """
+    backend = config["audio_backend"]
+    if backend == "null":
+        return NullAudioSink()
+    if backend == "sounddevice":
+        latency = config["audio_latency"]
+        try:
+            latency = float(latency)
+        except ValueError:
+            pass
+        try:
+            sink = SoundDeviceAudioSink(latency)
+            sink.check_device()
+            return sink
+        except Exception as e:
+            logger.warning(f"sounddevice backend unavailable, using pygame: {str(e)}")
+    elif backend != "pygame":
+        logger.warning(f"Unknown audio backend '{backend}', using pygame")
+    return PygameAudioSink()
+
+
+class AudioPipeline:
+    """
+    Overlaps speech synthesis and playback.
+
+    Text submitted to the pipeline is synthesized by one worker thread into a
+    bounded queue of audio chunks that a second worker plays, so the next
+    chunk is synthesized while the current one is playing.
+    """
+
+    def __init__(self, synthesize: Callable[[str], AudioChunk], sink, max_queued_chunks: int = 4,
+                 keep_audio: bool = False):
+        """
+        Args:
+            synthesize (Callable[[str], AudioChunk]): Turns one piece of text into audio
+            sink: Audio sink the chunks are played on
+            max_queued_chunks (int, optional): Synthesized chunks allowed to wait for playback. Defaults to 4.
+            keep_audio (bool, optional): Whether to keep every chunk for saving. Defaults to False.
+        """
+        self.synthesize = synthesize
+        self.sink = sink
+        self.keep_audio = keep_audio
+        self.chunks: list = []
+        self._texts: queue.Queue = queue.Queue()
+        self._audio: queue.Queue = queue.Queue(maxsize=max(1, max_queued_chunks))
+        self._cancelled = threading.Event()
+        self._synthesis_thread = threading.Thread(target=self._synthesis_worker, name="tts-synthesis", daemon=True)
+        self._playback_thread = threading.Thread(target=self._playback_worker, name="tts-playback", daemon=True)
+
+    def start(self) -> "AudioPipeline":
+        self._synthesis_thread.start()
+        self._playback_thread.start()
+        return self
+
+    def submit(self, text: str) -> None:
+        """Queue a piece of text for synthesis and playback."""
+        if text and text.strip():
+            self._texts.put(text)
+
+    def close(self) -> None:
+        """Signal that no more text will be submitted."""
+        self._texts.put(_END)
+
+    def wait(self) -> None:
+        """
+        Block until everything submitted has been played.
+
+        Ctrl+C cancels the remaining audio instead of raising.
+        """
+        try:
+            while self._playback_thread.is_alive():
+                self._playback_thread.join(0.1)
+        except KeyboardInterrupt:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Stop playback and drop all pending text and audio."""
+        self._cancelled.set()
+        self.sink.stop()
+        for pending in (self._texts, self._audio):
+            try:
+                while True:
+                    pending.get_nowait()
+            except queue.Empty:
+                pass
+        self._texts.put(_END)
+        self._put_audio(_END)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def audio(self) -> Optional[AudioChunk]:
+        """
+        Return all kept chunks joined together.
+
+        Returns:
+            Optional[AudioChunk]: The joined audio, or None when nothing was kept
+        """
+        if not self.chunks:
+            return None
+        sample_rate = self.chunks[0][1]
+        return np.concatenate([samples for samples, _ in self.chunks]), sample_rate
+
+    def _put_audio(self, item) -> None:
+        # Never block forever on a full queue once the pipeline is cancelled
+        while True:
+            try:
+                self._audio.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._cancelled.is_set():
+                    try:
+                        self._audio.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _synthesis_worker(self) -> None:
+        try:
+            while (text := self._texts.get()) is not _END:
+                if self._cancelled.is_set():
+                    break
+                start = time.perf_counter()
+                chunk = self.synthesize(text)
+                elapsed = time.perf_counter() - start
+                observe("synthesis", elapsed)
+                logger.info(f"Synthesized {len(text)} characters in {elapsed:.2f}s")
+                if self.keep_audio:
+                    self.chunks.append(chunk)
+                if not self._cancelled.is_set():
+                    self._put_audio(chunk)
+        except Exception as e:
+            logger.error(f"Speech synthesis failed: {str(e)}")
+        finally:
+            self._put_audio(_END)
+
+    def _playback_worker(self) -> None:
+        try:
+            while (chunk := self._audio.get()) is not _END:
+                if self._cancelled.is_set():
+                    continue
+                samples, sample_rate = chunk
+                mark("first_audio")
+                start = time.perf_counter()
+                self.sink.play(samples, sample_rate)
+                observe("playback", time.perf_counter() - start)
+        except Exception as e:
+            logger.error(f"Audio playback failed: {str(e)}")
+            # Nothing consumes the audio queue any more, so synthesis must not wait for room
+            self._cancelled.set()
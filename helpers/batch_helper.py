@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from helpers.audio_helper import save_wav
+from helpers.chat_helper import ERROR_ANSWER, generate
+from helpers.chat_history_helper import create_chat_history
+from helpers.tts_helper import split_sentences
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+PROMPT_FILE_EXTENSIONS = (".md", ".txt")
+TRANSCRIPT_FILE = "transcript.jsonl"
+SUMMARY_FILE = "summary.json"
+
+
+def load_prompts(path: str) -> list:
+    """
+    Read the user prompts of a scripted conversation.
+
+    Markdown chats like example_chats/LyingAI.md use '**You:**' blocks; any
+    other file is read as one prompt per non-empty line.
+
+    Args:
+        path (str): Path of the script file
+
+    Returns:
+        list: The prompts, in order
+    """
+    with open(path, encoding="utf-8") as file:
+        text = file.read()
+    if path.endswith(".md"):
+        blocks = re.findall(r"\*\*You:\*\*\s*\n(.*?)(?=\n\s*\*\*[^*\n]+:\*\*|\n---|\Z)", text, flags=re.DOTALL)
+        return [block.strip() for block in blocks if block.strip()]
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def find_conversations(path: str, independent: bool = False) -> list:
+    """
+    Collect the conversations of a prompt file or a directory of prompt files.
+
+    Every file is one conversation whose prompts share a chat history. Its
+    name is the file's path relative to 'path', so a rerun finds the same
+    output directory.
+
+    Args:
+        path (str): A prompt file, or a directory searched for .md and .txt files
+        independent (bool, optional): Make every prompt a conversation of its own. Defaults to False.
+
+    Returns:
+        list: (name, prompts) pairs, sorted by name
+    """
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(directory, file_name)
+            for directory, _, file_names in os.walk(path)
+            for file_name in file_names
+            if file_name.endswith(PROMPT_FILE_EXTENSIONS)
+        )
+        root = path
+    else:
+        files = [path]
+        root = os.path.dirname(path)
+
+    conversations = []
+    for file_path in files:
+        name = re.sub(r"[^\w.-]+", "_", os.path.splitext(os.path.relpath(file_path, root))[0])
+        prompts = load_prompts(file_path)
+        if independent:
+            conversations.extend((f"{name}-{number:04d}", [prompt]) for number, prompt in enumerate(prompts, 1))
+        elif prompts:
+            conversations.append((name, prompts))
+    return conversations
+
+
+def load_records(file_path: str) -> list:
+    """
+    Read the finished turns of a batch conversation.
+
+    Args:
+        file_path (str): Path of the conversation's transcript
+
+    Returns:
+        list: The turn records, in order; a record cut short by an interruption ends the list
+    """
+    records = []
+    if not os.path.exists(file_path):
+        return records
+    with open(file_path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Ignoring damaged record in {file_path}")
+                break
+    return records
+
+
+class BatchRunner:
+    """
+    Runs scripted conversations without a user, writing transcripts and audio.
+
+    Up to 'concurrency' conversations generate at once, each with its own
+    chat history. Their sentences go to a shared synthesis scheduler, and a
+    conversation generates its next answer while the previous one is being
+    synthesized. A turn is recorded in <output>/<conversation>/transcript.jsonl
+    only after its audio is written, so an interrupted run continues from the
+    first missing turn when started again.
+    """
+
+    def __init__(self, config, client, synthesis=None, output_directory: str = "batch-output", concurrency: int = 4):
+        """
+        Args:
+            config: Configuration dictionary
+            client: LLM client shared by all conversations
+            synthesis (SynthesisScheduler, optional): Scheduler for the audio; None writes transcripts only
+            output_directory (str, optional): Directory for the conversations' output. Defaults to "batch-output".
+            concurrency (int, optional): Conversations generated at once. Defaults to 4.
+        """
+        self.config = config
+        self.client = client
+        self.synthesis = synthesis
+        self.output_directory = output_directory
+        self.concurrency = max(1, concurrency)
+        self.prompts = 0
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+        self.generation_seconds = 0.0
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, conversations: list) -> dict:
+        """
+        Run the conversations and report throughput.
+
+        Args:
+            conversations (list): (name, prompts) pairs from find_conversations()
+
+        Returns:
+            dict: Throughput summary, also written to summary.json in the output directory
+        """
+        os.makedirs(self.output_directory, exist_ok=True)
+        self.prompts = sum(len(prompts) for _, prompts in conversations)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+                futures = [executor.submit(self._run_conversation, name, prompts) for name, prompts in conversations]
+                try:
+                    for future in futures:
+                        future.result()
+                except KeyboardInterrupt:
+                    logger.info("Batch interrupted, finishing the turns in progress")
+                    self.stop()
+                    for future in futures:
+                        future.cancel()
+        finally:
+            # The summary is written even when the run is cut short
+            summary = self.summary(time.perf_counter() - start)
+            with open(os.path.join(self.output_directory, SUMMARY_FILE), "w") as file:
+                json.dump(summary, file, indent=2)
+            logger.info(f"Batch summary: {summary}")
+        return summary
+
+    def stop(self) -> None:
+        """Stop starting new turns; turns already generated are still written."""
+        self._stopping.set()
+
+    def _run_conversation(self, name: str, prompts: list) -> None:
+        directory = os.path.join(self.output_directory, name)
+        os.makedirs(directory, exist_ok=True)
+        transcript_path = os.path.join(directory, TRANSCRIPT_FILE)
+        records = load_records(transcript_path)[:len(prompts)]
+        for number, record in enumerate(records):
+            if record["user_prompt"] != prompts[number]:
+                # The script changed here, so this answer and the ones after it no longer apply
+                logger.warning(f"Prompts of {name} changed at turn {number + 1}, continuing from there")
+                records = records[:number]
+                break
+        history = create_chat_history(self.config)
+        for record in records:
+            history.add_turn(record["user_prompt"], record["raw_answer"], record["user_prompt_date"], record["answer_date"])
+        with self._lock:
+            self.skipped += len(records)
+        if len(records) == len(prompts):
+            return
+
+        # Rewriting drops a damaged last line or the records of a changed script. The
+        # rewrite replaces the transcript in one step, so the finished turns are never lost.
+        temporary_path = f"{transcript_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as transcript:
+            transcript.writelines(json.dumps(record) + "\n" for record in records)
+        os.replace(temporary_path, transcript_path)
+
+        finished = len(records)
+        failed = False
+        pending = None
+        with open(transcript_path, "a", encoding="utf-8") as transcript:
+            for turn, user_prompt in enumerate(prompts[len(records):], len(records) + 1):
+                if self._stopping.is_set():
+                    break
+                try:
+                    current = self._generate_turn(name, turn, user_prompt, history)
+                except Exception as e:
+                    logger.error(f"Batch conversation {name} failed at turn {turn}: {str(e)}")
+                    failed = True
+                    break
+                # The previous turn's audio was synthesized while this answer was generated
+                if pending is not None:
+                    if not self._finish_turn(name, directory, transcript, *pending):
+                        for future in current[1]:
+                            future.cancel()
+                        pending = None
+                        failed = True
+                        break
+                    finished += 1
+                pending = current
+            # An answer generated before a failure is still recorded
+            if pending is not None:
+                if self._finish_turn(name, directory, transcript, *pending):
+                    finished += 1
+                else:
+                    failed = True
+        if failed:
+            # Turns are recorded in order, so the conversation stops at its first failed turn
+            with self._lock:
+                self.failed += len(prompts) - finished
+
+    def _generate_turn(self, name: str, turn: int, user_prompt: str, history) -> tuple:
+        user_prompt_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        start = time.perf_counter()
+        raw_answer = generate(user_prompt, history.chat_messages(), self.client, self.config)
+        elapsed = time.perf_counter() - start
+        if raw_answer == ERROR_ANSWER:
+            raise RuntimeError("generation failed")
+        answer_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        history.add_turn(user_prompt, raw_answer, user_prompt_date, answer_date)
+        answer = raw_answer
+        if self.config["remove_deepseek_think_tags"]:
+            answer = re.sub(r"<think>.*?</think>", "", answer, flags=re.DOTALL)
+
+        futures = []
+        if self.synthesis is not None:
+            futures = [self.synthesis.submit(sentence, name) for sentence in split_sentences([answer]) if sentence.strip()]
+        record = {
+            "turn": turn,
+            "user_prompt": user_prompt,
+            "user_prompt_date": user_prompt_date,
+            "answer_date": answer_date,
+            "raw_answer": raw_answer,
+            "answer": answer,
+            "model": self.config["chat_model_name"],
+            "generation_seconds": round(elapsed, 3),
+        }
+        with self._lock:
+            self.generation_seconds += elapsed
+        return record, futures
+
+    def _finish_turn(self, name: str, directory: str, transcript, record: dict, futures: list) -> bool:
+        try:
+            if futures:
+                chunks = [future.result() for future in futures]
+                sample_rate = chunks[0][1]
+                samples = np.concatenate([chunk_samples for chunk_samples, _ in chunks])
+                file_name = f"{record['turn']:04d}.wav"
+                temporary_path = os.path.join(directory, f"{file_name}.tmp")
+                save_wav(samples, sample_rate, temporary_path)
+                os.replace(temporary_path, os.path.join(directory, file_name))
+                record["audio_file"] = file_name
+                record["audio_seconds"] = round(len(samples) / sample_rate, 3)
+            transcript.write(json.dumps(record) + "\n")
+            transcript.flush()
+        except Exception as e:
+            logger.error(f"Batch conversation {name} failed at turn {record['turn']}: {str(e)}")
+            for future in futures:
+                future.cancel()
+            return False
+        with self._lock:
+            self.completed += 1
+            self.audio_seconds += record.get("audio_seconds", 0.0)
+        return True
+
+    def summary(self, wall_seconds: Optional[float] = None) -> dict:
+        """
+        Report the batch's throughput.
+
+        Args:
+            wall_seconds (float, optional): Duration of the run
+
+        Returns:
+            dict: Prompt counts, prompts per minute and audio seconds per wall second
+        """
+        wall_seconds = wall_seconds or 0.0
+        summary = {
+            "prompts": self.prompts,
+            "completed": self.completed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "wall_seconds": round(wall_seconds, 3),
+            "prompts_per_minute": round(self.completed * 60 / wall_seconds, 2) if wall_seconds else 0.0,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "audio_seconds_per_wall_second": round(self.audio_seconds / wall_seconds, 3) if wall_seconds else 0.0,
+            "generation_seconds": round(self.generation_seconds, 3),
+        }
+        if self.synthesis is not None:
+            summary["synthesis"] = self.synthesis.stats()
+        return summary
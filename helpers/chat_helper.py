@@ -1,16 +1,52 @@
-from helpers.memory_helper import run_garbage_collection
+from helpers.metrics_helper import mark, observe
+from helpers.response_cache_helper import get_cached_response, store_cached_response
+import asyncio
 import logging
+import threading
+import time
+from typing import AsyncIterator, Iterable, Iterator
 
 # Set up logging configuration
 logger = logging.getLogger(__name__)
 
-def generate(user_prompt: str, chat_history: str, client, config) -> str:
+# Answer returned to the user when the model request fails
+ERROR_ANSWER = "I apologize, but I encountered an error while processing your request."
+
+THINK_OPEN_TAG = "<think>"
+THINK_CLOSE_TAG = "</think>"
+
+
+def build_request(user_prompt: str, chat_history: list, config) -> dict:
+    """
+    Build the keyword arguments for a chat completion request.
+
+    Args:
+        user_prompt (str): The user's input message
+        chat_history (list): Previous conversation as role messages, from ChatHistory.chat_messages()
+        config: Configuration dictionary
+
+    Returns:
+        dict: Arguments for client.chat.completions.create
+    """
+    messages = list(chat_history) + [{"role": "user", "content": user_prompt}]
+    return {
+        "model": config["chat_model_name"],
+        "messages": messages,
+        "temperature": config["temperature"],
+        "max_tokens": config["max_tokens"],
+        "top_p": config["top_p"],
+        "frequency_penalty": 0,
+        "presence_penalty": 0
+    }
+
+
+def generate(user_prompt: str, chat_history: list, client, config) -> str:
     """
     Generate a response using the OpenAI API.
 
     Args:
         user_prompt (str): The user's input message
-        chat_history (str): Previous conversation history
+        chat_history (list): Previous conversation as role messages, from ChatHistory.chat_messages()
         client: OpenAI client instance
         config: Configuration dictionary
 
@@ -18,23 +54,158 @@ def generate(user_prompt: str, chat_history: str, client, config) -> str:
         str: Generated response
     """
     try:
-        messages = [
-            {"role": "system", "content": chat_history},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        response = client.chat.completions.create(
-            model=config["chat_model_name"],
-            messages=messages,
-            temperature=0.7,
-            max_tokens=800,
-            top_p=0.95,
-            frequency_penalty=0,
-            presence_penalty=0
-        )
-        
-        return response.choices[0].message.content
-        
+        request = build_request(user_prompt, chat_history, config)
+        cached = get_cached_response(request, config)
+        if cached is not None:
+            mark("first_token")
+            mark("generation_end")
+            return "".join(cached)
+
+        start = time.perf_counter()
+        response = client.chat.completions.create(**request)
+        observe("request", time.perf_counter() - start)
+        mark("first_token")
+        mark("generation_end")
+
+        answer = response.choices[0].message.content
+        # Empty and tool-call responses have no text worth replaying
+        if isinstance(answer, str) and answer.strip() and answer != ERROR_ANSWER:
+            store_cached_response(request, [answer], config)
+        return answer
+
     except Exception as e:
         logger.error(f"Error generating response: {str(e)}")
-        return "I apologize, but I encountered an error while processing your request."
+        return ERROR_ANSWER
+
+
+def generate_stream(user_prompt: str, chat_history: list, client, config) -> Iterator[str]:
+    """
+    Generate a response using the OpenAI API, yielding text as it arrives.
+
+    Args:
+        user_prompt (str): The user's input message
+        chat_history (list): Previous conversation as role messages, from ChatHistory.chat_messages()
+        client: OpenAI client instance
+        config: Configuration dictionary
+
+    Yields:
+        str: Text deltas of the generated response
+    """
+    received = []
+    try:
+        request = build_request(user_prompt, chat_history, config)
+        cached = get_cached_response(request, config)
+        if cached is not None:
+            # Replay the cached deltas so the speech pipeline sees the same stream
+            mark("first_token")
+            yield from cached
+            mark("generation_end")
+            return
+
+        start = time.perf_counter()
+        stream = client.chat.completions.create(**request, stream=True)
+        observe("request", time.perf_counter() - start)
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not received:
+                    mark("first_token")
+                received.append(delta)
+                yield delta
+        mark("generation_end")
+        if "".join(received).strip():
+            store_cached_response(request, received, config)
+
+    except Exception as e:
+        logger.error(f"Error generating response: {str(e)}")
+        if not received:
+            yield ERROR_ANSWER
+
+
+async def agenerate_stream(user_prompt: str, chat_history: list, client, config) -> AsyncIterator[str]:
+    """
+    Generate a response without blocking the event loop, yielding text as it arrives.
+
+    generate_stream runs on a daemon thread, so the asyncio engine gets the
+    same backends, retries, response cache and metrics as the terminal loop.
+    Closing the iterator, e.g. on barge-in, stops reading the response.
+
+    Args:
+        user_prompt (str): The user's input message
+        chat_history (list): Previous conversation as role messages, from ChatHistory.chat_messages()
+        client: Client from create_chat_client()
+        config: Configuration dictionary
+
+    Yields:
+        str: Text deltas of the generated response
+    """
+    loop = asyncio.get_running_loop()
+    deltas: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def deliver(item) -> None:
+        try:
+            loop.call_soon_threadsafe(deltas.put_nowait, item)
+        except RuntimeError:
+            # The event loop has already been closed
+            pass
+
+    def produce() -> None:
+        stream = generate_stream(user_prompt, chat_history, client, config)
+        try:
+            for delta in stream:
+                if stop.is_set():
+                    break
+                deliver(delta)
+        finally:
+            stream.close()
+            deliver(None)
+
+    threading.Thread(target=produce, name="llm-stream", daemon=True).start()
+    try:
+        while (delta := await deltas.get()) is not None:
+            yield delta
+    finally:
+        stop.set()
+
+
+def strip_think_tags_stream(deltas: Iterable[str]) -> Iterator[str]:
+    """
+    Remove <think>...</think> blocks from a stream of text deltas.
+
+    Tags may be split across deltas, so text that could be the start of a tag
+    is held back until the next delta arrives.
+
+    Args:
+        deltas (Iterable[str]): Text deltas of a response
+
+    Yields:
+        str: Text deltas with thinking blocks removed
+    """
+    buffer = ""
+    thinking = False
+    for delta in deltas:
+        buffer += delta
+        while buffer:
+            tag = THINK_CLOSE_TAG if thinking else THINK_OPEN_TAG
+            index = buffer.find(tag)
+            if index >= 0:
+                if not thinking and index:
+                    yield buffer[:index]
+                buffer = buffer[index + len(tag):]
+                thinking = not thinking
+                continue
+            # Keep a possible partial tag at the end of the buffer
+            keep = 0
+            for length in range(min(len(tag) - 1, len(buffer)), 0, -1):
+                if tag.startswith(buffer[-length:]):
+                    keep = length
+                    break
+            if not thinking and len(buffer) > keep:
+                yield buffer[:len(buffer) - keep]
+            buffer = buffer[len(buffer) - keep:] if keep else ""
+            break
+    if buffer and not thinking:
+        yield buffer
@@ -1,56 +1,173 @@
 import logging
+from collections import deque
+from itertools import islice
 from datetime import datetime
+from typing import Callable, Optional
 # Set up logging configuration
 logger = logging.getLogger(__name__)
 
-def manage_chat_history(user_prompt: str, answer: str, chat_history: list, initial_content: str, bot_name: str, memory: int, user_date_time_str: str, answer_date_time_str: str) -> list:
+
+def estimate_tokens(text: str) -> int:
     """
-    Update the chat history with the latest user prompt and assistant answer.
+    Estimate how many model tokens a piece of text uses.
+
+    Uses the common approximation of four characters per token, which is close
+    enough for budgeting without loading the model's tokenizer.
 
     Args:
-        user_prompt (str): The latest user input.
-        answer (str): The assistant's response.
-        chat_history (list): Current list of chat history messages.
-        initial_content (str): Initial content of the chat.
-        bot_name (str): Name of the bot.
-        memory (int): Number of messages to keep in history.
-        user_date_time_str (str): Date and time string for user prompt.
-        answer_date_time_str (str): Date and time string for assistant answer.
+        text (str): The text to measure
 
     Returns:
-        list: Updated chat history.
+        int: Estimated token count
+    """
+    return max(1, (len(text) + 3) // 4)
+
+
+class ChatHistory:
     """
+    Conversation history kept in a bounded buffer.
+
+    The system prompt is pinned and never evicted. Each message is measured
+    once when it is added, so building the prompt only has to pick the newest
+    messages that fit into the token budget. Evicted messages are passed to
+    'on_evict', e.g. to be summarized into long-term memory.
+
+    The buffer holds 'capacity' messages plus a small 'headroom' more. Once
+    it is full, the oldest messages are dropped in one block, back down to
+    'capacity', rather than one per turn. Likewise, when the history outgrows
+    the token budget, a quarter of the budget is freed at once. The start of
+    the prompt then stays the same for several turns, so servers and the
+    in-process backend can reuse their cached prefix.
+    """
+
+    def __init__(self, system_prompt: str, capacity: int, token_budget: int, headroom: Optional[int] = None):
+        """
+        Args:
+            system_prompt (str): Initial instructions, always included in the prompt
+            capacity (int): Number of messages always kept
+            token_budget (int): Maximum estimated tokens of the history sent to the model
+            headroom (int, optional): Messages kept beyond 'capacity' before a block is evicted.
+                                      Defaults to a quarter of 'capacity', at least one turn.
+        """
+        self.token_budget = token_budget
+        self.capacity = max(1, capacity)
+        # An even headroom evicts whole turns
+        headroom = self.capacity // 4 if headroom is None else headroom
+        self.headroom = max(2, headroom + headroom % 2)
+        self.system_prompt = system_prompt
+        self.system_message = {"role": "user", "content": system_prompt}
+        self._system_tokens = estimate_tokens(system_prompt)
+        # Entries are (message, estimated tokens, undated content)
+        self._entries: deque = deque()
+        self._evicted = 0
+        # Absolute number of the first message sent to the model
+        self._window_start = 0
+        self.on_evict: Optional[Callable[[dict], None]] = None
+
+    def append(self, role: str, content: str, date_time_str: str) -> None:
+        """
+        Add one message, evicting the oldest block when the buffer is full.
+
+        Args:
+            role (str): "user" or "assistant"
+            content (str): The message text
+            date_time_str (str): Date and time string stored with the message
+        """
+        if len(self._entries) >= self.capacity + self.headroom:
+            while len(self._entries) > self.capacity:
+                message = self._entries.popleft()[0]
+                self._evicted += 1
+                if self.on_evict is not None:
+                    self.on_evict(message)
+        message = {"role": role, "content": f"{date_time_str} : {content}"}
+        self._entries.append((message, estimate_tokens(content), content))
+
+    def add_turn(self, user_prompt: str, answer: str, user_date_time_str: str, answer_date_time_str: str) -> None:
+        """
+        Add the latest user prompt and assistant answer.
+
+        Args:
+            user_prompt (str): The latest user input.
+            answer (str): The assistant's response.
+            user_date_time_str (str): Date and time string for user prompt.
+            answer_date_time_str (str): Date and time string for assistant answer.
+        """
+        self.append("user", user_prompt, user_date_time_str)
+        self.append("assistant", answer, answer_date_time_str)
+        logger.debug(f"Chat history: {self.messages()}")
+
+    def messages(self) -> list:
+        """
+        Return the pinned system message followed by the buffered messages.
+
+        Returns:
+            list: Chat messages, oldest first
+        """
+        return [self.system_message] + [entry[0] for entry in self._entries]
+
+    def _window_offset(self, remaining: int) -> int:
+        # Keep the window start in place while everything after it fits
+        offset = max(0, self._window_start - self._evicted)
+        total = sum(entry[1] for entry in islice(self._entries, offset, None))
+        if total > remaining:
+            target = remaining - remaining // 4
+            while offset < len(self._entries) and total > target:
+                total -= self._entries[offset][1]
+                offset += 1
+        # Start with a user message so roles keep alternating
+        while offset < len(self._entries) and self._entries[offset][0]["role"] != "user":
+            offset += 1
+        return offset
+
+    def chat_messages(self, context: str = "") -> list:
+        """
+        Build the history as role messages for a chat completion request.
+
+        The system prompt comes first and the recent messages follow without
+        their timestamps, exactly as they were written and generated. Changing
+        context (such as retrieved long-term memory) comes last, so it never
+        breaks the cached prefix of the conversation.
+
+        Args:
+            context (str, optional): Text sent as a system message after the history. Defaults to "".
+
+        Returns:
+            list: Chat messages, oldest first; the new user message is appended by the caller
+        """
+        remaining = self.token_budget - self._system_tokens - (estimate_tokens(context) if context else 0)
+        offset = self._window_offset(remaining)
+        self._window_start = self._evicted + offset
+        messages = [{"role": "system", "content": self.system_prompt}]
+        messages.extend({"role": entry[0]["role"], "content": entry[2]} for entry in islice(self._entries, offset, None))
+        if context:
+            messages.append({"role": "system", "content": context})
+        return messages
+
+    def token_count(self) -> int:
+        """
+        Estimate the tokens of the history the next request would send, without context.
 
-    # Append the latest messages
-    chat_history.append({"role": "user", "content": f"{user_date_time_str} : {user_prompt}"})
-    chat_history.append({"role": "assistant", "content": f"{answer_date_time_str} : {answer}"})
-    logger.info(f"Chat history: {chat_history}")
-    # Truncate history to maintain memory limit
-    if len(chat_history) > memory:
-        chat_history = chat_history[-memory:]
-    
+        Returns:
+            int: Estimated token count
+        """
+        offset = self._window_offset(self.token_budget - self._system_tokens)
+        return self._system_tokens + sum(entry[1] for entry in islice(self._entries, offset, None))
 
-    return chat_history
 
-def get_formatted_history(chat_history: list, memory: int, bot_name: str) -> str:
+def create_chat_history(config) -> ChatHistory:
     """
-    Format the chat history for the model input.
+    Create the chat history for a new conversation.
 
     Args:
-        chat_history (list): List of chat messages.
-        memory (int): Number of messages to include.
-        bot_name (str): Name of the bot.
+        config: Configuration dictionary
 
     Returns:
-        str: Formatted chat history.
+        ChatHistory: History with the system prompt pinned
     """
-    # Slice the chat history to include only the last 'memory' messages
-    recent_history = chat_history[-memory:]
-
-    # Format the history as a single string
-    formatted_history = ""
-    for message in recent_history:
-        role = "User" if message["role"] == "user" else bot_name
-        formatted_history += f"{role}: {message['content']}\n"
-    
-    return formatted_history
\ No newline at end of file
+    now = datetime.now()
+    system_prompt = f"{config['initial_content'].format(bot_name=config['bot_name'])}\n\nCurrent date and time: {now.strftime('%Y-%m-%d %H:%M:%S')}"
+    return ChatHistory(
+        system_prompt,
+        config["memory_message_count"] * 2,
+        config["context_token_budget"]
+    )
@@ -1,7 +1,7 @@
 
 import os
+from typing import Callable, Optional
 from bgcolors import bcolors
-from helpers.memory_helper import run_garbage_collection
 
 
 def print_text(answer: str, config, headers: bool = True) -> None:
@@ -29,10 +29,13 @@ def print_text(answer: str, config, headers: bool = True) -> None:
             print("                  END OF SPEECH               ")
             print(f"=============================================={bcolors.ENDC}")
 
-def get_user_input(config) -> str:
+def get_user_input(config, on_prompt: Optional[Callable[[], None]] = None) -> str:
     """
     Get user input and return the prompt as a string.
 
+    Args:
+        on_prompt (Callable, optional): Called once the prompt is shown, before waiting for input
+
     Returns:
         str: The user's prompt
     """
@@ -40,6 +43,8 @@ def get_user_input(config) -> str:
     print(f"{bcolors.HEADER}{bcolors.BOLD}==============================================")
     print("                  USER PROMPT                 ")
     print(f"=============================================={bcolors.ENDC}")
+    if on_prompt is not None:
+        on_prompt()
     user_prompt: str = input(f"{bcolors.OKBLUE}Enter your prompt: {bcolors.ENDC}")
     print(f"{bcolors.HEADER}{bcolors.BOLD}==============================================")
     print("                END OF USER PROMPT            ")
@@ -51,7 +56,7 @@ def exit_program(config) -> None:
     """
     Exit the program gracefully.
 
-    This function runs the garbage collector, prints a message, plays a goodbye sound, and exits the program with code 0.
+    This function removes the temporary sound file, prints a message, and exits the program with code 0.
 
     Args:
         None
@@ -59,8 +64,6 @@ def exit_program(config) -> None:
     Returns:
         None
     """
-    run_garbage_collection()
-
     file_path = os.path.join(config['sound_directory'], "stream.wav")
     if os.path.exists(file_path):
         os.remove(file_path)
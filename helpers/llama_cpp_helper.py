@@ -0,0 +1,244 @@
+import logging
+import os
+import pickle
+import queue
+import threading
+import time
+from types import SimpleNamespace
+from typing import Iterator
+
+from helpers.startup_helper import import_phase
+
+# llama_cpp is imported when the backend is created, so the OpenAI backend does not need it
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+
+def _to_namespace(value):
+    # llama_cpp returns OpenAI-shaped dicts; callers use attribute access like with the OpenAI client
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+class _Completions:
+    def __init__(self, client: "LlamaCppClient"):
+        self._client = client
+
+    def create(self, **kwargs):
+        return self._client.create(**kwargs)
+
+
+class _Chat:
+    def __init__(self, client: "LlamaCppClient"):
+        self.completions = _Completions(client)
+
+
+class LlamaCppClient:
+    """
+    Runs a GGUF model in this process with llama.cpp.
+
+    The client exposes client.chat.completions.create like an OpenAI client.
+    llama.cpp keeps the evaluated tokens in its KV cache and only evaluates
+    the part of the next prompt that differs, so a conversation whose prompt
+    prefix stays stable only pays for the new messages. A RAM cache of KV
+    states lets other requests, like memory summaries, run in between
+    without losing the conversation's state. The state is saved to disk on
+    close and restored on start.
+    """
+
+    def __init__(self, model_path: str, n_ctx: int = 4096, n_gpu_layers: int = 0, n_threads: int = 0,
+                 chat_format: str = "", cache_mb: int = 512, state_file: str = ""):
+        """
+        Args:
+            model_path (str): Path of the GGUF model file
+            n_ctx (int, optional): Context window in tokens. Defaults to 4096.
+            n_gpu_layers (int, optional): Layers offloaded to the GPU; -1 offloads all. Defaults to 0.
+            n_threads (int, optional): CPU threads; 0 lets llama.cpp decide. Defaults to 0.
+            chat_format (str, optional): llama_cpp chat format; empty uses the model's template. Defaults to "".
+            cache_mb (int, optional): Size of the RAM cache of KV states; 0 disables. Defaults to 512.
+            state_file (str, optional): File the KV state is saved to and restored from; empty disables. Defaults to "".
+        """
+        with import_phase("llama_cpp"):
+            from llama_cpp import Llama, LlamaRAMCache
+
+        start = time.perf_counter()
+        self.llm = Llama(
+            model_path=model_path,
+            n_ctx=n_ctx,
+            n_gpu_layers=n_gpu_layers,
+            n_threads=n_threads or None,
+            chat_format=chat_format or None,
+            verbose=False
+        )
+        logger.info(f"Loaded {model_path} with llama.cpp in {time.perf_counter() - start:.2f}s")
+        if cache_mb:
+            self.llm.set_cache(LlamaRAMCache(capacity_bytes=cache_mb * 1024 * 1024))
+        self.model_path = model_path
+        self.state_file = state_file
+        self.chat = _Chat(self)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.reused_tokens = 0
+        self.last_reused_tokens = 0
+        # One sequence of KV state, so requests run one at a time
+        self._lock = threading.Lock()
+        self._evaluation = None
+        self._wrap_eval()
+        self._restore_state()
+
+    def _wrap_eval(self) -> None:
+        # The first eval of a request receives only the prompt tokens that were not
+        # reused; llm.n_tokens then holds how many were
+        original_eval = self.llm.eval
+
+        def counting_eval(tokens):
+            if self._evaluation is not None and "evaluated" not in self._evaluation:
+                self._evaluation["reused"] = self.llm.n_tokens
+                self._evaluation["evaluated"] = len(tokens)
+            return original_eval(tokens)
+
+        self.llm.eval = counting_eval
+
+    def create(self, **kwargs):
+        """
+        Create a chat completion.
+
+        Args:
+            **kwargs: Arguments of client.chat.completions.create; the model name is ignored
+
+        Returns:
+            The completion, or an iterator of chunks when stream=True
+        """
+        request = {
+            "messages": kwargs["messages"],
+            "temperature": kwargs.get("temperature", 0.7),
+            "top_p": kwargs.get("top_p", 0.95),
+            "max_tokens": kwargs.get("max_tokens"),
+            "frequency_penalty": kwargs.get("frequency_penalty", 0.0),
+            "presence_penalty": kwargs.get("presence_penalty", 0.0),
+        }
+        if kwargs.get("stream"):
+            return self._stream(request)
+        with self._lock:
+            self._begin()
+            try:
+                response = self.llm.create_chat_completion(**request)
+            finally:
+                self._end()
+        return _to_namespace(response)
+
+    def _stream(self, request: dict) -> Iterator:
+        # Generation holds the lock on its own thread, so a consumer that stops
+        # reading or fails can never keep the model locked
+        chunks: queue.Queue = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            with self._lock:
+                self._begin()
+                try:
+                    for chunk in self.llm.create_chat_completion(**request, stream=True):
+                        if stop.is_set():
+                            break
+                        chunks.put(chunk)
+                except Exception as e:
+                    chunks.put(e)
+                finally:
+                    self._end()
+                    chunks.put(None)
+
+        threading.Thread(target=produce, name="llama-stream", daemon=True).start()
+        try:
+            while (chunk := chunks.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield _to_namespace(chunk)
+        finally:
+            stop.set()
+
+    def _begin(self) -> None:
+        self._evaluation = {}
+
+    def _end(self) -> None:
+        evaluation, self._evaluation = self._evaluation, None
+        if "evaluated" not in evaluation:
+            return
+        self.requests += 1
+        self.prompt_tokens += evaluation["reused"] + evaluation["evaluated"]
+        self.reused_tokens += evaluation["reused"]
+        self.last_reused_tokens = evaluation["reused"]
+        logger.info(f"Prompt evaluation reused {evaluation['reused']} tokens, evaluated {evaluation['evaluated']}")
+
+    def _restore_state(self) -> None:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            start = time.perf_counter()
+            with open(self.state_file, "rb") as file:
+                model_path, state = pickle.load(file)
+            if model_path != self.model_path:
+                logger.info(f"Saved llama.cpp state belongs to {model_path}, not restoring it")
+                return
+            self.llm.load_state(state)
+            logger.info(f"Restored {self.llm.n_tokens} tokens of llama.cpp state in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"Failed to restore llama.cpp state: {str(e)}")
+
+    def save_state(self) -> None:
+        """Save the KV state, so a resumed conversation does not evaluate its history again."""
+        if not self.state_file:
+            return
+        with self._lock:
+            try:
+                start = time.perf_counter()
+                state = self.llm.save_state()
+                temporary_path = f"{self.state_file}.tmp"
+                with open(temporary_path, "wb") as file:
+                    pickle.dump((self.model_path, state), file)
+                os.replace(temporary_path, self.state_file)
+                logger.info(f"Saved {self.llm.n_tokens} tokens of llama.cpp state in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                logger.error(f"Failed to save llama.cpp state: {str(e)}")
+
+    def stats(self) -> dict:
+        """
+        Report prompt evaluation savings.
+
+        Returns:
+            dict: Requests, prompt tokens, tokens reused from the KV cache and the reuse ratio
+        """
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "reused_tokens": self.reused_tokens,
+            "reuse_ratio": self.reused_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+        }
+
+    def close(self) -> None:
+        self.save_state()
+        self.llm.close()
+
+
+def create_llama_cpp_client(config) -> LlamaCppClient:
+    """
+    Create the in-process llama.cpp backend from the configuration.
+
+    Args:
+        config: Configuration dictionary with the llama.cpp settings
+
+    Returns:
+        LlamaCppClient: The client
+    """
+    return LlamaCppClient(
+        config["llama_model_path"],
+        config["llama_n_ctx"],
+        config["llama_n_gpu_layers"] if config["use_gpu"] else 0,
+        config["llama_n_threads"],
+        config["llama_chat_format"],
+        config["llama_cache_mb"],
+        config["llama_state_file"]
+    )
@@ -0,0 +1,417 @@
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Iterator, Optional
+
+import httpx
+from openai import OpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the moving latency averages
+EWMA_ALPHA = 0.3
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else (1 - EWMA_ALPHA) * current + EWMA_ALPHA * sample
+
+
+class Backend:
+    """
+    One OpenAI-compatible inference server with a pooled keep-alive HTTP client.
+    """
+
+    def __init__(self, base_url: str, api_key: str, pool_connections: int = 10, timeout: float = 120.0):
+        """
+        Args:
+            base_url (str): Base URL of the OpenAI-compatible API
+            api_key (str): API key sent to the server
+            pool_connections (int, optional): Keep-alive connections kept open. Defaults to 10.
+            timeout (float, optional): Request timeout in seconds. Defaults to 120.
+        """
+        self.base_url = base_url
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=pool_connections, max_keepalive_connections=pool_connections),
+            timeout=timeout
+        )
+        # Retries are handled by the router so they can move to another backend
+        self.client = OpenAI(base_url=base_url, api_key=api_key, http_client=self.http_client, max_retries=0)
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.hedges_won = 0
+        self.latency = None
+        self.ttft = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def begin(self) -> float:
+        with self._lock:
+            self.outstanding += 1
+            self.requests += 1
+        return time.perf_counter()
+
+    def end(self, start: float, error: Exception = None) -> None:
+        with self._lock:
+            self.outstanding -= 1
+            if error is not None:
+                self.errors += 1
+                self.last_error = str(error)
+            else:
+                self.latency = _ewma(self.latency, time.perf_counter() - start)
+
+    def record_ttft(self, seconds: float) -> None:
+        with self._lock:
+            self.ttft = _ewma(self.ttft, seconds)
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "hedges_won": self.hedges_won,
+            "latency": self.latency,
+            "ttft": self.ttft,
+            "last_error": self.last_error,
+        }
+
+    def close(self) -> None:
+        self.http_client.close()
+
+
+class _Completions:
+    def __init__(self, router: "LLMRouter"):
+        self._router = router
+
+    def create(self, **kwargs):
+        return self._router.create(**kwargs)
+
+
+class _Chat:
+    def __init__(self, router: "LLMRouter"):
+        self.completions = _Completions(router)
+
+
+class LLMRouter:
+    """
+    Spreads chat completions over several OpenAI-compatible backends.
+
+    The router exposes client.chat.completions.create like an OpenAI client.
+    It selects a healthy backend by outstanding requests or latency, retries
+    failures on other backends with exponential backoff, and can hedge a
+    request to a second backend when the first is slow to respond.
+    """
+
+    def __init__(self, backends: list, selection: str = "least_outstanding", retries: int = 2,
+                 retry_backoff: float = 0.5, hedge_after: float = 0.0, health_interval: float = 30.0):
+        """
+        Args:
+            backends (list): Backend instances to route to
+            selection (str, optional): "least_outstanding" or "latency". Defaults to "least_outstanding".
+            retries (int, optional): Extra attempts after a failed request. Defaults to 2.
+            retry_backoff (float, optional): First retry delay in seconds, doubled each time. Defaults to 0.5.
+            hedge_after (float, optional): Seconds without a first token before a hedged request is sent;
+                                           hedged requests are streamed so the loser can be closed.
+                                           0 disables. Defaults to 0.
+            health_interval (float, optional): Seconds between health checks; 0 disables. Defaults to 30.
+        """
+        self.backends = backends
+        self.selection = selection
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.hedge_after = hedge_after
+        self.hedges = 0
+        self.chat = _Chat(self)
+        self._stop = threading.Event()
+        if health_interval and len(backends) > 1:
+            threading.Thread(target=self._health_loop, args=(health_interval,), name="llm-health", daemon=True).start()
+
+    def select(self, exclude=()) -> Optional[Backend]:
+        """
+        Pick the backend for the next request.
+
+        Args:
+            exclude (optional): Backends already tried for this request
+
+        Returns:
+            Optional[Backend]: The chosen backend, or None when every backend was excluded
+        """
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        if not candidates:
+            return None
+        # Unhealthy backends are only used when nothing else is left
+        candidates = [backend for backend in candidates if backend.healthy] or candidates
+        if self.selection == "latency":
+            # Backends without a measurement get the best weight so they are tried
+            known = [backend.latency for backend in candidates if backend.latency]
+            fastest = min(known) if known else 1.0
+            weights = [1.0 / ((backend.latency or fastest) * (backend.outstanding + 1)) for backend in candidates]
+            return random.choices(candidates, weights=weights)[0]
+        return min(candidates, key=lambda backend: (backend.outstanding, backend.latency or 0.0))
+
+    def create(self, **kwargs):
+        """
+        Create a chat completion on the best available backend.
+
+        Args:
+            **kwargs: Arguments of client.chat.completions.create
+
+        Returns:
+            The completion, or an iterator of chunks when stream=True
+        """
+        tried = []
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            try:
+                if kwargs.get("stream"):
+                    return self._create_stream(kwargs, tried)
+                return self._create(kwargs, tried)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"LLM request attempt {attempt + 1} failed: {str(e)}")
+                # Once every backend failed, start over with all of them
+                if len(tried) >= len(self.backends):
+                    tried.clear()
+        raise last_error
+
+    def _call(self, backend: Backend, kwargs: dict, results: queue.Queue) -> None:
+        start = backend.begin()
+        try:
+            response = backend.client.chat.completions.create(**kwargs)
+            backend.end(start)
+            results.put((backend, response, None))
+        except Exception as e:
+            backend.end(start, e)
+            results.put((backend, None, e))
+
+    def _create(self, kwargs: dict, tried: list):
+        if self.hedge_after and len(self.backends) > 1:
+            # A losing request can only be cancelled by closing its stream, so hedged
+            # requests are streamed and the winner's answer is collected
+            return _collect_completion(self._create_stream({**kwargs, "stream": True}, tried))
+
+        backend = self.select(tried)
+        tried.append(backend)
+        results: queue.Queue = queue.Queue()
+        self._call(backend, kwargs, results)
+        _, response, error = results.get()
+        if error is not None:
+            raise error
+        return response
+
+    def _hedge(self, kwargs: dict, tried: list, target, results: queue.Queue) -> int:
+        hedge_backend = self.select(tried)
+        if hedge_backend is None:
+            return 0
+        tried.append(hedge_backend)
+        self.hedges += 1
+        logger.info(f"Hedging request to {hedge_backend.base_url}")
+        threading.Thread(target=target, args=(hedge_backend, kwargs, results), daemon=True).start()
+        return 1
+
+    def _open_stream(self, backend: Backend, kwargs: dict, results: queue.Queue) -> None:
+        start = backend.begin()
+        stream = None
+        try:
+            stream = backend.client.chat.completions.create(**kwargs)
+            chunks = iter(stream)
+            try:
+                first_chunks = [next(chunks)]
+            except StopIteration:
+                # An empty answer is still an answer
+                first_chunks = []
+            backend.record_ttft(time.perf_counter() - start)
+            results.put((backend, (stream, chunks, first_chunks, start), None))
+        except Exception as e:
+            if stream is not None:
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+            backend.end(start, e)
+            results.put((backend, None, e))
+
+    def _create_stream(self, kwargs: dict, tried: list) -> Iterator:
+        backend = self.select(tried)
+        tried.append(backend)
+        results: queue.Queue = queue.Queue()
+        threading.Thread(target=self._open_stream, args=(backend, kwargs, results), daemon=True).start()
+        pending = 1
+        first = None
+        if self.hedge_after and len(self.backends) > 1:
+            try:
+                first = results.get(timeout=self.hedge_after)
+            except queue.Empty:
+                pending += self._hedge(kwargs, tried, self._open_stream, results)
+
+        while True:
+            if first is None:
+                first = results.get()
+            pending -= 1
+            winner, opened, error = first
+            if error is None:
+                if winner is not backend:
+                    winner.hedges_won += 1
+                if pending:
+                    threading.Thread(target=self._close_losers, args=(results, pending), daemon=True).start()
+                return self._relay(winner, *opened)
+            if not pending:
+                raise error
+            first = None
+
+    def _close_losers(self, results: queue.Queue, pending: int) -> None:
+        for _ in range(pending):
+            backend, opened, error = results.get()
+            if error is None:
+                stream, _, _, start = opened
+                stream.close()
+                backend.end(start)
+
+    def _relay(self, backend: Backend, stream, chunks, first_chunks: list, start: float) -> Iterator:
+        error = None
+        try:
+            yield from first_chunks
+            for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            stream.close()
+            backend.end(start, error)
+
+    def embed(self, texts: list, model: str) -> list:
+        """
+        Embed texts with the embeddings endpoint of the best available backend.
+
+        Args:
+            texts (list): Texts to embed
+            model (str): Embedding model name
+
+        Returns:
+            list: One embedding (list of floats) per text
+        """
+        backend = self.select()
+        start = backend.begin()
+        try:
+            response = backend.client.embeddings.create(model=model, input=texts)
+        except Exception as e:
+            backend.end(start, e)
+            raise
+        backend.end(start)
+        return [item.embedding for item in response.data]
+
+    def _health_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            for backend in self.backends:
+                try:
+                    backend.client.with_options(timeout=5.0).models.list()
+                    if not backend.healthy:
+                        logger.info(f"Backend {backend.base_url} is healthy again")
+                    backend.healthy = True
+                except Exception as e:
+                    if backend.healthy:
+                        logger.warning(f"Backend {backend.base_url} failed its health check: {str(e)}")
+                    backend.healthy = False
+                    backend.last_error = str(e)
+
+    def stats(self) -> dict:
+        """
+        Report per-backend latency and error statistics.
+
+        Returns:
+            dict: Hedged request count and the statistics of each backend
+        """
+        return {"hedges": self.hedges, "backends": [backend.stats() for backend in self.backends]}
+
+    def close(self) -> None:
+        self._stop.set()
+        for backend in self.backends:
+            backend.close()
+
+
+def _collect_completion(chunks: Iterator) -> ChatCompletion:
+    """
+    Assemble a streamed chat completion into the response of a non-streaming request.
+
+    Args:
+        chunks (Iterator): Chunks of a streamed completion
+
+    Returns:
+        ChatCompletion: The completion with the joined message content
+    """
+    parts = []
+    first = None
+    finish_reason = "stop"
+    for chunk in chunks:
+        first = first or chunk
+        if chunk.choices:
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                parts.append(choice.delta.content)
+            finish_reason = choice.finish_reason or finish_reason
+    return ChatCompletion(
+        id=first.id if first is not None else "",
+        object="chat.completion",
+        created=first.created if first is not None else int(time.time()),
+        model=first.model if first is not None else "",
+        choices=[Choice(
+            index=0,
+            finish_reason=finish_reason,
+            message=ChatCompletionMessage(role="assistant", content="".join(parts))
+        )]
+    )
+
+
+def create_llm_router(config) -> LLMRouter:
+    """
+    Create the router for the configured backends.
+
+    'base_urls' lists the backends separated by commas; when it is empty the
+    single 'base_url' is used.
+
+    Args:
+        config: Configuration dictionary with the LLM backend settings
+
+    Returns:
+        LLMRouter: The router
+    """
+    base_urls = [url.strip() for url in config["base_urls"].split(",") if url.strip()] or [config["base_url"]]
+    backends = [
+        Backend(url, config["openai_api_key"], config["llm_pool_connections"], config["llm_timeout"])
+        for url in base_urls
+    ]
+    return LLMRouter(
+        backends,
+        config["llm_selection"],
+        config["llm_retries"],
+        config["llm_retry_backoff"],
+        config["llm_hedge_after"],
+        config["llm_health_interval"]
+    )
+
+
+def create_chat_client(config):
+    """
+    Create the configured chat backend.
+
+    Args:
+        config: Configuration dictionary with the 'llm_backend' setting
+
+    Returns:
+        LLMRouter or LlamaCppClient: Client with chat.completions.create, stats() and close()
+    """
+    if config["llm_backend"] == "llama_cpp":
+        from helpers.llama_cpp_helper import create_llama_cpp_client
+        return create_llama_cpp_client(config)
+    return create_llm_router(config)
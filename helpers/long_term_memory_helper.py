@@ -0,0 +1,461 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from helpers.chat_history_helper import estimate_tokens
+from helpers.metrics_helper import percentile
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Dimensions of the hashing embedder
+HASHING_DIMENSIONS = 512
+# Characters of a past exchange stored as a snippet
+SNIPPET_CHARACTERS = 600
+# Turns added to the index between rewrites of vectors.npy
+VECTOR_SAVE_EVERY = 32
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a compact running summary of a conversation. Update the summary with the new "
+    "exchanges. Keep names, facts, preferences and open questions; drop small talk. Answer with "
+    "the updated summary only, in at most {words} words."
+)
+
+
+class HashingEmbedder:
+    """
+    Embeds text by hashing its words and word pairs into a fixed-size vector.
+
+    Needs no model or network and takes microseconds, at the price of only
+    matching shared words rather than meaning.
+    """
+
+    def __init__(self, dimensions: int = HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> list:
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Args:
+            texts (list): Texts to embed
+
+        Returns:
+            np.ndarray: Unit-length float32 vectors, one row per text
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        return _normalize(vectors)
+
+
+class RemoteEmbedder:
+    """
+    Embeds text with the embeddings endpoint of the configured LLM backends.
+    """
+
+    def __init__(self, client, model: str):
+        """
+        Args:
+            client (LLMRouter): Router to the OpenAI-compatible backends
+            model (str): Embedding model name
+        """
+        self.client = client
+        self.model = model
+
+    def embed(self, texts: list) -> np.ndarray:
+        return _normalize(np.asarray(self.client.embed(texts, self.model), dtype=np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """
+    Unit vectors in a growable NumPy array, searched by cosine similarity.
+
+    The vectors are saved as vectors.npy and their records as records.jsonl
+    in the index directory. New records are appended as they come, while
+    vectors.npy is only rewritten now and then by save(). Records whose
+    vectors were never saved are kept in 'orphans' when the index is loaded,
+    to be embedded again by the owner.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Directory the index is loaded from and saved to
+        """
+        self.directory = directory
+        self.records: list = []
+        # Records loaded without a saved vector
+        self.orphans: list = []
+        self.unsaved_vectors = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._pending_records: list = []
+        # Set when the files no longer match the index and must be written whole
+        self._rewrite = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:len(self.records)] if self._vectors is not None else np.zeros((0, 0), dtype=np.float32)
+
+    def add(self, vector: np.ndarray, record: dict) -> None:
+        """
+        Add one vector and its record.
+
+        Args:
+            vector (np.ndarray): Unit-length embedding
+            record (dict): Data returned with search results
+        """
+        with self._lock:
+            count = len(self.records)
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                if count:
+                    logger.warning("Embedding size changed, starting a new memory index")
+                    self.records = []
+                    self._pending_records = []
+                    self._rewrite = True
+                    count = 0
+                self._vectors = np.zeros((64, len(vector)), dtype=np.float32)
+            elif count == len(self._vectors):
+                # Capacity doubles so adding stays amortized constant time
+                self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+            self._vectors[count] = vector
+            self.records.append(record)
+            self._pending_records.append(record)
+            self.unsaved_vectors += 1
+
+    def search(self, vector: np.ndarray, k: int) -> list:
+        """
+        Find the records most similar to a vector.
+
+        Args:
+            vector (np.ndarray): Unit-length query embedding
+            k (int): Number of results
+
+        Returns:
+            list: (similarity, record) pairs, most similar first
+        """
+        with self._lock:
+            vectors = self.vectors
+            if not len(vectors) or vectors.shape[1] != len(vector):
+                return []
+            scores = vectors @ vector
+            k = min(k, len(scores))
+            best = np.argpartition(-scores, k - 1)[:k]
+            return [(float(scores[i]), self.records[i]) for i in best[np.argsort(-scores[best])]]
+
+    def size_bytes(self) -> int:
+        return self.vectors.nbytes
+
+    def save_records(self) -> None:
+        """Append the records added since the last save to records.jsonl."""
+        with self._lock:
+            if self._rewrite:
+                records = None
+            else:
+                records, self._pending_records = self._pending_records, []
+        if records is None:
+            self.save()
+            return
+        if records:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "records.jsonl"), "a") as file:
+                file.writelines(json.dumps(record) + "\n" for record in records)
+
+    def save(self) -> None:
+        """Write the whole index, replacing the previous files atomically."""
+        with self._lock:
+            vectors = self.vectors.copy()
+            records = list(self.records)
+            self._pending_records = []
+            self._rewrite = False
+            self.unsaved_vectors = 0
+        os.makedirs(self.directory, exist_ok=True)
+        vectors_path = os.path.join(self.directory, "vectors.npy")
+        records_path = os.path.join(self.directory, "records.jsonl")
+        with open(vectors_path + ".tmp", "wb") as file:
+            np.save(file, vectors)
+        with open(records_path + ".tmp", "w") as file:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(records_path + ".tmp", records_path)
+
+    def _load(self) -> None:
+        vectors_path = os.path.join(self.directory, "vectors.npy")
+        records_path = os.path.join(self.directory, "records.jsonl")
+        if not os.path.exists(records_path):
+            return
+        # Until the index is loaded, the files on disk do not match it
+        self._rewrite = True
+        try:
+            with open(records_path) as file:
+                records = [json.loads(line) for line in file if line.strip()]
+            vectors = np.load(vectors_path) if os.path.exists(vectors_path) else np.zeros((0, 0), dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Failed to load memory index, starting a new one: {str(e)}")
+            return
+        self._rewrite = False
+        if len(records) != len(vectors):
+            # Records appended after the last vector save have no vectors yet
+            count = min(len(records), len(vectors))
+            logger.info(f"Memory index has {len(records)} records and {len(vectors)} vectors, {len(records) - count} to embed again")
+            records, vectors, self.orphans = records[:count], vectors[:count], records[count:]
+            self._rewrite = True
+        if len(records):
+            self._vectors = np.concatenate([vectors, np.zeros_like(vectors)])
+            self.records = records
+
+
+class LongTermMemory:
+    """
+    Remembers a conversation beyond the chat history window.
+
+    Every turn is embedded into a vector index in the background. Messages
+    evicted from the history are folded into a running summary by the model,
+    also in the background. Each prompt then carries the summary and the
+    past exchanges most relevant to it, within a fixed token budget, instead
+    of an ever longer history.
+    """
+
+    def __init__(self, config, client, embedder=None):
+        """
+        Args:
+            config: Configuration dictionary with the long-term memory settings
+            client: Client with chat.completions.create, used for summaries
+            embedder (optional): Object with embed(texts) returning unit vectors. Defaults to the configured one.
+        """
+        self.config = config
+        self.client = client
+        self.directory = config["memory_directory"]
+        if embedder is None:
+            embedder = HashingEmbedder()
+            if config["memory_embedding_model"]:
+                if hasattr(client, "embed"):
+                    embedder = RemoteEmbedder(client, config["memory_embedding_model"])
+                else:
+                    logger.warning("The LLM backend cannot embed text, using hashed word embeddings")
+        self.embedder = embedder
+        self.index = VectorIndex(self.directory)
+        self.summary = self._load_summary()
+        self.retrieval_seconds: deque = deque(maxlen=1000)
+        self.summaries = 0
+        self._evicted: list = []
+        # One background thread keeps index updates and summaries in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="long-term-memory")
+        if self.index.orphans:
+            self._executor.submit(self._index_orphans)
+
+    def context(self, user_prompt: str, history=None) -> str:
+        """
+        Build the memory block for the next prompt.
+
+        Args:
+            user_prompt (str): The user's new message
+            history (ChatHistory, optional): Current history; exchanges still in it are not repeated
+
+        Returns:
+            str: The running summary and relevant past exchanges, or "" when there are none
+        """
+        start = time.perf_counter()
+        budget = self.config["memory_context_token_budget"]
+        parts = []
+        if self.summary:
+            summary = f"Summary of the earlier conversation: {self.summary}\n"
+            if estimate_tokens(summary) <= budget:
+                parts.append(summary)
+                budget -= estimate_tokens(summary)
+
+        if len(self.index):
+            in_window = {message["content"] for message in history.messages()} if history is not None else set()
+            try:
+                query = self.embedder.embed([user_prompt])[0]
+                results = self.index.search(query, self.config["memory_top_k"] + len(in_window) // 2)
+            except Exception as e:
+                # The turn goes on with the summary alone
+                logger.error(f"Failed to search long-term memory: {str(e)}")
+                results = []
+            snippets = []
+            for score, record in results:
+                if score < self.config["memory_min_score"] or len(snippets) >= self.config["memory_top_k"]:
+                    break
+                if f"{record['user_prompt_date']} : {record['user_prompt']}" in in_window:
+                    continue
+                snippet = f"- {record['text']}\n"
+                if estimate_tokens(snippet) > budget:
+                    break
+                snippets.append(snippet)
+                budget -= estimate_tokens(snippet)
+            if snippets:
+                parts.append("Relevant earlier exchanges:\n" + "".join(snippets))
+
+        self.retrieval_seconds.append(time.perf_counter() - start)
+        return "".join(parts)
+
+    def remember(self, user_prompt: str, answer: str, user_prompt_date: str, answer_date: str) -> None:
+        """
+        Add a finished turn to the index in the background.
+
+        Args:
+            user_prompt (str): The user's message
+            answer (str): The answer, without thinking tags
+            user_prompt_date (str): Date and time of the prompt
+            answer_date (str): Date and time of the answer
+        """
+        text = f"({user_prompt_date}) User: {user_prompt} {self.config['bot_name']}: {answer}"
+        if len(text) > SNIPPET_CHARACTERS:
+            text = text[:SNIPPET_CHARACTERS - 3] + "..."
+        record = {
+            "text": text,
+            "user_prompt": user_prompt,
+            "answer": answer,
+            "user_prompt_date": user_prompt_date,
+            "answer_date": answer_date
+        }
+        self._executor.submit(self._index_turn, record)
+
+    @staticmethod
+    def _embedding_text(record: dict) -> str:
+        # Records written before answers were stored only have their snippet
+        if "answer" not in record:
+            return record["text"]
+        return record["user_prompt"] + "\n" + record["answer"]
+
+    def _index_orphans(self) -> None:
+        orphans, self.index.orphans = self.index.orphans, []
+        try:
+            vectors = self.embedder.embed([self._embedding_text(record) for record in orphans])
+            for vector, record in zip(vectors, orphans):
+                self.index.add(vector, record)
+            self.index.save()
+            logger.info(f"Embedded {len(orphans)} memory records again after an interrupted session")
+        except Exception as e:
+            logger.error(f"Failed to index earlier turns: {str(e)}")
+
+    def _index_turn(self, record: dict) -> None:
+        try:
+            self.index.add(self.embedder.embed([self._embedding_text(record)])[0], record)
+            # Rewriting every vector each turn would grow with the index, so only records are appended
+            if self.index.unsaved_vectors >= VECTOR_SAVE_EVERY:
+                self.index.save()
+            else:
+                self.index.save_records()
+        except Exception as e:
+            logger.error(f"Failed to index turn: {str(e)}")
+
+    def evicted(self, message: dict) -> None:
+        """
+        Collect a message evicted from the chat history; summarize once enough have been collected.
+
+        Args:
+            message (dict): The evicted chat message
+        """
+        self._evicted.append(message)
+        if len(self._evicted) >= self.config["memory_summary_every"]:
+            messages, self._evicted = self._evicted, []
+            self._executor.submit(self._summarize, messages)
+
+    def _summarize(self, messages: list) -> None:
+        exchanges = "\n".join(
+            f"{'User' if message['role'] == 'user' else self.config['bot_name']}: {message['content']}"
+            for message in messages
+        )
+        words = max(20, self.config["memory_summary_tokens"] * 3 // 4)
+        try:
+            start = time.perf_counter()
+            response = self.client.chat.completions.create(
+                model=self.config["chat_model_name"],
+                messages=[
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(words=words)},
+                    {"role": "user", "content": f"Current summary:\n{self.summary or '(empty)'}\n\nNew exchanges:\n{exchanges}"}
+                ],
+                temperature=0.2,
+                max_tokens=self.config["memory_summary_tokens"]
+            )
+            summary = re.sub(r"<think>.*?</think>", "", response.choices[0].message.content or "", flags=re.DOTALL).strip()
+        except Exception as e:
+            logger.error(f"Failed to update conversation summary: {str(e)}")
+            return
+        if summary:
+            self.summary = summary
+            self.summaries += 1
+            self._save_summary()
+            logger.info(f"Updated conversation summary in {time.perf_counter() - start:.2f}s ({estimate_tokens(summary)} tokens)")
+
+    def _load_summary(self) -> str:
+        try:
+            with open(os.path.join(self.directory, "summary.json")) as file:
+                return json.load(file).get("summary", "")
+        except FileNotFoundError:
+            return ""
+        except Exception as e:
+            logger.error(f"Failed to load conversation summary: {str(e)}")
+            return ""
+
+    def _save_summary(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, "summary.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump({"summary": self.summary, "updated": time.time()}, file)
+        os.replace(path + ".tmp", path)
+
+    def stats(self) -> dict:
+        """
+        Report index size and retrieval latency.
+
+        Returns:
+            dict: Indexed turns, index bytes, summary tokens and retrieval latency percentiles in seconds
+        """
+        seconds = list(self.retrieval_seconds)
+        return {
+            "indexed_turns": len(self.index),
+            "index_bytes": self.index.size_bytes(),
+            "summary_tokens": estimate_tokens(self.summary) if self.summary else 0,
+            "summaries": self.summaries,
+            "retrieval_p50": percentile(seconds, 0.5),
+            "retrieval_p90": percentile(seconds, 0.9),
+        }
+
+    def close(self) -> None:
+        """Finish pending index updates and summaries, and save the index."""
+        self._executor.shutdown(wait=True)
+        try:
+            self.index.save()
+        except Exception as e:
+            logger.error(f"Failed to save memory index: {str(e)}")
+
+
+def create_long_term_memory(config, client) -> Optional[LongTermMemory]:
+    """
+    Create the long-term memory, if it is enabled.
+
+    Args:
+        config: Configuration dictionary with the long-term memory settings
+        client: Client with chat.completions.create, used for summaries
+
+    Returns:
+        Optional[LongTermMemory]: The memory, or None when 'long_term_memory' is off
+    """
+    if not config["long_term_memory"]:
+        return None
+    return LongTermMemory(config, client)
@@ -1,5 +1,17 @@
-import torch
 import gc
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Share of a high-water mark that usage must grow by after a collection before it triggers again
+REGROWTH_MARGIN = 0.1
+
 
 def run_garbage_collection() -> None:
     """
@@ -10,9 +22,10 @@ def run_garbage_collection() -> None:
     """
     gc.collect()
 
-def print_used_gpu_memory() -> None:
+
+def print_used_gpu_memory() -> float:
     """
-    Print out the amount of memory used by the current process on the GPU.
+    Return the amount of memory used by the current process on the GPU.
 
     This value is the total amount of memory allocated by the process on the GPU,
     and is updated every time a tensor is allocated or deallocated. It is
@@ -21,8 +34,191 @@ def print_used_gpu_memory() -> None:
     Args:
         None
     Returns:
-        None
+        float: Allocated GPU memory in MB, 0.0 when CUDA is not in use
     """
-    if torch.cuda.is_available():
-        used_memory: float = torch.cuda.memory_allocated() / (1024 ** 2)  # Convert to MB
+    # Only report when torch was already loaded for speech synthesis
+    torch = sys.modules.get("torch")
+    used_memory: float = 0.0
+    if torch is not None and torch.cuda.is_available():
+        used_memory = torch.cuda.memory_allocated() / (1024 ** 2)  # Convert to MB
     return used_memory
+
+
+def get_rss_mb() -> Optional[float]:
+    """
+    Return the resident set size of the current process.
+
+    Reads /proc/self/statm when psutil is not installed.
+
+    Returns:
+        Optional[float]: Resident memory in MB, or None when it cannot be measured
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 ** 2)
+    except ImportError:
+        pass
+    try:
+        # The second field is the number of resident pages
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 ** 2)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryManager:
+    """
+    Collects garbage only when memory use calls for it.
+
+    Process RSS and GPU tensor memory are compared against high-water marks,
+    and collection is scheduled while the program is idle (waiting for the
+    user's input) instead of on the turn's critical path. When usage stays
+    above a mark after a collection, e.g. because a large model is loaded,
+    the mark moves up to that usage plus a margin, so steady-state memory
+    does not trigger a collection in every idle period.
+    """
+
+    def __init__(self, rss_high_water_mb: float, gpu_high_water_mb: float, idle_delay: float = 0.5,
+                 collect_every_turns: int = 0):
+        """
+        Args:
+            rss_high_water_mb (float): Collect when the process RSS exceeds this many MB (0 disables)
+            gpu_high_water_mb (float): Collect when allocated GPU memory exceeds this many MB (0 disables)
+            idle_delay (float, optional): Seconds of idle time before an idle collection runs. Defaults to 0.5.
+            collect_every_turns (int, optional): Also collect after this many turns (0 disables). Defaults to 0.
+        """
+        self.rss_high_water_mb = rss_high_water_mb
+        self.gpu_high_water_mb = gpu_high_water_mb
+        self.idle_delay = idle_delay
+        self.collect_every_turns = collect_every_turns
+        self.turns_since_collection = 0
+        self.collections = 0
+        self.collection_seconds = 0.0
+        # Usage that triggers a collection; raised above what a collection could not free
+        self._rss_trigger_mb = rss_high_water_mb
+        self._gpu_trigger_mb = gpu_high_water_mb
+        self._lock = threading.Lock()
+        self._idle_timer: Optional[threading.Timer] = None
+
+    def usage(self) -> dict:
+        """
+        Measure current memory use.
+
+        Returns:
+            dict: RSS (None when it cannot be measured) and allocated GPU memory in MB
+        """
+        return {"rss_mb": get_rss_mb(), "gpu_mb": print_used_gpu_memory()}
+
+    def collection_reason(self) -> Optional[str]:
+        """
+        Decide whether a collection is needed.
+
+        Returns:
+            Optional[str]: Why memory should be collected, or None when it should not
+        """
+        usage = self.usage()
+        # Without an RSS measurement only the other triggers apply
+        if self.rss_high_water_mb and usage["rss_mb"] is not None and usage["rss_mb"] > self._rss_trigger_mb:
+            return f"RSS {usage['rss_mb']:.0f} MB above {self._rss_trigger_mb:.0f} MB"
+        if self.gpu_high_water_mb and usage["gpu_mb"] > self._gpu_trigger_mb:
+            return f"GPU memory {usage['gpu_mb']:.0f} MB above {self._gpu_trigger_mb:.0f} MB"
+        if self.collect_every_turns and self.turns_since_collection >= self.collect_every_turns:
+            return f"{self.turns_since_collection} turns since the last collection"
+        return None
+
+    def collect(self, reason: str = "requested") -> float:
+        """
+        Run a full collection and release cached GPU memory.
+
+        Args:
+            reason (str, optional): Why the collection runs, for the log
+
+        Returns:
+            float: Seconds the collection took
+        """
+        with self._lock:
+            before = get_rss_mb()
+            start = time.perf_counter()
+            gc.collect()
+            torch = sys.modules.get("torch")
+            if torch is not None and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            elapsed = time.perf_counter() - start
+            self.collections += 1
+            self.collection_seconds += elapsed
+            self.turns_since_collection = 0
+            after = get_rss_mb()
+            self._update_triggers(after, print_used_gpu_memory())
+            if before is not None and after is not None:
+                logger.info(f"Garbage collection ({reason}) took {elapsed * 1000:.1f} ms, RSS {before:.0f} -> {after:.0f} MB")
+            else:
+                logger.info(f"Garbage collection ({reason}) took {elapsed * 1000:.1f} ms")
+            return elapsed
+
+    def _update_triggers(self, rss_mb: Optional[float], gpu_mb: float) -> None:
+        # Memory still in use after a collection is the new baseline
+        if rss_mb is not None:
+            self._rss_trigger_mb = max(self.rss_high_water_mb, rss_mb + self.rss_high_water_mb * REGROWTH_MARGIN)
+        self._gpu_trigger_mb = max(self.gpu_high_water_mb, gpu_mb + self.gpu_high_water_mb * REGROWTH_MARGIN)
+
+    def maybe_collect(self) -> Optional[float]:
+        """
+        Collect only when a high-water mark has been crossed.
+
+        Returns:
+            Optional[float]: Seconds the collection took, or None when it was skipped
+        """
+        reason = self.collection_reason()
+        if reason is None:
+            return None
+        return self.collect(reason)
+
+    def end_turn(self) -> None:
+        """Count a finished turn."""
+        self.turns_since_collection += 1
+
+    def schedule_idle(self) -> None:
+        """Check memory after 'idle_delay' seconds unless the idle period ends first."""
+        self.cancel_idle()
+        self._idle_timer = threading.Timer(self.idle_delay, self._idle_collect)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def cancel_idle(self) -> None:
+        """Cancel a pending idle check, e.g. because the user has submitted a prompt."""
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _idle_collect(self) -> None:
+        try:
+            self.maybe_collect()
+        except Exception as e:
+            logger.error(f"Idle garbage collection failed: {str(e)}")
+
+    def summary(self) -> dict:
+        """
+        Report collection statistics.
+
+        Returns:
+            dict: Collection count, total collection time and current usage
+        """
+        return {"collections": self.collections, "collection_seconds": self.collection_seconds, **self.usage()}
+
+
+def create_memory_manager(config) -> MemoryManager:
+    """
+    Create a memory manager from the configuration.
+
+    Args:
+        config: Configuration dictionary with the memory settings
+
+    Returns:
+        MemoryManager: The configured manager
+    """
+    return MemoryManager(
+        config["memory_rss_high_water_mb"],
+        config["memory_gpu_high_water_mb"],
+        config["memory_idle_delay"],
+        config["memory_collect_every_turns"]
+    )
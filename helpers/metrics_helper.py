@@ -0,0 +1,267 @@
+import cProfile
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator, Optional
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Turn currently being measured, so deeper stages can record into it
+_current_turn = None
+_current_turn_lock = threading.Lock()
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class TurnMetrics:
+    """
+    Timings of a single conversation turn.
+
+    Spans are durations of a stage and add up when a stage runs several
+    times, like synthesis of several chunks. Marks are points in time,
+    measured from the start of the turn.
+    """
+
+    def __init__(self, turn: int):
+        self.turn = turn
+        self.started = time.perf_counter()
+        self.spans: dict = {}
+        self.marks: dict = {}
+        self.samples: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Add a measured duration to a span."""
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+            self.samples.setdefault(name, []).append(seconds)
+
+    @contextmanager
+    def span(self, name: str):
+        """Measure the duration of the wrapped block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def span_stream(self, name: str, items: Iterable) -> Iterator:
+        """Measure from the first request for an item until the iterable is exhausted or closed."""
+        start = time.perf_counter()
+        try:
+            yield from items
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def mark(self, name: str) -> None:
+        """Record the first time a point in the turn is reached."""
+        with self._lock:
+            if name not in self.marks:
+                self.marks[name] = time.perf_counter() - self.started
+
+    def to_dict(self) -> dict:
+        return {
+            "turn": self.turn,
+            "timestamp": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "spans": {name: round(value, 6) for name, value in self.spans.items()},
+            "marks": {name: round(value, 6) for name, value in self.marks.items()},
+        }
+
+
+def set_current_turn(turn: Optional[TurnMetrics]) -> None:
+    global _current_turn
+    with _current_turn_lock:
+        _current_turn = turn
+
+
+def observe(name: str, seconds: float) -> None:
+    """Add a duration to the current turn, if one is being measured."""
+    turn = _current_turn
+    if turn is not None:
+        turn.observe(name, seconds)
+
+
+def mark(name: str) -> None:
+    """Record a point in the current turn, if one is being measured."""
+    turn = _current_turn
+    if turn is not None:
+        turn.mark(name)
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of a list of values.
+
+    Args:
+        values (list): Measured values
+        fraction (float): Percentile as a fraction, e.g. 0.9
+
+    Returns:
+        float: The percentile, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class SessionMetrics:
+    """
+    Aggregates turn timings for a session and exports them.
+
+    Each finished turn is appended to a JSON-lines file, and the session
+    percentiles are written in Prometheus text format to a file and,
+    optionally, served over HTTP.
+    """
+
+    def __init__(self, config):
+        self.metrics_file = config["metrics_file"]
+        self.prometheus_file = config["prometheus_file"]
+        self.values: dict = {}
+        self.turns = 0
+        self._lock = threading.Lock()
+        self._server = None
+        if config["prometheus_port"]:
+            self._server = serve_prometheus(self, config["prometheus_port"])
+
+    def start_turn(self) -> TurnMetrics:
+        """Start measuring a new turn and make it the current one."""
+        turn = TurnMetrics(self.turns + 1)
+        set_current_turn(turn)
+        return turn
+
+    def finish_turn(self, turn: TurnMetrics) -> None:
+        """Aggregate a finished turn and export the results."""
+        set_current_turn(None)
+        with self._lock:
+            self.turns += 1
+            for name, samples in turn.samples.items():
+                # Per-chunk stages are aggregated per chunk, other spans per turn
+                if len(samples) > 1:
+                    self.values.setdefault(f"{name}_chunk", []).extend(samples)
+                self.values.setdefault(name, []).append(turn.spans[name])
+            for name, value in turn.marks.items():
+                self.values.setdefault(name, []).append(value)
+
+        record = turn.to_dict()
+        logger.info(f"Turn metrics: {record}")
+        try:
+            if self.metrics_file:
+                with open(self.metrics_file, "a") as file:
+                    file.write(json.dumps(record) + "\n")
+            if self.prometheus_file:
+                temp_path = f"{self.prometheus_file}.tmp"
+                with open(temp_path, "w") as file:
+                    file.write(self.prometheus_text())
+                os.replace(temp_path, self.prometheus_file)
+        except Exception as e:
+            logger.error(f"Failed to export metrics: {str(e)}")
+
+    def summary(self) -> dict:
+        """
+        Session percentiles of every measured stage.
+
+        Returns:
+            dict: Stage name to count and p50/p90/p99 in seconds
+        """
+        with self._lock:
+            return {
+                name: {"count": len(values), **{f"p{int(q * 100)}": percentile(values, q) for q in PERCENTILES}}
+                for name, values in self.values.items()
+            }
+
+    def prometheus_text(self) -> str:
+        """
+        Render the session percentiles in Prometheus text format.
+
+        Returns:
+            str: The exposition text
+        """
+        lines = [
+            "# HELP talk_turns_total Conversation turns completed in this session.",
+            "# TYPE talk_turns_total counter",
+            f"talk_turns_total {self.turns}",
+            "# HELP talk_stage_seconds Duration of conversation stages in this session.",
+            "# TYPE talk_stage_seconds summary",
+        ]
+        with self._lock:
+            for name, values in sorted(self.values.items()):
+                for q in PERCENTILES:
+                    lines.append(f'talk_stage_seconds{{stage="{name}",quantile="{q}"}} {percentile(values, q):.6f}')
+                lines.append(f'talk_stage_seconds_sum{{stage="{name}"}} {sum(values):.6f}')
+                lines.append(f'talk_stage_seconds_count{{stage="{name}"}} {len(values)}')
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        logger.info(f"Session metrics: {self.summary()}")
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def serve_prometheus(metrics: SessionMetrics, port: int) -> ThreadingHTTPServer:
+    """
+    Serve the session metrics on /metrics in a background thread.
+
+    Args:
+        metrics (SessionMetrics): Metrics to expose
+        port (int): Local port to listen on
+
+    Returns:
+        ThreadingHTTPServer: The running server
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+    return server
+
+
+@contextmanager
+def profile_session(output_prefix: str = "profile"):
+    """
+    Profile the wrapped block with cProfile and tracemalloc.
+
+    Writes '<prefix>-<date>.prof' with the cProfile stats and
+    '<prefix>-<date>-memory.txt' with the top allocation differences.
+
+    Args:
+        output_prefix (str, optional): Path prefix of the output files. Defaults to "profile".
+    """
+    file_date = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    tracemalloc.start()
+    start_snapshot = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        end_snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        profiler.dump_stats(f"{output_prefix}-{file_date}.prof")
+        with open(f"{output_prefix}-{file_date}-memory.txt", "w") as file:
+            for stat in end_snapshot.compare_to(start_snapshot, "lineno")[:50]:
+                file.write(f"{stat}\n")
+        logger.info(f"Profile written to {output_prefix}-{file_date}.prof")
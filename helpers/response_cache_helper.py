@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from typing import Optional
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Start time the system prompt carries; it would make the keys of every session unique
+TIMESTAMP_PATTERN = re.compile(r"(?<=Current date and time: )\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+# Request fields that change the generated answer
+SAMPLING_FIELDS = ("temperature", "max_tokens", "top_p", "frequency_penalty", "presence_penalty")
+
+# Opened cache, shared by every request in the process
+_cache = None
+# Serializes opening the cache, which a turn and the memory summarizer may do at once
+_cache_lock = threading.Lock()
+
+
+def normalize_for_key(text: str) -> str:
+    """
+    Normalize prompt text so that equivalent requests share one cache entry.
+
+    Args:
+        text (str): Prompt or history text
+
+    Returns:
+        str: The text without the system prompt's start time and with whitespace collapsed
+    """
+    return re.sub(r"\s+", " ", TIMESTAMP_PATTERN.sub("", text or "")).strip()
+
+
+def response_cache_key(request: dict) -> str:
+    """
+    Build the cache key of a chat completion request.
+
+    Args:
+        request (dict): Arguments for client.chat.completions.create
+
+    Returns:
+        str: Hex digest of the model, normalized messages and sampling parameters
+    """
+    payload = {
+        "model": request["model"],
+        "messages": [[message["role"], normalize_for_key(message["content"])] for message in request["messages"]],
+        "sampling": {field: request.get(field) for field in SAMPLING_FIELDS},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_response_cache(config):
+    """
+    Open the persistent response cache, if it is enabled.
+
+    Args:
+        config: Configuration dictionary with the response cache settings
+
+    Returns:
+        diskcache.Cache or None: The cache, or None when caching is disabled
+    """
+    global _cache
+    if not config["response_cache"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            from diskcache import Cache
+            _cache = Cache(
+                config["response_cache_directory"],
+                size_limit=config["response_cache_size_mb"] * 1024 * 1024,
+                eviction_policy="least-recently-used"
+            )
+            _cache.stats(enable=True)
+    return _cache
+
+
+def is_cacheable(request: dict, config) -> bool:
+    """
+    Check whether a request may be answered from the cache.
+
+    Sampled answers (non-zero temperature) differ between calls, so they are
+    only cached when 'response_cache_allow_sampling' is set.
+
+    Args:
+        request (dict): Arguments for client.chat.completions.create
+        config: Configuration dictionary with the response cache settings
+
+    Returns:
+        bool: True when the cache should be used
+    """
+    if get_response_cache(config) is None:
+        return False
+    return not request.get("temperature") or config["response_cache_allow_sampling"]
+
+
+def get_cached_response(request: dict, config) -> Optional[list]:
+    """
+    Look up the answer to a request.
+
+    Args:
+        request (dict): Arguments for client.chat.completions.create
+        config: Configuration dictionary with the response cache settings
+
+    Returns:
+        Optional[list]: The answer's text deltas in the order they were generated, or None on a miss
+    """
+    if not is_cacheable(request, config):
+        return None
+    try:
+        return get_response_cache(config).get(response_cache_key(request))
+    except Exception as e:
+        logger.error(f"Failed to read response cache: {str(e)}")
+        return None
+
+
+def store_cached_response(request: dict, deltas: list, config) -> None:
+    """
+    Store the answer to a request.
+
+    Args:
+        request (dict): Arguments for client.chat.completions.create
+        deltas (list): The answer's text deltas; a non-streamed answer is a single delta
+        config: Configuration dictionary with the response cache settings
+    """
+    if not deltas or not is_cacheable(request, config):
+        return
+    try:
+        get_response_cache(config).set(response_cache_key(request), list(deltas), expire=config["response_cache_ttl"] or None)
+    except Exception as e:
+        logger.error(f"Failed to write response cache: {str(e)}")
+
+
+def response_cache_stats(config) -> dict:
+    """
+    Report response cache counters.
+
+    Args:
+        config: Configuration dictionary with the response cache settings
+
+    Returns:
+        dict: Hits, misses, entry count and size in bytes (empty when disabled)
+    """
+    cache = get_response_cache(config)
+    if cache is None:
+        return {}
+    hits, misses = cache.stats()
+    return {"hits": hits, "misses": misses, "entries": len(cache), "size_bytes": cache.volume()}
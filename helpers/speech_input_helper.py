@@ -0,0 +1,429 @@
+import logging
+import queue
+import sys
+import threading
+import time
+import wave
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+from bgcolors import bcolors
+from helpers.startup_helper import import_phase
+
+# webrtcvad, faster-whisper and sounddevice are imported on first use, so the
+# keyboard mode does not need them
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# webrtcvad accepts 16-bit mono audio at 8, 16, 32 or 48 kHz in 10, 20 or 30 ms frames
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * 2
+
+# Voiced frames in a row that start an utterance
+START_FRAMES = 3
+# Audio kept from before the start of speech, so the first syllable is not cut
+PRE_ROLL_FRAMES = 10
+# Microphone frames buffered for a listener that falls behind (10 seconds)
+MAX_QUEUED_FRAMES = 10000 // FRAME_MS
+# Audio at the end of the buffer that a partial transcription does not commit, since words may still change
+COMMIT_MARGIN_SECONDS = 1.0
+
+# Frame source shared by every prompt, so a file can hold several utterances
+_source: Optional[Iterator[bytes]] = None
+_transcription_model = None
+_model_lock = threading.Lock()
+_last_utterance = None
+
+
+def wav_frames(file_path: str, realtime: bool = True) -> Iterator[bytes]:
+    """
+    Read a WAV file as 16 kHz mono PCM frames.
+
+    Args:
+        file_path (str): Path of the WAV file
+        realtime (bool, optional): Whether to deliver frames at the pace of a microphone. Defaults to True.
+
+    Yields:
+        bytes: 16-bit PCM frames of FRAME_MS milliseconds
+    """
+    with wave.open(file_path, "rb") as wav_file:
+        sample_rate = wav_file.getframerate()
+        channels = wav_file.getnchannels()
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"{file_path} is not a 16-bit PCM WAV file")
+        samples = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if sample_rate != SAMPLE_RATE:
+        duration = len(samples) / sample_rate
+        positions = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+        samples = np.interp(positions, np.arange(len(samples)) / sample_rate, samples)
+    pcm = samples.astype(np.int16).tobytes()
+    frames = (pcm[offset:offset + FRAME_BYTES] for offset in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES))
+    yield from _paced(frames, realtime)
+
+
+def pcm_frames(stream, realtime: bool = False) -> Iterator[bytes]:
+    """
+    Read raw 16 kHz mono 16-bit little-endian PCM from a binary stream.
+
+    Args:
+        stream: Binary file object, e.g. sys.stdin.buffer
+        realtime (bool, optional): Whether to deliver frames at the pace of a microphone. Defaults to False.
+
+    Yields:
+        bytes: 16-bit PCM frames of FRAME_MS milliseconds
+    """
+    def _read():
+        while len(frame := stream.read(FRAME_BYTES)) == FRAME_BYTES:
+            yield frame
+
+    yield from _paced(_read(), realtime)
+
+
+def pcm_file_frames(file_path: str, realtime: bool = True) -> Iterator[bytes]:
+    """
+    Read a raw 16 kHz mono 16-bit PCM file as frames, closing it when done.
+
+    Args:
+        file_path (str): Path of the PCM file
+        realtime (bool, optional): Whether to deliver frames at the pace of a microphone. Defaults to True.
+
+    Yields:
+        bytes: 16-bit PCM frames of FRAME_MS milliseconds
+    """
+    with open(file_path, "rb") as file:
+        yield from pcm_frames(file, realtime)
+
+
+class MicrophoneFrames:
+    """
+    Captures 16 kHz mono PCM frames from the default input device.
+
+    The device only records between start() and stop(), so the bot's own
+    speech and the time it spends thinking are never heard as the next
+    utterance. Frames wait in a bounded queue; when the listener falls
+    behind, the newest frames are dropped.
+    """
+
+    def __init__(self, max_queued_frames: int = MAX_QUEUED_FRAMES):
+        """
+        Args:
+            max_queued_frames (int, optional): Frames allowed to wait for the listener. Defaults to 10 seconds.
+        """
+        with import_phase("sounddevice"):
+            import sounddevice as sd
+
+        self.dropped = 0
+        self._frames: queue.Queue = queue.Queue(maxsize=max(1, max_queued_frames))
+        self._stream = sd.RawInputStream(samplerate=SAMPLE_RATE, blocksize=FRAME_BYTES // 2, channels=1,
+                                         dtype="int16", callback=self._callback)
+
+    def _callback(self, data, frame_count, time_info, status) -> None:
+        if status:
+            logger.warning(f"Microphone status: {status}")
+        try:
+            self._frames.put_nowait(bytes(data))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        """Start recording, discarding anything left from the previous utterance."""
+        try:
+            while True:
+                self._frames.get_nowait()
+        except queue.Empty:
+            pass
+        self._stream.start()
+
+    def stop(self) -> None:
+        """Stop recording until the next start()."""
+        self._stream.stop()
+
+    def __iter__(self) -> "MicrophoneFrames":
+        return self
+
+    def __next__(self) -> bytes:
+        return self._frames.get()
+
+
+def _paced(frames: Iterator[bytes], realtime: bool) -> Iterator[bytes]:
+    if not realtime:
+        yield from frames
+        return
+    start = time.perf_counter()
+    for index, frame in enumerate(frames):
+        delay = start + index * FRAME_MS / 1000 - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield frame
+
+
+def open_frame_source(config) -> Iterator[bytes]:
+    """
+    Open the configured speech input.
+
+    'voice_input_source' is "microphone", "-" for raw PCM on standard input,
+    a .wav file, or any other path, which is read as raw PCM.
+
+    Args:
+        config: Configuration dictionary with the voice input settings
+
+    Returns:
+        Iterator[bytes]: 16 kHz mono 16-bit PCM frames
+    """
+    source = config["voice_input_source"]
+    if source == "microphone":
+        return MicrophoneFrames()
+    if source == "-":
+        return pcm_frames(sys.stdin.buffer, config["voice_input_realtime"])
+    if source.lower().endswith(".wav"):
+        return wav_frames(source, config["voice_input_realtime"])
+    return pcm_file_frames(source, config["voice_input_realtime"])
+
+
+def get_transcription_model(config):
+    """
+    Return the faster-whisper model, loading it on first use.
+
+    Args:
+        config: Configuration dictionary with the speech recognition settings
+
+    Returns:
+        WhisperModel: The loaded model
+    """
+    global _transcription_model
+    with _model_lock:
+        if _transcription_model is None:
+            with import_phase("faster_whisper"):
+                from faster_whisper import WhisperModel
+            start = time.perf_counter()
+            _transcription_model = WhisperModel(
+                config["stt_model"],
+                device=config["stt_device"],
+                compute_type=config["stt_compute_type"]
+            )
+            logger.info(f"Loaded speech recognition model {config['stt_model']} in {time.perf_counter() - start:.2f}s")
+        return _transcription_model
+
+
+class StreamingTranscriber:
+    """
+    Transcribes an utterance while it is still being spoken.
+
+    Audio is transcribed in the background every 'partial_interval' seconds.
+    Segments that end well before the newest audio are committed and their
+    audio is dropped, so when the utterance ends only the last few seconds
+    still need transcribing.
+    """
+
+    def __init__(self, transcribe: Callable[[np.ndarray, str], list], partial_interval: float = 1.0):
+        """
+        Args:
+            transcribe (Callable[[np.ndarray, str], list]): Turns float samples and a prompt into
+                                                            (start, end, text) segments
+            partial_interval (float, optional): Seconds of new audio between partial transcriptions. Defaults to 1.
+        """
+        self.transcribe = transcribe
+        self.partial_interval = partial_interval
+        self.committed: list = []
+        self.transcription_seconds = 0.0
+        self.audio_seconds = 0.0
+        self._audio = bytearray()
+        self._since_partial = 0
+        self._lock = threading.Lock()
+        self._partial: Optional[threading.Thread] = None
+
+    def feed(self, frame: bytes) -> None:
+        """Add a frame of 16-bit PCM and start a partial transcription when enough audio arrived."""
+        with self._lock:
+            self._audio.extend(frame)
+            self._since_partial += len(frame)
+        self.audio_seconds += len(frame) / 2 / SAMPLE_RATE
+        if self._since_partial / 2 / SAMPLE_RATE >= self.partial_interval and not self._busy():
+            self._since_partial = 0
+            self._partial = threading.Thread(target=self._run_partial, name="stt-partial", daemon=True)
+            self._partial.start()
+
+    def finish(self) -> str:
+        """
+        Transcribe the audio that is not committed yet.
+
+        Returns:
+            str: The transcript of the whole utterance
+        """
+        if self._partial is not None:
+            self._partial.join()
+        with self._lock:
+            audio = bytes(self._audio)
+        segments = self._transcribe(audio) if audio else []
+        return " ".join(self.committed + [text for _, _, text in segments]).strip()
+
+    def _busy(self) -> bool:
+        return self._partial is not None and self._partial.is_alive()
+
+    def _transcribe(self, audio: bytes) -> list:
+        samples = np.frombuffer(audio, dtype=np.int16).astype(np.float32) / 32768.0
+        start = time.perf_counter()
+        segments = self.transcribe(samples, " ".join(self.committed[-3:]))
+        self.transcription_seconds += time.perf_counter() - start
+        return segments
+
+    def _run_partial(self) -> None:
+        with self._lock:
+            audio = bytes(self._audio)
+        try:
+            segments = self._transcribe(audio)
+        except Exception as e:
+            logger.error(f"Partial transcription failed: {str(e)}")
+            return
+        commit_before = len(audio) / 2 / SAMPLE_RATE - COMMIT_MARGIN_SECONDS
+        committed_end = 0.0
+        for _, end, text in segments:
+            if end > commit_before:
+                break
+            self.committed.append(text)
+            committed_end = end
+        if committed_end:
+            with self._lock:
+                del self._audio[:int(committed_end * SAMPLE_RATE) * 2]
+
+
+class Utterance:
+    def __init__(self, text: str, audio_seconds: float, endpointing_delay: float, transcription_seconds: float):
+        self.text = text
+        self.audio_seconds = audio_seconds
+        # Seconds from the last voiced frame until the transcript was ready
+        self.endpointing_delay = endpointing_delay
+        self.transcription_seconds = transcription_seconds
+
+    @property
+    def real_time_factor(self) -> float:
+        return self.transcription_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+
+def listen(frames: Iterator[bytes], config, transcribe: Callable[[np.ndarray, str], list] = None) -> Optional[Utterance]:
+    """
+    Wait for the next utterance and transcribe it.
+
+    Voice activity detection starts the utterance after a few voiced frames
+    and ends it after 'vad_silence_ms' of silence; the transcript is ready
+    shortly after because most of it was transcribed while the user spoke.
+
+    Args:
+        frames (Iterator[bytes]): 16 kHz mono 16-bit PCM frames of FRAME_MS milliseconds
+        config: Configuration dictionary with the voice input settings
+        transcribe (Callable, optional): Speech recognizer. Defaults to faster-whisper.
+
+    Returns:
+        Optional[Utterance]: The utterance, or None when the source ended before anyone spoke
+    """
+    with import_phase("webrtcvad"):
+        import webrtcvad
+
+    vad = webrtcvad.Vad(config["vad_aggressiveness"])
+    transcribe = transcribe or _whisper_transcriber(config)
+    silence_frames = max(1, config["vad_silence_ms"] // FRAME_MS)
+    transcriber: Optional[StreamingTranscriber] = None
+    pre_roll: list = []
+    voiced_run = 0
+    silent_run = 0
+    last_voiced = None
+
+    for frame in frames:
+        voiced = vad.is_speech(frame, SAMPLE_RATE)
+        if transcriber is None:
+            pre_roll = (pre_roll + [frame])[-PRE_ROLL_FRAMES:]
+            voiced_run = voiced_run + 1 if voiced else 0
+            if voiced_run >= START_FRAMES:
+                transcriber = StreamingTranscriber(transcribe, config["stt_partial_interval"])
+                for buffered in pre_roll:
+                    transcriber.feed(buffered)
+                last_voiced = time.perf_counter()
+            continue
+
+        transcriber.feed(frame)
+        if voiced:
+            silent_run = 0
+            last_voiced = time.perf_counter()
+        else:
+            silent_run += 1
+            if silent_run >= silence_frames:
+                break
+
+    if transcriber is None:
+        return None
+    text = transcriber.finish()
+    return Utterance(text, transcriber.audio_seconds, time.perf_counter() - last_voiced, transcriber.transcription_seconds)
+
+
+def _whisper_transcriber(config) -> Callable[[np.ndarray, str], list]:
+    model = get_transcription_model(config)
+
+    def _transcribe(samples: np.ndarray, prompt: str) -> list:
+        segments, _ = model.transcribe(
+            samples,
+            language=config["stt_language"] or None,
+            beam_size=1,
+            condition_on_previous_text=False,
+            initial_prompt=prompt or None
+        )
+        return [(segment.start, segment.end, segment.text.strip()) for segment in segments]
+
+    return _transcribe
+
+
+def get_voice_input(config, on_prompt: Optional[Callable[[], None]] = None) -> str:
+    """
+    Get the user's prompt by voice. Same interface as console_helper.get_user_input.
+
+    When a file or stream source is exhausted the prompt is "exit", which ends the session.
+
+    Args:
+        config: Configuration dictionary with the voice input settings
+        on_prompt (Callable, optional): Called once listening starts
+
+    Returns:
+        str: The transcribed prompt
+    """
+    global _source, _last_utterance
+    if _source is None:
+        _source = open_frame_source(config)
+        # Load the model before listening so the first utterance is not delayed
+        get_transcription_model(config)
+
+    print("\n")
+    print(f"{bcolors.OKBLUE}Listening... (say 'exit' to quit){bcolors.ENDC}")
+    if on_prompt is not None:
+        on_prompt()
+    # The microphone is only open while listening, so the bot does not hear itself
+    if isinstance(_source, MicrophoneFrames):
+        _source.start()
+    try:
+        utterance = listen(_source, config)
+    finally:
+        if isinstance(_source, MicrophoneFrames):
+            _source.stop()
+    if utterance is None:
+        _last_utterance = None
+        return "exit"
+
+    _last_utterance = utterance
+    logger.info(f"Voice input: {utterance.audio_seconds:.2f}s of speech, endpointing delay "
+                f"{utterance.endpointing_delay * 1000:.0f} ms, real-time factor {utterance.real_time_factor:.2f}")
+    print(f"{bcolors.OKBLUE}You said: {bcolors.ENDC}{utterance.text}")
+    # Trailing punctuation would keep "Exit." from ending the session
+    if utterance.text.strip(" .!?").lower() in ("bye", "exit"):
+        return utterance.text.strip(" .!?")
+    return utterance.text
+
+
+def last_utterance() -> Optional[Utterance]:
+    """
+    Return the most recent utterance, for metrics.
+
+    Returns:
+        Optional[Utterance]: The last utterance, or None when it was not voice input
+    """
+    return _last_utterance
@@ -0,0 +1,76 @@
+import datetime
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Reference point for startup timings; this module is imported first by talk.py
+PROCESS_START = time.perf_counter()
+
+# Seconds spent importing each group of modules, in import order
+_import_timings: dict = {}
+# Imports also run on background threads, such as the TTS preload
+_timings_lock = threading.Lock()
+_reported = False
+
+
+@contextmanager
+def import_phase(name: str):
+    """
+    Measure the time spent importing a group of modules.
+
+    Args:
+        name (str): Label of the import group
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _timings_lock:
+            _import_timings[name] = _import_timings.get(name, 0.0) + elapsed
+
+
+def import_timings() -> dict:
+    """
+    Return the measured import times.
+
+    Returns:
+        dict: Import group label to seconds
+    """
+    with _timings_lock:
+        return dict(_import_timings)
+
+
+def report_startup(config) -> None:
+    """
+    Report the cold start once, when the first prompt is shown.
+
+    Logs the import-time breakdown and the time to first prompt, and appends
+    them as one JSON line to 'startup_report_file' when it is set.
+
+    Args:
+        config: Configuration dictionary with the 'startup_report_file' setting
+    """
+    global _reported
+    if _reported:
+        return
+    _reported = True
+
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "time_to_first_prompt": round(time.perf_counter() - PROCESS_START, 6),
+        "imports": {name: round(seconds, 6) for name, seconds in import_timings().items()},
+        "read_after_generate": config["read_after_generate"],
+    }
+    logger.info(f"Startup: {record}")
+    if config["startup_report_file"]:
+        try:
+            with open(config["startup_report_file"], "a") as file:
+                file.write(json.dumps(record) + "\n")
+        except Exception as e:
+            logger.error(f"Failed to write startup report: {str(e)}")
@@ -1,16 +1,309 @@
-from helpers.file_helper import write_transcript
-def save_transcript(user_prompt: str, answer: str, file_date: str, config) -> None:
+import datetime
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Optional
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Index of all sessions in the transcript directory
+INDEX_FILE = "sessions.json"
+FSYNC_POLICIES = ("always", "interval", "never")
+
+# Session log shared by every turn in the process
+_session_log = None
+
+
+class SessionLog:
+    """
+    Append-only JSON-lines log of one conversation.
+
+    Records are handed to a background writer, which appends everything that
+    queued up since its last write in one go (group commit) and syncs it to
+    disk according to the fsync policy: after every write ("always"), at
+    most every 'fsync_interval' seconds ("interval"), or when the operating
+    system decides ("never"). The session index is updated after each write.
+    """
+
+    def __init__(self, directory: str, session_id: str, compress: bool = False, fsync: str = "interval",
+                 fsync_interval: float = 1.0, turns: int = 0):
+        """
+        Args:
+            directory (str): Transcript directory holding the logs and the index
+            session_id (str): Name of the session
+            compress (bool, optional): Whether to write gzip-compressed JSON lines. Defaults to False.
+            fsync (str, optional): "always", "interval" or "never". Defaults to "interval".
+            fsync_interval (float, optional): Seconds between syncs with the "interval" policy. Defaults to 1.
+            turns (int, optional): Turns already in the log, when resuming. Defaults to 0.
+        """
+        if fsync not in FSYNC_POLICIES:
+            logger.warning(f"Unknown fsync policy '{fsync}', using interval")
+            fsync = "interval"
+        self.directory = directory
+        self.session_id = session_id
+        self.file_name = f"{session_id}.jsonl.gz" if compress else f"{session_id}.jsonl"
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.turns = turns
+        self.writes = 0
+        self.records_written = 0
+        self.syncs = 0
+        self._records: queue.Queue = queue.Queue()
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        # Appending to a gzip file adds a new member; gzip readers see one stream
+        self._file = (gzip.open if compress else open)(os.path.join(directory, self.file_name), "ab")
+        self._writer = threading.Thread(target=self._write_worker, name="session-log", daemon=True)
+        self._writer.start()
+
+    def append(self, record: dict) -> None:
+        """
+        Queue a turn record without waiting for the disk.
+
+        Args:
+            record (dict): The turn; the session name and turn number are added
+        """
+        self.turns += 1
+        self._records.put({"session": self.session_id, "turn": self.turns, **record})
+
+    def _write_worker(self) -> None:
+        while True:
+            batch = [self._records.get()]
+            # Everything that arrived meanwhile is committed together
+            while True:
+                try:
+                    batch.append(self._records.get_nowait())
+                except queue.Empty:
+                    break
+            closing = batch[-1] is None
+            records = [record for record in batch if record is not None]
+            if records:
+                try:
+                    self._commit(records)
+                except Exception as e:
+                    logger.error(f"Failed to write session log: {str(e)}")
+            if closing:
+                if self.fsync != "never":
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                return
+
+    def _commit(self, records: list) -> None:
+        self._file.write("".join(json.dumps(record) + "\n" for record in records).encode("utf-8"))
+        self._file.flush()
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_sync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+            self.syncs += 1
+        self.writes += 1
+        self.records_written += len(records)
+        update_session_index(self.directory, self.session_id, {
+            "file": self.file_name,
+            "updated": records[-1].get("answer_date"),
+            "turns": records[-1]["turn"],
+        }, title=records[0].get("user_prompt", ""))
+
+    def stats(self) -> dict:
+        return {
+            "session": self.session_id,
+            "records": self.records_written,
+            "writes": self.writes,
+            "syncs": self.syncs,
+        }
+
+    def close(self) -> None:
+        """Write the queued records and close the log."""
+        self._records.put(None)
+        self._writer.join()
+
+
+def read_session_index(directory: str) -> dict:
     """
-    Save the generated transcript to a file.
+    Read the session index.
+
+    Args:
+        directory (str): Transcript directory
+
+    Returns:
+        dict: Session name to file, title, last update and turn count
+    """
+    try:
+        with open(os.path.join(directory, INDEX_FILE)) as index:
+            return json.load(index)
+    except FileNotFoundError:
+        return {}
+
+
+def update_session_index(directory: str, session_id: str, fields: dict, title: str = "") -> None:
+    """
+    Update one session's entry in the index.
+
+    Args:
+        directory (str): Transcript directory
+        session_id (str): Name of the session
+        fields (dict): Entry fields to set
+        title (str, optional): First prompt of the session, kept from its first record
+    """
+    index = read_session_index(directory)
+    entry = index.setdefault(session_id, {"title": title[:80]})
+    entry.update(fields)
+    temporary_path = os.path.join(directory, f"{INDEX_FILE}.tmp")
+    with open(temporary_path, "w") as file:
+        json.dump(index, file, indent=1)
+    os.replace(temporary_path, os.path.join(directory, INDEX_FILE))
+
+
+def load_session(directory: str, session_id: str) -> list:
+    """
+    Read all records of a session.
+
+    Args:
+        directory (str): Transcript directory
+        session_id (str): Name of the session
+
+    Returns:
+        list: The session's turn records, in order
+    """
+    entry = read_session_index(directory).get(session_id)
+    if entry is None:
+        raise KeyError(f"Unknown session {session_id}")
+    file_path = os.path.join(directory, entry["file"])
+    records = []
+    with (gzip.open if file_path.endswith(".gz") else open)(file_path, "rt", encoding="utf-8") as file:
+        try:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A record cut short by a crash is skipped
+                    logger.warning(f"Skipping damaged record in {entry['file']}")
+        except (EOFError, OSError) as e:
+            # A gzip stream cut short by a crash ends here; the records before it are kept
+            logger.warning(f"Session log {entry['file']} ends early, keeping {len(records)} records: {str(e)}")
+    return records
+
+
+def get_session_log(config) -> SessionLog:
+    """
+    Return the process-wide session log, opening it on first use.
+
+    When 'resume_session' names a session ("last" for the most recent one),
+    new turns are appended to it; otherwise a new session is started.
+
+    Args:
+        config: Configuration dictionary with the session log settings
+
+    Returns:
+        SessionLog: The session log
+    """
+    global _session_log
+    if _session_log is None:
+        directory = config["transcript_directory"]
+        session_id, turns = resolve_session(config)
+        compress = config["session_log_compress"]
+        if session_id is None:
+            session_id = f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}"
+        else:
+            # A resumed session keeps writing in its own format
+            compress = read_session_index(directory)[session_id]["file"].endswith(".gz")
+        _session_log = SessionLog(
+            directory,
+            session_id,
+            compress,
+            config["session_log_fsync"],
+            config["session_log_fsync_interval"],
+            turns
+        )
+    return _session_log
+
+
+def resolve_session(config) -> tuple:
+    """
+    Find the session named by 'resume_session'.
+
+    Args:
+        config: Configuration dictionary with the 'resume_session' setting
+
+    Returns:
+        tuple: The session name and its turn count, or (None, 0) when nothing is resumed
+    """
+    name = config["resume_session"]
+    if not name:
+        return None, 0
+    index = read_session_index(config["transcript_directory"])
+    if name == "last":
+        if not index:
+            return None, 0
+        name = max(index, key=lambda session_id: index[session_id].get("updated") or "")
+    if name not in index:
+        logger.warning(f"Session {name} not found, starting a new one")
+        return None, 0
+    return name, index[name].get("turns", 0)
+
+
+def resume_history(history, config) -> int:
+    """
+    Load the resumed session's turns into the chat history.
+
+    Args:
+        history (ChatHistory): History of the new process
+        config: Configuration dictionary with the session log settings
+
+    Returns:
+        int: Number of turns loaded
+    """
+    session_id, _ = resolve_session(config)
+    if session_id is None:
+        return 0
+    records = load_session(config["transcript_directory"], session_id)
+    for record in records:
+        history.add_turn(record["user_prompt"], record["raw_answer"], record["user_prompt_date"], record["answer_date"])
+    logger.info(f"Resumed session {session_id} with {len(records)} turns")
+    return len(records)
+
+
+def save_transcript(user_prompt: str, answer: str, raw_answer: str, user_prompt_date: str, answer_date: str,
+                    config, timings: Optional[dict] = None) -> None:
+    """
+    Append a turn to the session log.
 
     Args:
         user_prompt (str): The original user prompt
-        answer (str): The generated text response
-        file_date (str): The date and time string for the file name
+        answer (str): The answer as shown, without thinking tags when configured
+        raw_answer (str): The answer as generated
+        user_prompt_date (str): Date and time of the prompt
+        answer_date (str): Date and time of the answer
+        timings (dict, optional): Turn spans and marks
 
     Returns:
         None
     """
-    
-    write_transcript(f"Original Prompt: {user_prompt}\n\n{answer}", config, file_date)
+    get_session_log(config).append({
+        "user_prompt": user_prompt,
+        "user_prompt_date": user_prompt_date,
+        "answer_date": answer_date,
+        "raw_answer": raw_answer,
+        "answer": answer,
+        "model": config["chat_model_name"],
+        "timings": timings or {},
+    })
+
+
+def close_session_log() -> dict:
+    """
+    Write pending records and report the log's counters.
 
+    Returns:
+        dict: Session log statistics (empty when nothing was logged)
+    """
+    if _session_log is None:
+        return {}
+    _session_log.close()
+    return _session_log.stats()
@@ -1,8 +1,352 @@
-import torch
-from TTS.api import TTS
-import pygame
+import logging
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+import numpy as np
 from bgcolors import bcolors
 from helpers.console_helper import print_text
+from helpers.chat_helper import ERROR_ANSWER, strip_think_tags_stream
+from helpers.audio_cache_helper import get_cached_audio, prewarm_audio_cache, store_cached_audio
+from helpers.audio_archive_helper import get_audio_archive
+from helpers.audio_helper import AudioChunk, AudioPipeline, NullAudioSink, create_audio_sink, load_wav
+from helpers.startup_helper import import_phase
+
+# torch, Coqui TTS and stream2sentence are imported on first use, so sessions
+# that never speak do not pay for them
+if TYPE_CHECKING:
+    from TTS.api import TTS
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Loaded TTS models keyed by model name, least recently used first
+_loaded_models: "OrderedDict[str, TTS]" = OrderedDict()
+# Serializes model loads so a background preload and a turn never load the same model twice
+_load_lock = threading.Lock()
+# Audio sink shared by every playback in the process
+_audio_sink = None
+# Whether NLTK's sentence tokenizer data is installed; checked on first use
+_nltk_ready = None
+_nltk_lock = threading.Lock()
+# Sentence ends used when NLTK's tokenizer data is missing
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+def get_tts_device(config) -> str:
+    """
+    Pick the torch device used for speech synthesis.
+
+    Args:
+        config: Configuration dictionary with the 'use_gpu' flag
+
+    Returns:
+        str: "cuda" when a GPU is available and enabled, otherwise "cpu"
+    """
+    import torch
+    return "cuda" if config["use_gpu"] and torch.cuda.is_available() else "cpu"
+
+
+def get_tts_model(config, model_name: str = None) -> "TTS":
+    """
+    Return a loaded TTS model, loading it on first use.
+
+    Models stay resident between turns. When more than 'tts_cache_size' voices
+    have been loaded, the least recently used one is released.
+
+    Args:
+        config: Configuration dictionary with TTS settings
+        model_name (str, optional): Coqui model name. Defaults to config['bot_sound'].
+
+    Returns:
+        TTS: The ready-to-use TTS model
+    """
+    model_name = model_name or config['bot_sound']
+
+    with _load_lock:
+        tts = _loaded_models.get(model_name)
+        if tts is not None:
+            _loaded_models.move_to_end(model_name)
+            return tts
+
+        with import_phase("torch"):
+            import torch
+        with import_phase("TTS"):
+            from TTS.api import TTS
+
+        device = get_tts_device(config)
+        start = time.perf_counter()
+        tts = TTS(model_name=model_name, progress_bar=False).to(device)
+        logger.info(f"Loaded TTS model {model_name} on {device} in {time.perf_counter() - start:.2f}s")
+
+        _loaded_models[model_name] = tts
+        while len(_loaded_models) > max(1, config["tts_cache_size"]):
+            evicted_name, evicted = _loaded_models.popitem(last=False)
+            del evicted
+            logger.info(f"Evicted TTS model {evicted_name}")
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        return tts
+
+
+def register_tts_model(model_name: str, tts) -> None:
+    """
+    Register an already constructed TTS engine under a model name.
+
+    Used to plug in alternative engines, such as the fake engine of the
+    benchmark suite, without loading a Coqui model.
+
+    Args:
+        model_name (str): Name the engine is looked up by, as in config['bot_sound']
+        tts: Object with the Coqui TTS tts() method and synthesizer.output_sample_rate
+    """
+    with _load_lock:
+        _loaded_models[model_name] = tts
+        _loaded_models.move_to_end(model_name)
+
+
+def get_voice_params(config) -> dict:
+    """
+    Collect the configured voice settings passed to the TTS model.
+
+    They change the rendered audio, so they are also part of its cache key.
+
+    Args:
+        config: Configuration dictionary with the 'tts_speaker', 'tts_language' and 'tts_speed' settings
+
+    Returns:
+        dict: Keyword arguments for tts(); settings left at the model's default are omitted
+    """
+    params = {}
+    if config["tts_speaker"]:
+        params["speaker"] = config["tts_speaker"]
+    if config["tts_language"]:
+        params["language"] = config["tts_language"]
+    if config["tts_speed"] != 1.0:
+        params["speed"] = config["tts_speed"]
+    return params
+
+
+def get_prewarm_phrases(config) -> list:
+    """
+    List the phrases rendered into the audio cache at startup.
+
+    Args:
+        config: Configuration dictionary with the 'audio_cache_prewarm' setting
+
+    Returns:
+        list: The fixed error answer followed by the configured phrases
+    """
+    phrases = [ERROR_ANSWER]
+    phrases.extend(phrase.strip() for phrase in config["audio_cache_prewarm"].split("|") if phrase.strip())
+    return phrases
+
+
+def preload_tts_model(config) -> threading.Thread:
+    """
+    Load the configured TTS model in a background thread.
+
+    It is started once the first prompt is shown, so the model loads while
+    the user is typing and the first turn does not pay the loading cost.
+    Known phrases are then rendered into the audio cache.
+
+    Args:
+        config: Configuration dictionary with TTS settings
+
+    Returns:
+        threading.Thread: The started loader thread
+    """
+    def _preload():
+        try:
+            get_tts_model(config)
+            prewarm_audio_cache(
+                get_prewarm_phrases(config),
+                lambda text: synthesize_speech(text, config),
+                config,
+                get_voice_params(config)
+            )
+        except Exception as e:
+            logger.error(f"Failed to preload TTS model: {str(e)}")
+
+    thread = threading.Thread(target=_preload, name="tts-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def _nltk_tokenizer_ready() -> bool:
+    # nltk 3.9 tokenizes with punkt_tab, while stream2sentence only downloads punkt
+    global _nltk_ready
+    with _nltk_lock:
+        if _nltk_ready is None:
+            import nltk
+
+            try:
+                nltk.data.find("tokenizers/punkt_tab")
+                _nltk_ready = True
+            except LookupError:
+                _nltk_ready = nltk.download("punkt_tab", quiet=True)
+                if not _nltk_ready:
+                    logger.warning("NLTK punkt_tab data is not available, splitting sentences at punctuation")
+        return _nltk_ready
+
+
+def split_sentences_simple(deltas: Iterable[str], minimum_length: int = 10) -> Iterator[str]:
+    """
+    Split streamed text into sentences at sentence-ending punctuation and line breaks.
+
+    Args:
+        deltas (Iterable[str]): Text, possibly still being generated
+        minimum_length (int, optional): Shorter sentences are joined with the next one. Defaults to 10.
+
+    Yields:
+        str: Complete sentences, in order
+    """
+    buffer = ""
+    pending = ""
+    for delta in deltas:
+        buffer += delta
+        *complete, buffer = SENTENCE_END.split(buffer)
+        for sentence in complete:
+            if not sentence.strip():
+                continue
+            pending = f"{pending} {sentence.strip()}" if pending else sentence.strip()
+            if len(pending) >= minimum_length:
+                yield pending
+                pending = ""
+    rest = " ".join(part for part in (pending, buffer.strip()) if part)
+    if rest:
+        yield rest
+
+
+def split_sentences(deltas: Iterable[str]) -> Iterator[str]:
+    """
+    Split streamed text into sentences with stream2sentence.
+
+    Without NLTK's tokenizer data, which cannot be downloaded offline, the
+    text is split at punctuation instead.
+
+    Args:
+        deltas (Iterable[str]): Text, possibly still being generated
+
+    Returns:
+        Iterator[str]: Complete sentences, in order
+    """
+    with import_phase("stream2sentence"):
+        from stream2sentence import generate_sentences
+    if not _nltk_tokenizer_ready():
+        return split_sentences_simple(deltas)
+    return generate_sentences(deltas)
+
+
+def synthesize_speech(text: str, config) -> AudioChunk:
+    """
+    Synthesize a piece of text into in-memory audio.
+
+    Previously rendered phrases are served from the audio cache.
+
+    Args:
+        text (str): The text to speak
+        config: Configuration dictionary with TTS settings
+
+    Returns:
+        AudioChunk: Mono float32 samples and their sample rate
+    """
+    params = get_voice_params(config)
+    chunk = get_cached_audio(text, config, params)
+    if chunk is not None:
+        return chunk
+
+    tts = get_tts_model(config)
+    samples = tts.tts(text=text, **params)
+    chunk = np.asarray(samples, dtype=np.float32), tts.synthesizer.output_sample_rate
+    store_cached_audio(text, chunk, config, params)
+    return chunk
+
+
+def get_audio_sink(config):
+    """
+    Return the process-wide audio sink, creating it on first use.
+
+    Args:
+        config: Configuration dictionary with playback settings
+
+    Returns:
+        The audio sink used for playback
+    """
+    global _audio_sink
+    if _audio_sink is None:
+        _audio_sink = create_audio_sink(config)
+    return _audio_sink
+
+
+def set_audio_sink(sink) -> None:
+    """
+    Replace the process-wide audio sink, e.g. with a NullAudioSink for headless runs.
+
+    Args:
+        sink: Audio sink with play() and stop() methods
+    """
+    global _audio_sink
+    _audio_sink = sink
+
+
+def _speak(sentences: Iterable[str], file_date: str, config) -> None:
+    """
+    Synthesize and play sentences through an audio pipeline.
+
+    Each sentence is synthesized while the previous one is playing. The audio
+    is only archived when 'keep_generated_file' is set.
+
+    Args:
+        sentences (Iterable[str]): The sentences to speak, possibly still being generated
+        file_date (str): The date for the output file name
+        config: Configuration dictionary with settings for the text-to-speech engine and playback
+    """
+    from helpers.tts_scheduler_helper import get_synthesis_scheduler
+
+    sink = get_audio_sink(config) if config["read_after_generate"] else NullAudioSink()
+    scheduler = get_synthesis_scheduler(config)
+    # With worker processes every sentence is handed to the scheduler as soon as
+    # it is complete, and the pipeline only waits for the results in order
+    scheduled: deque = deque()
+    pipeline = AudioPipeline(
+        (lambda text: scheduled.popleft().result()) if scheduler else (lambda text: synthesize_speech(text, config)),
+        sink,
+        config["audio_queue_size"],
+        keep_audio=config["keep_generated_file"]
+    ).start()
+    print_text(f"{bcolors.OKBLUE}Press Ctrl+C to stop playing{bcolors.ENDC}", config, False)
+
+    try:
+        for sentence in sentences:
+            if pipeline.cancelled:
+                break
+            if not sentence.strip():
+                continue
+            if scheduler:
+                scheduled.append(scheduler.submit(sentence))
+            pipeline.submit(sentence)
+    except KeyboardInterrupt:
+        pipeline.cancel()
+    except Exception:
+        pipeline.cancel()
+        raise
+    finally:
+        # The pipeline's threads are always shut down before an error is passed on
+        pipeline.close()
+        pipeline.wait()
+        for future in scheduled:
+            future.cancel()
+
+    # Compressed and written by the archive's worker thread, off the turn's critical path
+    audio = pipeline.audio()
+    if audio is not None:
+        get_audio_archive(config).submit(audio[0], audio[1], file_date)
+
+
 def run_tts(answer: str, file_date: str, config) -> None:
     """
     Run the TTS model, generate speech based on the user's prompt, and play the generated audio.
@@ -12,28 +356,73 @@ def run_tts(answer: str, file_date: str, config) -> None:
         file_date (str): The date for the output file name
         config: Configuration dictionary with settings for the text-to-speech engine and playback
     """
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    #tts_model_name = "tts_models/en/jenny/jenny"
-    tts_model_name = config['bot_sound']
-    # Initialize TTS model
-    tts = TTS(model_name=tts_model_name, progress_bar=False).to(device)
-
-    file_extension = "-generated.wav" if config["keep_generated_file"] else ".wav"
-    file_name = f"{config['sound_directory']}stream{file_extension}"
-    if config["keep_generated_file"]:
-        file_name = f"{config['sound_directory']}{file_date}{file_extension}"
-    output_file_path = file_name
     if answer is None:
         answer = "no answer"
 
-    # Generate and save the TTS audio
-    tts.tts_to_file(text=answer, file_path=output_file_path)
-    del tts
+    try:
+        _speak(split_sentences(iter([answer])), file_date, config)
+    except Exception as e:
+        # The turn is still recorded when speech fails
+        logger.error(f"Speech failed: {str(e)}")
+
+
+def _prefetch(deltas: Iterable[str], collected: list) -> Iterator[str]:
+    """
+    Consume a stream of text deltas in a background thread.
+
+    The model keeps streaming while sentences are being synthesized and played.
+
+    Args:
+        deltas (Iterable[str]): Text deltas of a response
+        collected (list): List every received delta is appended to
+
+    Yields:
+        str: The received deltas, in order
+    """
+    pending: queue.Queue = queue.Queue()
+
+    def _reader():
+        try:
+            for delta in deltas:
+                collected.append(delta)
+                pending.put(delta)
+        finally:
+            pending.put(None)
+
+    threading.Thread(target=_reader, name="llm-stream", daemon=True).start()
+    while (delta := pending.get()) is not None:
+        yield delta
+
+
+def run_tts_stream(deltas: Iterable[str], file_date: str, config) -> str:
+    """
+    Speak a streamed response sentence by sentence while it is still being generated.
+
+    Args:
+        deltas (Iterable[str]): Text deltas of the response
+        file_date (str): The date for the output file names
+        config: Configuration dictionary with settings for the text-to-speech engine and playback
+
+    Returns:
+        str: The full response text, including any thinking tags
+    """
+    collected: list = []
+    prefetched = _prefetch(deltas, collected)
+    spoken = prefetched
+    if config["remove_deepseek_think_tags"]:
+        spoken = strip_think_tags_stream(spoken)
+
+    try:
+        _speak(split_sentences(spoken), file_date, config)
+    except Exception as e:
+        # The answer is still returned, so the turn is recorded when speech fails
+        logger.error(f"Speech failed: {str(e)}")
 
+    # Drain whatever is left if playback was cancelled early or failed
+    for _ in prefetched:
+        pass
+    return "".join(collected)
 
-    if config["read_after_generate"]:
-        play_audio(output_file_path, config)
-    
 
 def play_audio(file_path: str, config) -> None:
     """
@@ -46,13 +435,11 @@ def play_audio(file_path: str, config) -> None:
     Returns:
         None
     """
-    pygame.mixer.init()
-    pygame.mixer.music.load(file_path)
-    pygame.mixer.music.play()
+    samples, sample_rate = load_wav(file_path)
+    sink = get_audio_sink(config)
     print_text(f"{bcolors.OKBLUE}Press Ctrl+C to stop playing{bcolors.ENDC}", config, False)
 
     try:
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
+        sink.play(samples, sample_rate)
     except KeyboardInterrupt:
-        pygame.mixer.music.stop()
\ No newline at end of file
+        sink.stop()
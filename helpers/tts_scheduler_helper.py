@@ -0,0 +1,328 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from helpers.audio_cache_helper import get_cached_audio, store_cached_audio
+from helpers.metrics_helper import percentile
+from helpers.tts_helper import get_tts_model, get_voice_params
+
+# Set up logging configuration
+logger = logging.getLogger(__name__)
+
+# Conversation used when the caller does not name one
+DEFAULT_CONVERSATION = "default"
+
+# Scheduler shared by every turn in the process
+_scheduler = None
+# Configuration of a worker process, set by its initializer
+_worker_config = None
+
+
+def _init_worker(config, torch_threads: int) -> None:
+    """
+    Prepare a synthesis worker process: pin torch threads and load the model.
+
+    Args:
+        config: Configuration dictionary with TTS settings
+        torch_threads (int): Intra-op threads torch may use in this process
+    """
+    global _worker_config
+    _worker_config = config
+    # Read by the OpenMP runtime when torch is first imported
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    import torch
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+    get_tts_model(config)
+
+
+def _synthesize_batch(texts: list, config=None) -> list:
+    """
+    Synthesize a batch of sentences with the loaded model.
+
+    Coqui's tts() takes one text at a time, so the sentences run back to back
+    on a model that stays loaded; batching saves the per-call dispatch and
+    inter-process round trips.
+
+    Args:
+        texts (list): Sentences to speak
+        config (optional): Configuration dictionary. Defaults to the worker process configuration.
+
+    Returns:
+        list: One (samples, sample_rate) pair per sentence
+    """
+    config = config or _worker_config
+    tts = get_tts_model(config)
+    sample_rate = tts.synthesizer.output_sample_rate
+    params = get_voice_params(config)
+    return [(np.asarray(tts.tts(text=text, **params), dtype=np.float32), sample_rate) for text in texts]
+
+
+class _Request:
+    __slots__ = ("text", "future", "submitted")
+
+    def __init__(self, text: str, future: Future):
+        self.text = text
+        self.future = future
+        self.submitted = time.perf_counter()
+
+
+class SynthesisScheduler:
+    """
+    Batches sentences from many conversations onto a pool of TTS workers.
+
+    Pending sentences are grouped into micro-batches of up to 'batch_size',
+    waiting at most 'max_wait' seconds for a batch to fill. Conversations are
+    served round robin, so a long answer does not hold up the others. Each
+    sentence gets a future; callers that resolve their futures in submission
+    order receive their audio in order.
+
+    With 'workers' set to 0 batches run on a single thread of this process,
+    which is what a registered in-process engine (such as the benchmark's
+    fake TTS) needs. Otherwise every worker is a separate process with its
+    own model and a pinned number of torch threads.
+    """
+
+    def __init__(self, config, workers: int = 0, batch_size: int = 4, max_wait: float = 0.02,
+                 torch_threads: int = 0, max_queued: int = 64, submit_timeout: Optional[float] = 30.0):
+        """
+        Args:
+            config: Configuration dictionary with TTS settings
+            workers (int, optional): Worker processes; 0 synthesizes in this process. Defaults to 0.
+            batch_size (int, optional): Maximum sentences per batch. Defaults to 4.
+            max_wait (float, optional): Seconds a batch waits to fill up. Defaults to 0.02.
+            torch_threads (int, optional): Torch threads per worker process; 0 divides the CPUs
+                                           evenly between workers. Defaults to 0.
+            max_queued (int, optional): Sentences allowed to wait for a batch. Defaults to 64.
+            submit_timeout (float, optional): Seconds submit() waits for room; None waits until there is
+                                              room. Defaults to 30.
+        """
+        self.config = config
+        self.voice_params = get_voice_params(config)
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.max_queued = max(1, max_queued)
+        self.submit_timeout = submit_timeout
+        self.batches = 0
+        self.batched_sentences = 0
+        self.max_batch_size = 0
+        self.cache_hits = 0
+        self.in_flight = 0
+        self.latencies: deque = deque(maxlen=1000)
+
+        self._pending: "OrderedDict[str, deque]" = OrderedDict()
+        self._queued = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+        if workers > 0:
+            torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+            # Spawned workers do not inherit CUDA or OpenMP state from this process
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(config, torch_threads)
+            )
+            self._run_batch = lambda texts: self._executor.submit(_synthesize_batch, texts)
+            logger.info(f"Started {workers} TTS worker processes with {torch_threads} torch threads each")
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-batch")
+            self._run_batch = lambda texts: self._executor.submit(_synthesize_batch, texts, config)
+        # Only one batch per worker is dispatched, so new sentences gather while workers are busy
+        self._slots = threading.Semaphore(max(1, workers))
+        self._dispatcher = threading.Thread(target=self._dispatch, name="tts-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, text: str, conversation_id: str = DEFAULT_CONVERSATION) -> Future:
+        """
+        Queue a sentence for synthesis.
+
+        Args:
+            text (str): The sentence to speak
+            conversation_id (str, optional): Conversation the sentence belongs to
+
+        Returns:
+            Future: Resolves to the AudioChunk
+
+        Raises:
+            queue.Full: When the queue stayed full for 'submit_timeout' seconds
+        """
+        future: Future = Future()
+        chunk = get_cached_audio(text, self.config, self.voice_params)
+        if chunk is not None:
+            with self._condition:
+                self.cache_hits += 1
+            future.set_running_or_notify_cancel()
+            future.set_result(chunk)
+            return future
+
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queued < self.max_queued, self.submit_timeout):
+                raise queue.Full("Speech synthesis queue is full")
+            self._pending.setdefault(conversation_id, deque()).append(_Request(text, future))
+            self._queued += 1
+            self._condition.notify_all()
+        return future
+
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def _take_batch(self) -> list:
+        # Called with the condition held; one sentence per conversation per round
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            conversation_id, requests = next(iter(self._pending.items()))
+            request = requests.popleft()
+            self._queued -= 1
+            if requests:
+                self._pending.move_to_end(conversation_id)
+            else:
+                del self._pending[conversation_id]
+            if request.future.set_running_or_notify_cancel():
+                batch.append(request)
+        self._condition.notify_all()
+        return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            self._slots.acquire()
+            with self._condition:
+                self._condition.wait_for(lambda: self._queued or self._closed)
+                if self._closed and not self._queued:
+                    return
+                deadline = time.perf_counter() + self.max_wait
+                while self._queued < self.batch_size and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._take_batch()
+                if batch:
+                    # Counters are shared with submit() and the executor's callbacks
+                    self.batches += 1
+                    self.batched_sentences += len(batch)
+                    self.max_batch_size = max(self.max_batch_size, len(batch))
+                    self.in_flight += len(batch)
+            if not batch:
+                self._slots.release()
+                continue
+
+            try:
+                result = self._run_batch([request.text for request in batch])
+            except Exception as e:
+                self._finish(batch, None, e)
+                continue
+            result.add_done_callback(lambda done, batch=batch: self._finish(batch, done, None))
+
+    def _finish(self, batch: list, done, error) -> None:
+        self._slots.release()
+        with self._condition:
+            self.in_flight -= len(batch)
+        try:
+            chunks = done.result() if error is None else None
+        except Exception as e:
+            error = e
+        if error is not None:
+            logger.error(f"Speech synthesis batch of {len(batch)} failed: {str(error)}")
+            for request in batch:
+                request.future.set_exception(error)
+            return
+
+        now = time.perf_counter()
+        with self._condition:
+            self.latencies.extend(now - request.submitted for request in batch)
+        for request, chunk in zip(batch, chunks):
+            store_cached_audio(request.text, chunk, self.config, self.voice_params)
+            request.future.set_result(chunk)
+
+    def stats(self) -> dict:
+        """
+        Report queue depth, batch sizes and per-sentence latency.
+
+        Returns:
+            dict: Scheduler counters; latencies are in seconds from submission to audio
+        """
+        with self._condition:
+            latencies = list(self.latencies)
+            stats = {
+                "queue_depth": self._queued,
+                "in_flight": self.in_flight,
+                "batches": self.batches,
+                "mean_batch_size": self.batched_sentences / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "cache_hits": self.cache_hits,
+            }
+        return {
+            **stats,
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p90": percentile(latencies, 0.9),
+            "latency_p99": percentile(latencies, 0.99),
+        }
+
+    def close(self) -> None:
+        """Finish the queued sentences and stop the workers."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+
+def create_synthesis_scheduler(config, max_queued: int = 64, submit_timeout: Optional[float] = 30.0) -> SynthesisScheduler:
+    """
+    Create a scheduler from the configuration.
+
+    Args:
+        config: Configuration dictionary with the TTS worker settings
+        max_queued (int, optional): Sentences allowed to wait for a batch. Defaults to 64.
+        submit_timeout (float, optional): Seconds submit() waits for room; None waits until there is room.
+                                          Defaults to 30.
+
+    Returns:
+        SynthesisScheduler: The scheduler
+    """
+    return SynthesisScheduler(
+        config,
+        config["tts_workers"],
+        config["tts_batch_size"],
+        config["tts_batch_max_wait"],
+        config["tts_torch_threads"],
+        max_queued,
+        submit_timeout
+    )
+
+
+def get_synthesis_scheduler(config):
+    """
+    Return the process-wide scheduler when worker processes are configured.
+
+    Args:
+        config: Configuration dictionary with the TTS worker settings
+
+    Returns:
+        SynthesisScheduler or None: The scheduler, or None when 'tts_workers' is 0
+    """
+    global _scheduler
+    if not config["tts_workers"]:
+        return None
+    if _scheduler is None:
+        _scheduler = create_synthesis_scheduler(config)
+    return _scheduler
+
+
+def synthesis_scheduler_stats() -> dict:
+    """
+    Report the process-wide scheduler's counters.
+
+    Returns:
+        dict: Scheduler statistics (empty when no scheduler was started)
+    """
+    return _scheduler.stats() if _scheduler is not None else {}
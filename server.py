@@ -0,0 +1,395 @@
+# Standard library imports
+import asyncio
+import base64
+import json
+import logging
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import Flask, jsonify, request
+
+# Custom helper modules
+from config_loader import load_config
+from helpers.audio_helper import encode_wav, to_pcm16
+from helpers.chat_helper import generate_stream, strip_think_tags_stream
+from helpers.chat_history_helper import create_chat_history
+from helpers.llm_router_helper import create_chat_client
+from helpers.tts_helper import preload_tts_model, split_sentences
+from helpers.tts_scheduler_helper import create_synthesis_scheduler
+
+
+# Configure logging the same way as the terminal program
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('app.log'),
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ServerBusy(Exception):
+    """Raised when a turn is rejected by admission control."""
+
+
+class SessionBusy(ServerBusy):
+    """Raised when a session already has a turn running."""
+
+
+class Session:
+    def __init__(self, session_id: str, config):
+        self.session_id = session_id
+        self.history = create_chat_history(config)
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class ChatServer:
+    """
+    Serves chat and speech turns for many concurrent sessions.
+
+    Every session keeps its own history in memory and is evicted after being
+    idle. All sessions share one LLM router (with its connection pools) and
+    one TTS scheduler, which batches sentences onto warm models behind a
+    bounded queue. The number of turns
+    running at once is capped, and further turns are rejected.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.client = create_chat_client(config)
+        # A turn that is already streaming falls back to text at once instead of waiting for room
+        self.synthesis = create_synthesis_scheduler(config, config["server_synthesis_queue_size"], 0)
+        self.sessions: dict = {}
+        self.rejected_turns = 0
+        self._sessions_lock = threading.Lock()
+        self._turn_slots = threading.BoundedSemaphore(config["server_max_concurrent_turns"])
+        self._active_turns = 0
+        self._counters_lock = threading.Lock()
+        threading.Thread(target=self._evict_idle_sessions, name="session-eviction", daemon=True).start()
+
+    def get_session(self, session_id: str = None) -> Session:
+        """
+        Return a session, creating it when it does not exist yet.
+
+        Args:
+            session_id (str, optional): Existing session id. A new id is generated when omitted.
+
+        Returns:
+            Session: The session
+
+        Raises:
+            ServerBusy: When a new session would exceed 'server_max_sessions'
+        """
+        with self._sessions_lock:
+            session = self.sessions.get(session_id) if session_id else None
+            if session is None:
+                if len(self.sessions) >= self.config["server_max_sessions"]:
+                    raise ServerBusy("Too many sessions")
+                session_id = session_id or uuid.uuid4().hex
+                session = Session(session_id, self.config)
+                self.sessions[session_id] = session
+                logger.info(f"Created session {session_id}")
+            session.last_used = time.monotonic()
+            return session
+
+    def end_session(self, session_id: str) -> bool:
+        with self._sessions_lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def _evict_idle_sessions(self) -> None:
+        idle_seconds = self.config["server_session_idle_seconds"]
+        while True:
+            time.sleep(min(60, max(1, idle_seconds / 4)))
+            cutoff = time.monotonic() - idle_seconds
+            with self._sessions_lock:
+                idle = [session_id for session_id, session in self.sessions.items()
+                        if session.last_used < cutoff and not session.lock.locked()]
+                for session_id in idle:
+                    del self.sessions[session_id]
+            if idle:
+                logger.info(f"Evicted {len(idle)} idle sessions")
+
+    def run_turn(self, session: Session, user_prompt: str, with_audio: bool, emit) -> str:
+        """
+        Run one chat turn, emitting text deltas and audio chunks as they are ready.
+
+        Args:
+            session (Session): The conversation
+            user_prompt (str): The user's message
+            with_audio (bool): Whether to synthesize the answer
+            emit (Callable): Receives ("delta", text) and ("audio", index, samples, sample_rate) events
+
+        Turns are only rejected before anything is streamed. When synthesis
+        falls behind or fails in the middle of a turn, the rest of the answer is sent
+        as text only, and the whole answer is kept in the history.
+
+        Returns:
+            str: The answer, without thinking tags when configured
+
+        Raises:
+            ServerBusy: When too many turns are running or synthesis is overloaded
+            SessionBusy: When the session is already in a turn
+        """
+        if with_audio and self.synthesis.queue_depth() >= self.synthesis.max_queued:
+            self._reject()
+            raise ServerBusy("Speech synthesis is overloaded")
+        if not self._turn_slots.acquire(blocking=False):
+            self._reject()
+            raise ServerBusy("Too many concurrent turns")
+        if not session.lock.acquire(blocking=False):
+            self._turn_slots.release()
+            raise SessionBusy("Session is already in a turn")
+        with self._counters_lock:
+            self._active_turns += 1
+        try:
+            user_prompt_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            deltas = generate_stream(user_prompt, session.history.chat_messages(), self.client, self.config)
+            parts = []
+
+            def text_stream():
+                for delta in deltas:
+                    parts.append(delta)
+                    emit(("delta", delta))
+                    yield delta
+
+            if with_audio:
+                spoken = text_stream()
+                if self.config["remove_deepseek_think_tags"]:
+                    spoken = strip_think_tags_stream(spoken)
+                futures: deque = deque()
+                index = 0
+                speaking = True
+
+                def emit_audio(wait: bool) -> None:
+                    # Chunks are delivered in sentence order, as soon as they are ready
+                    nonlocal index, speaking
+                    while futures and (wait or futures[0].done()):
+                        try:
+                            chunk = futures.popleft().result()
+                        except Exception as e:
+                            # Text has already been sent, so the turn finishes without more audio
+                            logger.warning(f"Speech synthesis failed, session {session.session_id} continues as text: {str(e)}")
+                            speaking = False
+                            for future in futures:
+                                future.cancel()
+                            futures.clear()
+                            return
+                        emit(("audio", index, *chunk))
+                        index += 1
+
+                for sentence in split_sentences(spoken):
+                    if speaking and sentence.strip():
+                        try:
+                            futures.append(self.synthesis.submit(sentence, session.session_id))
+                        except queue.Full:
+                            logger.warning(f"Speech synthesis is overloaded, session {session.session_id} continues as text")
+                            speaking = False
+                    emit_audio(False)
+                emit_audio(True)
+            else:
+                for _ in text_stream():
+                    pass
+
+            answer_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            answer = "".join(parts)
+            session.history.add_turn(user_prompt, answer, user_prompt_date, answer_date)
+            session.last_used = time.monotonic()
+            if self.config["remove_deepseek_think_tags"]:
+                answer = re.sub(r"<think>.*?</think>", "", answer, flags=re.DOTALL)
+            return answer
+        finally:
+            with self._counters_lock:
+                self._active_turns -= 1
+            session.lock.release()
+            self._turn_slots.release()
+
+    def _reject(self) -> None:
+        with self._counters_lock:
+            self.rejected_turns += 1
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "active_turns": self._active_turns,
+            "rejected_turns": self.rejected_turns,
+            "synthesis": self.synthesis.stats(),
+            "llm": self.client.stats(),
+        }
+
+
+def create_app(server: ChatServer) -> Flask:
+    """
+    Create the HTTP API.
+
+    Args:
+        server (ChatServer): The shared chat server
+
+    Returns:
+        Flask: The application
+    """
+    app = Flask(__name__)
+
+    @app.post("/sessions")
+    def create_session():
+        try:
+            return jsonify({"session_id": server.get_session().session_id}), 201
+        except ServerBusy as e:
+            return jsonify({"error": str(e)}), 503
+
+    @app.delete("/sessions/<session_id>")
+    def delete_session(session_id):
+        if server.end_session(session_id):
+            return "", 204
+        return jsonify({"error": "Unknown session"}), 404
+
+    @app.post("/sessions/<session_id>/turns")
+    def run_turn(session_id):
+        body = request.get_json(silent=True) or {}
+        user_prompt = (body.get("prompt") or "").strip()
+        if not user_prompt:
+            return jsonify({"error": "No input provided"}), 400
+        chunks = []
+
+        def collect(event):
+            if event[0] == "audio":
+                chunks.append(event[2:])
+
+        try:
+            session = server.get_session(session_id)
+            answer = server.run_turn(session, user_prompt, bool(body.get("audio", True)), collect)
+        except SessionBusy as e:
+            return jsonify({"error": str(e)}), 409
+        except ServerBusy as e:
+            return jsonify({"error": str(e)}), 503
+        response = {"session_id": session.session_id, "answer": answer}
+        if chunks:
+            import numpy as np
+            samples = np.concatenate([samples for samples, _ in chunks])
+            response["audio_wav_base64"] = base64.b64encode(encode_wav(samples, chunks[0][1])).decode("ascii")
+        return jsonify(response)
+
+    @app.get("/health")
+    def health():
+        return jsonify(server.stats())
+
+    return app
+
+
+async def handle_websocket(server: ChatServer, executor: ThreadPoolExecutor, connection) -> None:
+    """
+    Serve one WebSocket connection at /sessions/<session_id>.
+
+    Each text message {"prompt": ..., "audio": true} runs a turn. The server
+    replies with {"type": "delta"} messages, then for each sentence an
+    {"type": "audio"} header followed by a binary frame of 16-bit PCM, and
+    finally {"type": "done"} or {"type": "error"}.
+    """
+    loop = asyncio.get_running_loop()
+    session_id = connection.request.path.rstrip("/").rsplit("/", 1)[-1]
+    try:
+        session = server.get_session(None if session_id == "sessions" else session_id)
+    except ServerBusy as e:
+        await connection.send(json.dumps({"type": "error", "error": str(e)}))
+        return
+    await connection.send(json.dumps({"type": "session", "session_id": session.session_id}))
+
+    async for message in connection:
+        try:
+            body = json.loads(message)
+        except ValueError:
+            await connection.send(json.dumps({"type": "error", "error": "Invalid JSON"}))
+            continue
+        user_prompt = (body.get("prompt") or "").strip()
+        if not user_prompt:
+            await connection.send(json.dumps({"type": "error", "error": "No input provided"}))
+            continue
+
+        # Bounded so a slow client slows the turn down instead of buffering without limit
+        events: asyncio.Queue = asyncio.Queue(maxsize=64)
+        disconnected = threading.Event()
+
+        def emit(event):
+            if event is None or not disconnected.is_set():
+                asyncio.run_coroutine_threadsafe(events.put(event), loop).result()
+
+        def turn():
+            try:
+                return server.run_turn(session, user_prompt, bool(body.get("audio", True)), emit)
+            finally:
+                emit(None)
+
+        pending = loop.run_in_executor(executor, turn)
+        try:
+            while (event := await events.get()) is not None:
+                if event[0] == "delta":
+                    await connection.send(json.dumps({"type": "delta", "text": event[1]}))
+                else:
+                    _, index, samples, sample_rate = event
+                    await connection.send(json.dumps({"type": "audio", "index": index, "sample_rate": sample_rate, "format": "pcm_s16le"}))
+                    await connection.send(to_pcm16(samples))
+        except Exception:
+            # The client went away. emit() stops queueing, so after the turn's final
+            # None (which also frees an emit blocked on the full queue) only the turn is awaited.
+            disconnected.set()
+            while await events.get() is not None:
+                pass
+            await asyncio.wait([pending])
+            raise
+        try:
+            answer = await pending
+            await connection.send(json.dumps({"type": "done", "answer": answer}))
+        except (ServerBusy, SessionBusy) as e:
+            await connection.send(json.dumps({"type": "error", "error": str(e)}))
+        except Exception as e:
+            logger.error(f"Turn of session {session.session_id} failed: {str(e)}")
+            await connection.send(json.dumps({"type": "error", "error": "Turn failed"}))
+
+
+def serve_websockets(server: ChatServer) -> None:
+    """
+    Run the WebSocket server until the process exits.
+
+    Args:
+        server (ChatServer): The shared chat server
+    """
+    from websockets.asyncio.server import serve
+
+    config = server.config
+    executor = ThreadPoolExecutor(max_workers=config["server_max_concurrent_turns"] + 1, thread_name_prefix="ws-turn")
+
+    async def run():
+        async with serve(lambda connection: handle_websocket(server, executor, connection),
+                         config["server_host"], config["server_ws_port"]) as ws_server:
+            logger.info(f"WebSocket server listening on ws://{config['server_host']}:{config['server_ws_port']}/sessions/<id>")
+            await ws_server.serve_forever()
+
+    asyncio.run(run())
+
+
+def main() -> None:
+    """
+    Start the HTTP and WebSocket servers sharing one TTS model and LLM client pool.
+    """
+    config = load_config()
+    logging.getLogger().setLevel(config["log_level"])
+    server = ChatServer(config)
+    if config["preload_tts"]:
+        preload_tts_model(config)
+
+    threading.Thread(target=serve_websockets, args=(server,), name="websockets", daemon=True).start()
+    app = create_app(server)
+    logger.info(f"HTTP server listening on http://{config['server_host']}:{config['server_http_port']}")
+    app.run(host=config["server_host"], port=config["server_http_port"], threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,35 @@
 # Standard library imports
+import argparse
+import asyncio
 import datetime
 import re
 import logging
 import sys
+import time
 from typing import Optional
 
-# OpenAI client for API interactions
-from openai import OpenAI
-# Custom helper modules
-from config_loader import load_config
-from helpers.tts_helper import run_tts, play_audio
-from helpers.memory_helper import run_garbage_collection
-from helpers.transcript_helper import save_transcript
-from helpers.console_helper import get_user_input, exit_program,print_text
-from helpers.chat_helper import generate
-from helpers.chat_history_helper import manage_chat_history, get_formatted_history
+# Startup timing is imported first so the import breakdown covers everything below
+from helpers.startup_helper import import_phase, report_startup
+
+# OpenAI-compatible clients for API interactions
+with import_phase("openai"):
+    from helpers.llm_router_helper import LLMRouter, create_chat_client
+# Custom helper modules; torch and Coqui TTS are only loaded when speech is used
+with import_phase("helpers"):
+    from config_loader import load_config
+    from helpers.tts_helper import run_tts, run_tts_stream, play_audio, preload_tts_model
+    from helpers.tts_scheduler_helper import synthesis_scheduler_stats
+    from helpers.audio_cache_helper import audio_cache_stats
+    from helpers.audio_archive_helper import close_audio_archive
+    from helpers.response_cache_helper import response_cache_stats
+    from helpers.memory_helper import create_memory_manager
+    from helpers.transcript_helper import close_session_log, resume_history, save_transcript
+    from helpers.console_helper import get_user_input, exit_program,print_text
+    from helpers.speech_input_helper import get_voice_input, last_utterance
+    from helpers.chat_helper import generate, generate_stream
+    from helpers.chat_history_helper import create_chat_history
+    from helpers.long_term_memory_helper import create_long_term_memory
+    from helpers.metrics_helper import SessionMetrics, profile_session
 
 
 # Configure logging with both file and console output
@@ -31,22 +46,23 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def initialize_client(config: dict) -> Optional[OpenAI]:
+def initialize_client(config: dict) -> Optional[LLMRouter]:
     """
-    Initialize the OpenAI client with error handling.
+    Initialize the LLM client with error handling.
+
+    The returned client is used like an OpenAI client. It is a router that
+    spreads requests over every configured backend, or the in-process
+    llama.cpp backend when 'llm_backend' is llama_cpp.
 
     Args:
         config (dict): Configuration dictionary containing API settings
-                      Must include 'base_url' and 'openai_api_key'
+                      Must include 'base_url' (or 'base_urls') and 'openai_api_key'
 
     Returns:
-        Optional[OpenAI]: Initialized OpenAI client or None if initialization fails
+        Optional[LLMRouter]: Initialized client or None if initialization fails
     """
     try:
-        client = OpenAI(
-            base_url=config["base_url"],
-            api_key=config["openai_api_key"]
-        )
+        client = create_chat_client(config)
         return client
     except Exception as e:
         logger.error(f"Failed to initialize OpenAI client: {str(e)}")
@@ -67,8 +83,20 @@ def main() -> None:
     # Load configuration settings from external file
     logger.info("Loading configuration...")
     config = load_config()
+    logging.getLogger().setLevel(config["log_level"])
+    metrics = SessionMetrics(config)
+    memory_manager = None
+    long_term_memory = None
+    client = None
 
     try:
+        # The asyncio engine overlaps input, generation, speech and persistence
+        if config["async_engine"]:
+            logger.info("Starting asyncio conversation engine...")
+            from helpers.async_engine_helper import run_conversation_engine
+            asyncio.run(run_conversation_engine(config))
+            return
+
         # Initialize OpenAI client with error checking
         client = initialize_client(config)
         if not client:
@@ -80,24 +108,43 @@ def main() -> None:
             logger.info("Playing welcome message...")
             play_audio("hi.wav", config)
 
-        # Initial memory cleanup to ensure optimal performance
-        logger.info("Running initial garbage collection...")
-        run_garbage_collection()
+        # Memory is only collected past the configured high-water marks, while waiting for input
+        memory_manager = create_memory_manager(config)
 
         # Initialize chat history with system prompt
         # This sets up the initial context for the conversation
-        now = datetime.datetime.now()
-        chat_history_array = [{"role": "user", "content": f"{config['initial_content'].format(bot_name=config['bot_name'])}\n\nCurrent date and time: {now.strftime('%Y-%m-%d %H:%M:%S')}"}]
-        memory = config["memory_message_count"] * 2  # Calculate memory window size
+        history = create_chat_history(config)
+        resume_history(history, config)
+        # Turns leaving the history window are summarized and stay retrievable
+        long_term_memory = create_long_term_memory(config, client)
+        if long_term_memory is not None:
+            history.on_evict = long_term_memory.evicted
 
+        def on_prompt() -> None:
+            # The first prompt marks the end of startup; the TTS model then
+            # warms in the background while the user is typing
+            nonlocal tts_warming
+            report_startup(config)
+            memory_manager.schedule_idle()
+            if not tts_warming and config["read_after_generate"] and config["preload_tts"]:
+                logger.info("Preloading TTS model...")
+                preload_tts_model(config)
+                tts_warming = True
+
+        tts_warming = False
+        read_prompt = get_voice_input if config["voice_input"] else get_user_input
         logger.info("Starting main interaction loop...")
         while True:
+            turn = None
             try:
                 # Generate unique timestamp for file naming
                 file_date = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
 
                 # Get user input with configured prompt
-                user_prompt = get_user_input(config)
+                input_start = time.perf_counter()
+                user_prompt = read_prompt(config, on_prompt)
+                input_wait = time.perf_counter() - input_start
+                memory_manager.cancel_idle()
                 user_prompt_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 logger.info(f"Received user input: {user_prompt}")
 
@@ -112,10 +159,35 @@ def main() -> None:
                 if not user_prompt.strip():
                     print_text("No input provided. Please enter a valid question or command.", config)
                     continue
+
+                # Measure every stage of this turn
+                turn = metrics.start_turn()
+                turn.observe("input_wait", input_wait)
+                utterance = last_utterance() if config["voice_input"] else None
+                if utterance is not None:
+                    turn.observe("endpointing", utterance.endpointing_delay)
+                    turn.observe("transcription", utterance.transcription_seconds)
+
                 # Process chat history and generate AI response
                 # This section manages the conversation context and memory
-                chat_history = get_formatted_history(chat_history_array, memory, config["bot_name"])
-                answer: str = generate(user_prompt, chat_history, client, config)
+                memory_context = ""
+                if long_term_memory is not None:
+                    with turn.span("memory_retrieval"):
+                        memory_context = long_term_memory.context(user_prompt, history)
+                with turn.span("history_format"):
+                    chat_history = history.chat_messages(memory_context)
+                if config["stream_response"]:
+                    # Speak each sentence as soon as it is complete, while the rest is still generating
+                    deltas = turn.span_stream("generation", generate_stream(user_prompt, chat_history, client, config))
+                    if config["read_after_generate"]:
+                        # Generation overlaps with speech, so the speech span covers the whole answer
+                        with turn.span("speech"):
+                            answer: str = run_tts_stream(deltas, file_date, config)
+                    else:
+                        answer: str = "".join(deltas)
+                else:
+                    with turn.span("generation"):
+                        answer: str = generate(user_prompt, chat_history, client, config)
                 answer_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 history_answer = answer
 
@@ -127,34 +199,34 @@ def main() -> None:
 
                 # Update conversation history while maintaining memory limits
                 # This ensures the context window doesn't grow too large
-                chat_history_array = manage_chat_history(
-                    user_prompt,
-                    history_answer,
-                    chat_history_array,
-                    config["initial_content"],
-                    config["bot_name"],
-                    memory,
-                    user_prompt_date,
-                    answer_date
-                )
+                history.add_turn(user_prompt, history_answer, user_prompt_date, answer_date)
+                if long_term_memory is not None:
+                    long_term_memory.remember(user_prompt, answer, user_prompt_date, answer_date)
 
                 # Process response for output
                 # - Convert text to speech
                 # - Save conversation transcript
                 if config["print_generated_text"]:
                     print_text(answer, config)
-                if config["read_after_generate"]:
-                    run_tts(answer, file_date, config)
+                if config["read_after_generate"] and not config["stream_response"]:
+                    with turn.span("speech"):
+                        run_tts(answer, file_date, config)
                 if config["generate_transcript"]:
-                    save_transcript(user_prompt, answer, file_date, config)
+                    with turn.span("transcript_write"):
+                        save_transcript(user_prompt, answer, history_answer, user_prompt_date, answer_date, config,
+                                        {"spans": dict(turn.spans), "marks": dict(turn.marks)})
 
-                # Regular memory cleanup to prevent memory leaks
-                run_garbage_collection()
+                # Memory cleanup is deferred to the next idle period
+                memory_manager.end_turn()
 
             except Exception as e:
                 # Handle errors in the main loop without crashing
                 logger.error(f"Error in main loop: {str(e)}")
                 continue
+            finally:
+                # A failed turn is still reported, and no longer counts as the current one
+                if turn is not None:
+                    metrics.finish_turn(turn)
 
     except Exception as e:
         # Handle critical errors that require program termination
@@ -163,7 +235,28 @@ def main() -> None:
     finally:
         # Ensure proper cleanup regardless of how the program exits
         logger.info("Cleaning up and exiting...")
+        logger.info(f"Audio cache stats: {audio_cache_stats(config)}")
+        logger.info(f"Response cache stats: {response_cache_stats(config)}")
+        logger.info(f"Speech synthesis stats: {synthesis_scheduler_stats()}")
+        logger.info(f"Audio archive stats: {close_audio_archive()}")
+        logger.info(f"Session log stats: {close_session_log()}")
+        metrics.close()
+        if client is not None:
+            logger.info(f"LLM backend stats: {client.stats()}")
+            client.close()
+        if long_term_memory is not None:
+            long_term_memory.close()
+            logger.info(f"Long-term memory stats: {long_term_memory.stats()}")
+        if memory_manager is not None:
+            logger.info(f"Memory stats: {memory_manager.summary()}")
         exit_program(config)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Voice chat with an OpenAI-compatible model.")
+    parser.add_argument("--profile", action="store_true", help="profile the session with cProfile and tracemalloc")
+    args = parser.parse_args()
+    if args.profile:
+        with profile_session():
+            main()
+    else:
+        main()
@@ -0,0 +1,100 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from config_loader import load_config
+from helpers.batch_helper import SUMMARY_FILE, TRANSCRIPT_FILE, BatchRunner, find_conversations, load_prompts, load_records
+
+
+class FakeClient:
+    """Answers every request with a numbered reply."""
+
+    def __init__(self, fail_on: int = 0):
+        self.fail_on = fail_on
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("backend down")
+        content = f"Answer to {request['messages'][-1]['content']}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def config():
+    config = load_config()
+    config.update(response_cache=False, remove_deepseek_think_tags=False)
+    return config
+
+
+def write_script(path, prompts):
+    path.write_text("\n".join(prompts) + "\n", encoding="utf-8")
+
+
+def run_batch(config, client, script, output):
+    runner = BatchRunner(config, client, None, str(output), concurrency=2)
+    return runner.run(find_conversations(str(script)))
+
+
+def test_load_prompts_reads_markdown_chats(tmp_path):
+    script = tmp_path / "chat.md"
+    script.write_text(
+        "Title\n---\n\n**You:**\nFirst question?\n\n**Bot:**\nAn answer.\n\n---\n\n"
+        "**You:**\nSecond\nquestion\n\n**Bot:**\nAnother answer.\n",
+        encoding="utf-8"
+    )
+    assert load_prompts(str(script)) == ["First question?", "Second\nquestion"]
+
+
+def test_load_prompts_reads_one_prompt_per_line(tmp_path):
+    script = tmp_path / "prompts.txt"
+    script.write_text("one\n\n  two  \nthree\n", encoding="utf-8")
+    assert load_prompts(str(script)) == ["one", "two", "three"]
+
+
+def test_load_records_stops_at_a_damaged_record(tmp_path):
+    transcript = tmp_path / TRANSCRIPT_FILE
+    transcript.write_text(json.dumps({"turn": 1}) + "\n" + json.dumps({"turn": 2}) + "\n{\"turn\": 3", encoding="utf-8")
+    assert load_records(str(transcript)) == [{"turn": 1}, {"turn": 2}]
+    assert load_records(str(tmp_path / "missing.jsonl")) == []
+
+
+def test_rerun_resumes_after_the_finished_turns(tmp_path, config):
+    script = tmp_path / "script.txt"
+    output = tmp_path / "output"
+    write_script(script, ["one", "two", "three"])
+
+    client = FakeClient()
+    summary = run_batch(config, client, script, output)
+    assert (summary["completed"], summary["skipped"], summary["failed"]) == (3, 0, 0)
+    assert client.calls == 3
+
+    summary = run_batch(config, client, script, output)
+    assert (summary["completed"], summary["skipped"]) == (0, 3)
+    assert client.calls == 3
+
+    # A changed prompt invalidates its answer and the ones after it
+    write_script(script, ["one", "TWO", "three", "four"])
+    summary = run_batch(config, client, script, output)
+    assert (summary["completed"], summary["skipped"]) == (3, 1)
+    records = load_records(str(output / "script" / TRANSCRIPT_FILE))
+    assert [record["user_prompt"] for record in records] == ["one", "TWO", "three", "four"]
+    assert [record["turn"] for record in records] == [1, 2, 3, 4]
+
+
+def test_failed_turn_is_counted_and_the_summary_written(tmp_path, config):
+    script = tmp_path / "script.txt"
+    output = tmp_path / "output"
+    write_script(script, ["one", "two", "three"])
+
+    summary = run_batch(config, FakeClient(fail_on=2), script, output)
+    assert (summary["completed"], summary["failed"]) == (1, 2)
+    assert json.loads((output / SUMMARY_FILE).read_text())["failed"] == 2
+    assert len(load_records(str(output / "script" / TRANSCRIPT_FILE))) == 1
+
+    # The failed turns are generated on the next run
+    summary = run_batch(config, FakeClient(), script, output)
+    assert (summary["completed"], summary["skipped"], summary["failed"]) == (2, 1, 0)
@@ -0,0 +1,76 @@
+from helpers.chat_history_helper import ChatHistory
+
+
+def make_history(capacity=100, token_budget=101):
+    # A one-token system prompt leaves 'token_budget - 1' tokens for the messages
+    return ChatHistory("s", capacity, token_budget)
+
+
+def add_turns(history, count, start=0):
+    # 40 characters estimate to 10 tokens per message
+    for number in range(start, start + count):
+        history.add_turn(f"{number:02d}".ljust(40, "u"), f"{number:02d}".ljust(40, "a"), "date", "date")
+
+
+def test_eviction_keeps_capacity_and_drops_a_block():
+    history = make_history(capacity=8)
+    evicted = []
+    history.on_evict = evicted.append
+    # The default headroom of a quarter of the capacity allows one more turn
+    add_turns(history, 5)
+    assert len(history.messages()) == 1 + 10
+    assert evicted == []
+
+    add_turns(history, 1, start=5)
+    # The full buffer drops back to the capacity, then takes the new turn
+    assert len(history.messages()) == 1 + 10
+    assert len(evicted) == 2
+    assert evicted[0]["content"].startswith("date : 00")
+
+
+def test_headroom_is_small_and_even():
+    assert ChatHistory("s", 20, 100).headroom == 6
+    assert ChatHistory("s", 4, 100).headroom == 2
+    assert ChatHistory("s", 4, 100, headroom=3).headroom == 4
+
+
+def test_window_frees_a_quarter_and_then_stays():
+    history = make_history()
+    add_turns(history, 5)
+    assert len(history.chat_messages()) == 1 + 10
+
+    add_turns(history, 1, start=5)
+    messages = history.chat_messages()
+    # 120 tokens no longer fit into 100, so the window shrinks to 75 and starts at a user message
+    assert len(messages) == 1 + 6
+    assert messages[1]["role"] == "user"
+    first = messages[1]["content"]
+
+    add_turns(history, 1, start=6)
+    messages = history.chat_messages()
+    assert len(messages) == 1 + 8
+    assert messages[1]["content"] == first
+
+
+def test_chat_messages_drop_timestamps():
+    history = make_history()
+    history.add_turn("hello", "hi", "2024-01-01 10:00:00", "2024-01-01 10:00:01")
+    assert history.chat_messages() == [
+        {"role": "system", "content": "s"},
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+    ]
+    assert history.chat_messages("memory")[-1] == {"role": "system", "content": "memory"}
+
+
+def test_token_count_does_not_move_the_window():
+    history = make_history()
+    add_turns(history, 5)
+    history.chat_messages()
+    add_turns(history, 1, start=5)
+    count = history.token_count()
+    assert history.token_count() == count
+    # Counting alone did not shift the window the next request starts from
+    assert history._window_start == 0
+    assert len(history.chat_messages()) == 1 + 6
+    assert history.token_count() == 1 + 60
@@ -0,0 +1,83 @@
+import numpy as np
+
+from config_loader import load_config
+from helpers.long_term_memory_helper import HashingEmbedder, LongTermMemory, VectorIndex
+
+TEXTS = [
+    "The violinist plays Beethoven at the concert hall",
+    "My cat sleeps on the warm windowsill",
+    "We cooked pasta with tomatoes for dinner",
+]
+
+
+def make_index(directory):
+    index = VectorIndex(str(directory))
+    embedder = HashingEmbedder()
+    for number, vector in enumerate(embedder.embed(TEXTS)):
+        index.add(vector, {"turn": number, "text": TEXTS[number]})
+    return index, embedder
+
+
+def test_search_finds_the_closest_record(tmp_path):
+    index, embedder = make_index(tmp_path)
+    results = index.search(embedder.embed(["Which cat sleeps on the windowsill?"])[0], 2)
+    assert len(results) == 2
+    assert results[0][1]["turn"] == 1
+    assert results[0][0] >= results[1][0]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index, embedder = make_index(tmp_path)
+    index.save()
+
+    loaded = VectorIndex(str(tmp_path))
+    assert len(loaded) == len(TEXTS)
+    assert loaded.records == index.records
+    np.testing.assert_allclose(loaded.vectors, index.vectors)
+    query = embedder.embed(["pasta for dinner"])[0]
+    assert loaded.search(query, 1)[0][1] == index.search(query, 1)[0][1]
+
+
+def test_records_without_saved_vectors_are_kept_as_orphans(tmp_path):
+    index, embedder = make_index(tmp_path)
+    index.save()
+    index.add(embedder.embed(["an unsaved turn"])[0], {"turn": 3})
+    index.save_records()
+
+    loaded = VectorIndex(str(tmp_path))
+    assert [record["turn"] for record in loaded.records] == [0, 1, 2]
+    assert loaded.orphans == [{"turn": 3}]
+
+
+class FailingEmbedder:
+    def embed(self, texts):
+        raise RuntimeError("embedding backend down")
+
+
+def make_memory(directory, embedder=None):
+    config = load_config()
+    config.update(memory_directory=str(directory), memory_embedding_model="", memory_min_score=0.0)
+    return LongTermMemory(config, client=None, embedder=embedder)
+
+
+def test_unsaved_turns_are_embedded_again_after_a_crash(tmp_path):
+    memory = make_memory(tmp_path)
+    for number, text in enumerate(TEXTS):
+        memory.remember(text, f"answer {number}", "date", "date")
+    # Stopping the background thread without close() leaves the vectors unsaved
+    memory._executor.shutdown(wait=True)
+    assert not (tmp_path / "vectors.npy").exists()
+
+    memory = make_memory(tmp_path)
+    memory._executor.shutdown(wait=True)
+    assert [record["user_prompt"] for record in memory.index.records] == TEXTS
+    assert "cat sleeps" in memory.context("Where does my cat sleep?")
+    assert len(VectorIndex(str(tmp_path))) == len(TEXTS)
+
+
+def test_context_without_embeddings_keeps_the_summary(tmp_path):
+    make_index(tmp_path)[0].save()
+    memory = make_memory(tmp_path, FailingEmbedder())
+    memory.summary = "The user has a cat."
+    assert memory.context("Where does my cat sleep?") == "Summary of the earlier conversation: The user has a cat.\n"
+    memory.close()
@@ -0,0 +1,36 @@
+from helpers.response_cache_helper import normalize_for_key, response_cache_key
+
+
+def make_request(content, system="prompt", **fields):
+    return {
+        "model": "model",
+        "messages": [{"role": "system", "content": system}, {"role": "user", "content": content}],
+        "temperature": 0,
+        **fields,
+    }
+
+
+def test_normalize_for_key_drops_the_start_time_and_whitespace():
+    assert normalize_for_key("Be nice.\n\nCurrent date and time: 2024-01-01 10:00:00") == "Be nice. Current date and time:"
+    assert normalize_for_key("  hello   there\n") == "hello there"
+    assert normalize_for_key(None) == ""
+
+
+def test_key_ignores_the_session_start_time():
+    first = make_request("What time is it?", "Be nice.\n\nCurrent date and time: 2024-01-01 10:00:00")
+    second = make_request("What  time is it? ", "Be nice.\n\nCurrent date and time: 2025-06-30 23:59:59")
+    assert response_cache_key(first) == response_cache_key(second)
+
+
+def test_key_keeps_dates_the_user_typed():
+    first = make_request("What happened at 2024-01-01 10:00:00?")
+    second = make_request("What happened at 2025-06-30 23:59:59?")
+    assert response_cache_key(first) != response_cache_key(second)
+
+
+def test_key_changes_with_model_messages_and_sampling():
+    key = response_cache_key(make_request("hello"))
+    assert response_cache_key(make_request("hello there")) != key
+    assert response_cache_key({**make_request("hello"), "model": "other"}) != key
+    assert response_cache_key(make_request("hello", max_tokens=10)) != key
+    assert response_cache_key(make_request("hello", temperature=0.7)) != key
@@ -0,0 +1,35 @@
+import os
+
+from helpers.transcript_helper import SessionLog, load_session
+
+
+def write_session(directory, compress, prompts):
+    log = SessionLog(str(directory), "session", compress=compress, fsync="never")
+    for prompt in prompts:
+        log.append({"user_prompt": prompt, "answer_date": "date"})
+    log.close()
+    return os.path.join(str(directory), log.file_name)
+
+
+def test_load_session_returns_records_in_order(tmp_path):
+    write_session(tmp_path, True, ["one", "two"])
+    records = load_session(str(tmp_path), "session")
+    assert [(record["turn"], record["user_prompt"]) for record in records] == [(1, "one"), (2, "two")]
+
+
+def test_truncated_compressed_log_keeps_earlier_records(tmp_path):
+    path = write_session(tmp_path, True, ["one", "two", "three"])
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[:-12])
+    # Only the end-of-stream trailer is lost, so every complete record is kept
+    records = load_session(str(tmp_path), "session")
+    assert [(record["turn"], record["user_prompt"]) for record in records] == [(1, "one"), (2, "two"), (3, "three")]
+
+
+def test_damaged_plain_record_is_skipped(tmp_path):
+    path = write_session(tmp_path, False, ["one", "two"])
+    with open(path, "a") as file:
+        file.write('{"turn": 3, "user_pro')
+    assert [record["user_prompt"] for record in load_session(str(tmp_path), "session")] == ["one", "two"]
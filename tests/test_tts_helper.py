@@ -0,0 +1,26 @@
+import pytest
+
+from helpers import tts_helper
+from helpers.tts_helper import split_sentences, split_sentences_simple
+
+
+def test_split_sentences_simple_splits_streamed_text():
+    deltas = ["Hello there, how ar", "e you today? I am fi", "ne. Thanks!\nSee you soon"]
+    assert list(split_sentences_simple(deltas)) == [
+        "Hello there, how are you today?",
+        "I am fine.",
+        "Thanks! See you soon",
+    ]
+
+
+def test_split_sentences_simple_joins_short_sentences():
+    assert list(split_sentences_simple(["Hi. Ok. This one is long enough."])) == ["Hi. Ok. This one is long enough."]
+    assert list(split_sentences_simple([])) == []
+
+
+def test_split_sentences_without_nltk_data(monkeypatch):
+    pytest.importorskip("stream2sentence")
+    # As when punkt_tab is not installed and cannot be downloaded
+    monkeypatch.setattr(tts_helper, "_nltk_ready", False)
+    sentences = list(split_sentences(iter(["The first sentence is here. ", "The second one follows."])))
+    assert sentences == ["The first sentence is here.", "The second one follows."]